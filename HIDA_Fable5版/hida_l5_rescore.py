@@ -0,0 +1,245 @@
+"""
+hida_l5_rescore.py
+L5同期判定のオフライン再採点 - 記録済みの活動量時系列 × DNA定数グリッド
+
+L5Consciousness.check_sync() の判定（主導層・追随整合性・raw_sync・EMA・
+ヒステリシスによるON/OFF）は、各層の活動量（_measure_activity の出力、
+last_activities）の時系列だけで決まる。そこで、シミュレーションを1回走らせて
+活動量を記録しておけば、L5のDNA定数
+
+    LEADER_THRESHOLD, EMA_ALPHA, ON_THRESHOLD, OFF_THRESHOLD, LAG_WEIGHT
+
+をいくら変えても、再シミュレーションせずに判定をやり直せる。本モジュールは
+これを「グリッドの全組 × 全ラン」について配列演算で一括計算する。
+演算の順序は check_sync と同一で、結果は浮動小数点まで一致する
+（test_l5_rescore.py）。
+
+注意（引き込みとの関係）:
+  活動量の時系列そのものは、引き込みゲイン（1 + ENTRAIN_K × 主導強度）を通じて
+  前ステップの主導層判定に依存する。主導層判定に関わるのは LEADER_THRESHOLD
+  だけなので、
+  - EMA_ALPHA / ON_THRESHOLD / OFF_THRESHOLD / LAG_WEIGHT: どのENTRAIN_Kでも厳密
+  - LEADER_THRESHOLD: ENTRAIN_K=0 の記録、または記録時と同じ値のときだけ厳密
+  （それ以外は「記録した軌道を固定したときの判定」という近似になる）。
+  rescore() の返り値 'exact' がこの区別を組ごとに示す。
+
+使い方:
+  traces = [record_activities(agent, world) for ...]   # 各 (T, 4)
+  grid = dna_grid(ON_THRESHOLD=[0.06, 0.08, 0.10], EMA_ALPHA=[0.2, 0.35, 0.5])
+  result = rescore(traces, grid)        # 各出力は (組数, ラン数, ステップ数)
+  rate = on_rate(traces, grid)          # 組ごとの意識ON率（大きなグリッド向け）
+
+依存: NumPy
+"""
+
+import itertools
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+import hida_unified_v2 as h
+from hida_population import LAYERS
+
+
+# 再採点の対象となるL5のDNA定数
+DNA_KEYS = ('LEADER_THRESHOLD', 'EMA_ALPHA', 'ON_THRESHOLD', 'OFF_THRESHOLD', 'LAG_WEIGHT')
+
+
+def _clip01(x: np.ndarray) -> np.ndarray:
+    return np.minimum(np.maximum(x, 0.0), 1.0)
+
+
+def dna_grid(**axes: Sequence[float]) -> Dict[str, np.ndarray]:
+    """DNA定数の直積グリッド
+
+    指定しなかった定数は L5Consciousness のクラス定数（初期DNA）に固定する。
+    返り値は {定数名: (組数,) の配列}。
+    """
+    unknown = set(axes) - set(DNA_KEYS)
+    if unknown:
+        raise ValueError(f"未知のDNA定数: {sorted(unknown)}")
+    values = [list(axes.get(k, [getattr(h.L5Consciousness, k)])) for k in DNA_KEYS]
+    combos = np.array(list(itertools.product(*values)), dtype=float)
+    return {k: combos[:, j] for j, k in enumerate(DNA_KEYS)}
+
+
+def record_activities(agent: h.HIDA, world: h.World, max_steps: int = 60) -> np.ndarray:
+    """1ランを走らせ、各ステップの活動量（last_activities）を (T, 4) で返す
+
+    終了条件は test_entrainment_ablation.py と同じ（ゴール到達かエネルギー切れ）。
+    """
+    rows = []
+    for _ in range(max_steps):
+        result = agent.step(world, verbose=False)
+        rows.append([agent.l5.last_activities[k] for k in LAYERS])
+        if result['goal_reached'] or agent.l1.energy <= 0:
+            break
+    return np.array(rows, dtype=float).reshape(-1, 4)
+
+
+def stack_traces(traces: Sequence[np.ndarray]):
+    """長さの違う (T_r, 4) の列を (ラン数, 最大T, 4) に詰める
+
+    返り値: (activities, lengths)。最終ステップ以降は0で埋める。
+    """
+    lengths = np.array([len(t) for t in traces], dtype=np.int64)
+    acts = np.zeros((len(traces), int(lengths.max(initial=0)), 4))
+    for r, t in enumerate(traces):
+        acts[r, :len(t)] = t
+    return acts, lengths
+
+
+def _as_batch(traces, lengths):
+    if isinstance(traces, np.ndarray) and traces.ndim == 3:
+        acts = traces.astype(float, copy=False)
+        if lengths is None:
+            lengths = np.full(acts.shape[0], acts.shape[1], dtype=np.int64)
+        return acts, np.asarray(lengths)
+    return stack_traces(traces)
+
+
+def _complete(grid: Optional[Dict[str, Sequence[float]]]) -> Dict[str, np.ndarray]:
+    """足りない定数をクラス定数で補い、長さをそろえる"""
+    grid = dict(grid or {})
+    n = max((np.size(v) for v in grid.values()), default=1)
+    out = {}
+    for k in DNA_KEYS:
+        v = np.asarray(grid.get(k, getattr(h.L5Consciousness, k)), dtype=float)
+        out[k] = np.broadcast_to(v, (n,)) if v.ndim == 0 or v.size == 1 else v
+        if out[k].shape != (n,):
+            raise ValueError(f"{k}: 長さ{out[k].shape}がグリッドの組数{n}と合わない")
+    return out
+
+
+def _scan(acts: np.ndarray, dna: Dict[str, np.ndarray], keep: bool):
+    """check_sync の時間発展を (組, ラン) の全体で一括に進める
+
+    acts: (R, T, 4)。各ステップの出力を (P, R, T) で返す。
+    keep=Falseなら conscious だけを返す（ON率の集計用。メモリ節約）。
+    """
+    n_runs, n_steps, _ = acts.shape
+    shape = (len(dna['EMA_ALPHA']), n_runs)
+    lt = dna['LEADER_THRESHOLD'][:, None, None]
+    alpha = dna['EMA_ALPHA'][:, None]
+    on = dna['ON_THRESHOLD'][:, None]
+    off = dna['OFF_THRESHOLD'][:, None]
+    lw = dna['LAG_WEIGHT'][:, None]
+
+    # check_sync の初期状態（L5Consciousness.__init__ と同じ）
+    ema = np.zeros(shape)
+    conscious = np.zeros(shape, dtype=bool)
+    prev_leader = np.full(shape, -1, dtype=np.int8)
+    prev_strength = np.zeros(shape)
+    prev_acts = np.zeros(shape + (4,))
+
+    out = {
+        'leader': np.empty(shape + (n_steps,), dtype=np.int8),
+        'leader_strength': np.empty(shape + (n_steps,)),
+        'coherence': np.empty(shape + (n_steps,)),
+        'raw_sync': np.empty(shape + (n_steps,)),
+        'sync_score': np.empty(shape + (n_steps,)),
+        'conscious': np.empty(shape + (n_steps,), dtype=bool),
+    } if keep else {'conscious': np.empty(shape + (n_steps,), dtype=bool)}
+
+    for t in range(n_steps):
+        a = np.broadcast_to(acts[None, :, t, :], shape + (4,))
+
+        # Step 2: 主導層（閾値超過層のうち最大。同値なら L1→L4 の順で先勝ち）
+        candidates = np.where(a >= lt, a, -np.inf)
+        leader = np.argmax(candidates, axis=2)
+        strength = np.take_along_axis(candidates, leader[..., None], axis=2)[..., 0]
+        has_leader = np.isfinite(strength)
+        strength = np.where(has_leader, strength, 0.0)
+        leader = np.where(has_leader, leader, -1).astype(np.int8)
+
+        # Step 3: 追随整合性（同時応答＋時間遅れ応答）。加算はL1→L4の順
+        follower_mean = 0.0
+        rise = 0.0
+        for k in range(4):
+            follower_mean = follower_mean + np.where(leader != k, a[..., k], 0.0)
+            rise = rise + np.where(prev_leader != k,
+                                   np.maximum(0.0, a[..., k] - prev_acts[..., k]), 0.0)
+        follower_mean = follower_mean / 3.0
+        rise = rise / 3.0
+        lagged = (prev_leader >= 0) & (prev_strength > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            lag_response = _clip01(rise / np.where(lagged, prev_strength, 1.0))
+        coherence = _clip01(np.where(lagged, (1.0 - lw) * follower_mean + lw * lag_response,
+                                     follower_mean))
+        coherence = np.where(has_leader, coherence, 0.0)
+
+        # Step 4: 同期スコア（幾何平均）
+        raw_sync = np.where(has_leader, np.sqrt(strength * coherence), 0.0)
+
+        # Step 5: EMA平滑化とヒステリシス
+        ema = (1 - alpha) * ema + alpha * raw_sync
+        conscious = np.where(conscious, ema >= off, ema >= on)
+
+        # Step 7: 次ステップ用の状態保存
+        prev_leader = leader
+        prev_strength = strength
+        prev_acts = a
+
+        out['conscious'][..., t] = conscious
+        if keep:
+            out['leader'][..., t] = leader
+            out['leader_strength'][..., t] = strength
+            out['coherence'][..., t] = coherence
+            out['raw_sync'][..., t] = raw_sync
+            out['sync_score'][..., t] = ema
+    return out
+
+
+def rescore(traces, grid: Optional[Dict[str, Sequence[float]]] = None,
+            lengths: Optional[np.ndarray] = None, recorded_leader_threshold: Optional[float] = None,
+            recorded_entrain_k: Optional[float] = None) -> Dict[str, np.ndarray]:
+    """記録済みの活動量に対し、DNA定数の各組で check_sync をやり直す
+
+    traces: (T_r, 4) の列、または (ラン数, T, 4) の配列（lengthsで各ランの長さ）
+    grid:   {定数名: (組数,) の値}。dna_grid() の返り値など。省略した定数はクラス定数
+    recorded_*: 記録時の LEADER_THRESHOLD / ENTRAIN_K（'exact' の判定用。省略時はクラス定数）
+
+    返り値（P=組数, R=ラン数, T=最大ステップ数）:
+      'leader'           (P, R, T) int8  主導層のインデックス（LAYERSの順。-1 = None）
+      'leader_strength'  (P, R, T)       check_sync後の leader_strength
+      'coherence'        (P, R, T)       check_sync後の sync_coherence
+      'raw_sync'         (P, R, T)       EMA前の同期スコア
+      'sync_score'       (P, R, T)       EMA後（= sync_score）
+      'conscious'        (P, R, T) bool  is_conscious
+      'valid'            (R, T)    bool  そのランの長さ内のステップか
+      'exact'            (P,)      bool  記録した活動量がその組でも厳密に成り立つか
+      'dna'              {定数名: (P,)}
+    """
+    acts, lengths = _as_batch(traces, lengths)
+    dna = _complete(grid)
+    out = _scan(acts, dna, keep=True)
+    out['valid'] = np.arange(acts.shape[1])[None, :] < lengths[:, None]
+    out['exact'] = _exact(dna, recorded_leader_threshold, recorded_entrain_k)
+    out['dna'] = dna
+    return out
+
+
+def _exact(dna, recorded_leader_threshold, recorded_entrain_k) -> np.ndarray:
+    lt0 = h.L5Consciousness.LEADER_THRESHOLD if recorded_leader_threshold is None \
+        else recorded_leader_threshold
+    k0 = h.L5Consciousness.ENTRAIN_K if recorded_entrain_k is None else recorded_entrain_k
+    return (dna['LEADER_THRESHOLD'] == lt0) | (k0 == 0.0)
+
+
+def on_rate(traces, grid: Optional[Dict[str, Sequence[float]]] = None,
+            lengths: Optional[np.ndarray] = None, chunk: int = 512) -> np.ndarray:
+    """組ごとの意識ON率（全ランの有効ステップに対するONの割合）
+
+    大きなグリッド向け。組を chunk 個ずつ処理し、ステップごとの出力は保持しない。
+    """
+    acts, lengths = _as_batch(traces, lengths)
+    dna = _complete(grid)
+    valid = np.arange(acts.shape[1])[None, :] < lengths[:, None]
+    n_valid = max(int(valid.sum()), 1)
+    n = len(dna['EMA_ALPHA'])
+    rates = np.empty(n)
+    for lo in range(0, n, chunk):
+        part = {k: v[lo:lo + chunk] for k, v in dna.items()}
+        conscious = _scan(acts, part, keep=False)['conscious']
+        rates[lo:lo + chunk] = (conscious & valid[None]).sum(axis=(1, 2)) / n_valid
+    return rates
@@ -0,0 +1,966 @@
+"""
+hida_population.py
+HIDA v2.1 集団エンジン - N体のエージェントを配列（struct-of-arrays）で一括更新
+
+hida_unified_v2.HIDA を1体ずつ step() する代わりに、N体分の数値状態を
+NumPy配列に保持し、全エージェントを同じステップで一括して進める。
+シード掃引・アブレーション（test_entrainment_ablation.py）の高速化が目的。
+
+配列で保持する状態:
+- L1: energy, fatigue, damage, 位置・方向
+- L2: valence, arousal, qualia[N, 9], decay[N, 9], cause_strength[N, 7]
+- 各層のゲイン gain[N, 4]（= 前ステップのL5引き込みゲイン）
+- L4: activation_count
+- L5: EMA, 意識ON/OFF, 前ステップの活動量・主導層・主導強度・状態（_prev相当）
+
+数値の更新（L2の身体・誤差・危険ゾーン更新、行動の効果、減衰、L5の同期判定と
+引き込み）は配列演算で一括実行する。演算の順序はスカラー版と同一にしてあり、
+同じシードなら結果はスカラー版と完全に一致する（test_population_equivalence.py）。
+
+感覚入力・think・act も配列で一括処理する:
+- 各Worldの地形とオブジェクトを (N, 縦, 横) の格子に写し（最初の step() か
+  sync_worlds() で作る）、視野（周囲3×3 + 前方2〜4マス目）をまとめて読む
+- 内部マップ・訪問記録も格子の写しを持ち、予測誤差と記憶の活動量を一括で求める。
+  辞書（internal_maps / found_objects / visited）へは変化のあったマスだけ書く
+- think のボールの採点は (N, 色の数) の配列で行う。候補表は発見物の
+  ObjectIndex.version が変わったときだけ作り直す（色の好みは実行中固定）
+- act の向き決め・回転・前進（壁判定）は一括。目標でのつかむ/置く、NPCの確認、
+  探索のランダム選択と危険ゾーンの乱数判定（エージェントごとの乱数源）、
+  NPCの移動は該当するエージェントだけのループ
+
+格子は地形・内部マップ・オブジェクト番号・訪問記録で、およそ
+7 × N × (世界の一辺 + 8)² バイト（10×10の世界で1000体なら約2.3MB）。
+
+スループット（1000体一括とスカラー版の1体ずつの比較）は
+test_population_equivalence.py の出力を参照。残りの時間の多くはNPCの移動
+（World.step_npcs、スカラー版と共通）と、最初のステップでの格子の作成。
+
+スカラー版との違い:
+- 乱数はエージェントごとの random.Random(seed)（またはrngsで渡した乱数源）。
+  スカラー版で random.seed(seed) してから1体走らせた場合、あるいは
+  HIDAとWorldに同じ random.Random(seed) を渡した場合と同じ乱数列になる
+- 長期記憶・変調値の永続化は行わない（ファイルI/Oなし）。記憶すべき
+  イベントは events[i] に (step, event) として記録する
+- 言語化（reflect）は行わない（step(verbose=False) 相当）
+- 各エージェントは自分専用のWorldを持つ（ボール取得・NPC移動が世界を変えるため）
+
+依存: NumPy
+"""
+
+import random
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import hida_unified_v2 as h
+
+
+# 個別クオリア・感情の原因の並び（スカラー版L2Qualiaの固定インデックスと同一）
+QUALIA_KEYS = h.QUALIA_KEYS
+Q = h.QUALIA_INDEX
+CAUSE_KEYS = h.CAUSE_KEYS
+C = h.CAUSE_INDEX
+
+# 層・方向
+LAYERS = ('L1', 'L2', 'L3', 'L4')
+DIRS = ('N', 'E', 'S', 'W')
+DIR_DELTA = ((0, -1), (1, 0), (0, 1), (-1, 0))
+
+# 予測誤差の種類コード（0はパディング）
+ERR_NONE, ERR_NEW_OBJECT, ERR_DANGER, ERR_GOAL_FOUND = 0, 1, 2, 3
+ERR_CODES = {'new_object': ERR_NEW_OBJECT, 'danger': ERR_DANGER, 'goal_found': ERR_GOAL_FOUND}
+_ERR_NAMES = {code: name for name, code in ERR_CODES.items()}
+
+# 視野のスロット: 周囲3×3（L1Body.look と同じ順）+ 前方2〜4マス目（向きごとの相対位置）
+N_WINDOW = len(h._NEIGHBORS3)
+_DIR_DX = np.array([dx for dx, _ in DIR_DELTA])
+_DIR_DY = np.array([dy for _, dy in DIR_DELTA])
+_RAY_DX = np.outer(_DIR_DX, np.arange(1, 5))    # [向き, 1〜4マス目]
+_RAY_DY = np.outer(_DIR_DY, np.arange(1, 5))
+_SLOT_DX = np.hstack([np.tile([dx for dx, _, _ in h._NEIGHBORS3], (4, 1)), _RAY_DX[:, 1:]])
+_SLOT_DY = np.hstack([np.tile([dy for _, dy, _ in h._NEIGHBORS3], (4, 1)), _RAY_DY[:, 1:]])
+_PAD = 4    # 格子の外周の余白（視野が世界の外に出ても壁として読める）
+
+# 内部マップの配列版のコード（0〜2は CELL_TYPES のインデックス）
+_KNOWN_MISSING = -1     # マップにない
+_KNOWN_OTHER = 3        # CELL_TYPES 以外の値
+_KNOWN_UNKNOWN = 4      # 'unknown' と書かれている
+_KNOWN_CODES = {**{cell: code for code, cell in enumerate(h.CELL_TYPES)}, 'unknown': _KNOWN_UNKNOWN}
+
+# think() の行動コード・act() のイベントコード
+_ACT_EXPLORE, _ACT_BALL, _ACT_GOAL = 0, 1, 2
+_EV_NONE, _EV_GRAB, _EV_GOAL = 0, 1, 2
+
+# 行動の数値効果（エネルギー消費の基本量。スカラー版の L1Body と共通）
+_COST_FORWARD = h.L1Body.COST_FORWARD
+_COST_TURN = h.L1Body.COST_TURN
+_COST_HAND = h.L1Body.COST_HAND
+_COST_LOOK = h.L1Body.COST_LOOK
+_FATIGUE_PER_ENERGY = h.L1Body.FATIGUE_PER_ENERGY
+
+
+def _seq_sum(cols: np.ndarray) -> np.ndarray:
+    """列を左から順に足す（Pythonのsum()と同じ加算順序を保つ）
+
+    np.sum はペアワイズ加算のため、スカラー版と丸め誤差が一致しない。
+    """
+    acc = cols[:, 0].copy()
+    for j in range(1, cols.shape[1]):
+        acc = acc + cols[:, j]
+    return acc
+
+
+def _clip01(x: np.ndarray) -> np.ndarray:
+    return np.minimum(np.maximum(x, 0.0), 1.0)
+
+
+class HIDAPopulation:
+    """N体のHIDAを配列で保持し、一括でステップを進める集団エンジン"""
+
+    def __init__(self, worlds: List[h.World], color_preferences=None,
+                 seeds=None, modulations=None, entrain_k=None,
+                 stop_when_done: bool = True, rngs=None, planner: Optional[h.PathPlanner] = None):
+        """
+        worlds: エージェントごとのWorld（長さN、共有不可）
+        color_preferences: 色の好み（dict 1つで全員共通、またはN個のリスト）
+        seeds: エージェントごとの乱数シード（Noneなら 0..N-1）
+        modulations: L4変調値（dict 1つで全員共通、またはN個のリスト）
+        entrain_k: ENTRAIN_K（スカラーまたは長さNの配列）。Noneならクラス定数
+        stop_when_done: ゴール到達・エネルギー切れのエージェントを以降停止する
+                        （run_test / run_one のbreakと同じ）
+        rngs: エージェントごとの乱数源（random.Random、長さN）。指定時はseedsより優先。
+              h.spawn_rng(ルートシード, 'agent', i) などで作る
+        planner: 目標への移動に使う経路計画（h.PathPlanner、全エージェントで共有）。
+                 Noneなら貪欲な向き決め（HIDA(planner=None) と同じ）
+        """
+        n = len(worlds)
+        self.n = n
+        self.worlds = list(worlds)
+        self.stop_when_done = stop_when_done
+        self.planner = planner
+
+        if rngs is not None:
+            self.rngs = list(rngs)
+        else:
+            seeds = list(range(n)) if seeds is None else list(seeds)
+            self.rngs = [random.Random(s) for s in seeds]
+
+        # L5 初期DNA（スカラー版のクラス定数を引き継ぐ）
+        L5 = h.L5Consciousness
+        self.LEADER_THRESHOLD = L5.LEADER_THRESHOLD
+        self.EMA_ALPHA = L5.EMA_ALPHA
+        self.ON_THRESHOLD = L5.ON_THRESHOLD
+        self.OFF_THRESHOLD = L5.OFF_THRESHOLD
+        self.LAG_WEIGHT = L5.LAG_WEIGHT
+        k = L5.ENTRAIN_K if entrain_k is None else entrain_k
+        self.entrain_k = np.broadcast_to(np.asarray(k, dtype=float), (n,)).copy()
+
+        # --- L1: 身体 ---
+        self.position = np.zeros((n, 2), dtype=np.int64)
+        self.direction = np.zeros(n, dtype=np.int8)   # DIRSのインデックス
+        self.energy = np.ones(n)
+        self.fatigue = np.zeros(n)
+        self.damage = np.zeros(n)
+        self.holding: List[Optional[Dict]] = [None] * n
+        self.last_grabbed_color: List[str] = ['unknown'] * n
+
+        # --- L2: クオリア ---
+        proto = h.L2Qualia()
+        self.valence = np.zeros(n)
+        self.arousal = np.zeros(n)
+        self.qualia = np.tile([proto.qualia[k] for k in QUALIA_KEYS], (n, 1))
+        self.decay = np.tile([proto.decay[k] for k in QUALIA_KEYS], (n, 1))
+        self.cause_strength = np.zeros((n, len(CAUSE_KEYS)))
+        self.cause_decay = np.array([proto.cause_decay[k] for k in CAUSE_KEYS])
+        self.causes: List[Dict[str, Optional[str]]] = [dict.fromkeys(CAUSE_KEYS) for _ in range(n)]
+        if color_preferences is None or isinstance(color_preferences, dict):
+            self.color_preference = [dict(color_preferences or proto.color_preference)
+                                     for _ in range(n)]
+        else:
+            self.color_preference = [dict(c or proto.color_preference) for c in color_preferences]
+
+        # L4変調値（セッション中は固定。think()で参照）
+        default_mod = {'fear_weight': 1.0, 'safe_preference': 0.0, 'energy_caution': 0.0}
+        if modulations is None or isinstance(modulations, dict):
+            mods = [modulations or default_mod] * n
+        else:
+            mods = list(modulations)
+        self.fear_weight = np.array([m.get('fear_weight', 1.0) for m in mods], dtype=float)
+        self.safe_preference = np.array([m.get('safe_preference', 0.0) for m in mods], dtype=float)
+        self.energy_caution = np.array([m.get('energy_caution', 0.0) for m in mods], dtype=float)
+
+        # --- 各層のゲイン（列: L1..L4） ---
+        self.gain = np.ones((n, 4))
+
+        # --- L3/L4: 予測誤差と記憶 ---
+        self.errors: List[List[Dict]] = [[] for _ in range(n)]
+        self.internal_maps: List[Dict] = [h.VersionedMap() for _ in range(n)]
+        self.found_objects: List[Dict] = [h.ObjectIndex() for _ in range(n)]
+        self.visited: List[set] = [set() for _ in range(n)]
+        self.activation_count = np.zeros(n)
+        self.events: List[List] = [[] for _ in range(n)]
+
+        # --- L5: 意識 ---
+        self.is_conscious = np.zeros(n, dtype=bool)
+        self.sync_score = np.zeros(n)
+        self.sync_type = np.full(n, -1, dtype=np.int8)   # -1=None, 0..3=L1..L4
+        self.leader_strength = np.zeros(n)
+        self.sync_coherence = np.zeros(n)
+        self.last_activities = np.zeros((n, 4))
+        self._ema = np.zeros(n)
+        self._prev_activities = np.zeros((n, 4))
+        self._prev_leader = np.full(n, -1, dtype=np.int8)
+        self._prev_leader_strength = np.zeros(n)
+        self._prev_energy = np.ones(n)
+        self._prev_fatigue = np.zeros(n)
+        self._prev_valence = np.zeros(n)
+        self._prev_arousal = np.zeros(n)
+        self._prev_qualia = np.zeros((n, len(QUALIA_KEYS)))   # スカラー版の初期値（全0）と同じ
+        self._prev_activation = np.zeros(n)
+
+        self.step_count = np.zeros(n, dtype=np.int64)
+        self.active = np.ones(n, dtype=bool)
+
+        # --- 格子（最初の step() か sync_worlds() で作る） ---
+        self._terrain = None        # 地形 [N, 縦, 横]（CELL_* コード、外周は壁）
+        self._objects = None        # オブジェクト番号 [N, 縦, 横]（0=なし）
+        self._object_table = [None]
+        self._known = None          # 内部マップの配列版 [N, 縦, 横]（_KNOWN_* / CELL_* コード）
+        self._seen = None           # 訪問記録の配列版 [N, 縦, 横]
+        self._side = 0
+        self._map_src: List = [None] * n        # (内部マップ, version): 配列版を作った時点
+        self._visited_src: List = [None] * n    # (訪問記録, 要素数)
+
+        # think() の候補表（発見物の (ObjectIndex, version) が変わったら作り直す）
+        self._found_src: List = [None] * n
+        self._cand_x = np.zeros((n, 0), dtype=np.int64)
+        self._cand_y = np.zeros((n, 0), dtype=np.int64)
+        self._cand_pref = np.zeros((n, 0))      # 色の好み × 10
+        self._cand_rotten = np.zeros((n, 0), dtype=bool)
+        self._cand_valid = np.zeros((n, 0), dtype=bool)
+        self._cand_colors: List[List[str]] = [[] for _ in range(n)]
+        self._goal = np.zeros((n, 2), dtype=np.int64)
+        self._has_goal = np.zeros(n, dtype=bool)
+
+    @classmethod
+    def from_agents(cls, agents: List[h.HIDA], worlds: List[h.World], seeds=None,
+                    stop_when_done: bool = True) -> 'HIDAPopulation':
+        """既存のスカラー版エージェント群から集団を作る（状態は複製される）
+
+        seedsを省略し、全エージェントが自分の乱数源（HIDA(rng=...)）を持つ場合は
+        その乱数源をそのまま引き継ぐ（共有されるので、以降は集団側で消費される）。
+        """
+        rngs = None
+        if seeds is None and all(a.rng is not random for a in agents):
+            rngs = [a.rng for a in agents]
+        # 経路計画は全員が同じPathPlannerを使っている場合だけ引き継ぐ
+        planner = agents[0].planner if agents and all(a.planner is agents[0].planner
+                                                      for a in agents) else None
+        pop = cls(worlds, color_preferences=[a.l2.color_preference for a in agents],
+                  seeds=seeds, modulations=[a.l4.get_modulation() for a in agents],
+                  entrain_k=[a.l5.ENTRAIN_K for a in agents], stop_when_done=stop_when_done,
+                  rngs=rngs, planner=planner)
+        for i, a in enumerate(agents):
+            pop.position[i] = a.l1.position
+            pop.direction[i] = DIRS.index(a.l1.direction)
+            pop.energy[i] = a.l1.energy
+            pop.fatigue[i] = a.l1.fatigue
+            pop.damage[i] = a.l1.damage
+            pop.holding[i] = a.l1.holding
+            pop.last_grabbed_color[i] = getattr(a, '_last_grabbed_color', 'unknown')
+            pop.valence[i] = a.l2.valence
+            pop.arousal[i] = a.l2.arousal
+            pop.qualia[i] = [a.l2.qualia[k] for k in QUALIA_KEYS]
+            pop.decay[i] = [a.l2.decay.get(k, 0.95) for k in QUALIA_KEYS]
+            pop.cause_strength[i] = [a.l2.cause_strength[k] for k in CAUSE_KEYS]
+            pop.causes[i] = dict(a.l2.causes)
+            pop.gain[i] = [a.l5.entrain_gain[k] for k in LAYERS]
+            pop.errors[i] = list(a.l3.errors)
+            pop.internal_maps[i] = h.VersionedMap(a.l4.internal_map)
+            pop.found_objects[i] = h.ObjectIndex(a.l4.found_objects)
+            pop.visited[i] = set(a.l4.visited)
+            pop.activation_count[i] = a.l4.activation_count
+            l5 = a.l5
+            pop.is_conscious[i] = l5.is_conscious
+            pop.sync_score[i] = l5.sync_score
+            pop.sync_type[i] = LAYERS.index(l5.sync_type) if l5.sync_type else -1
+            pop.leader_strength[i] = l5.leader_strength
+            pop.sync_coherence[i] = l5.sync_coherence
+            pop.last_activities[i] = [l5.last_activities.get(k, 0.0) for k in LAYERS]
+            pop._ema[i] = l5._ema
+            pop._prev_activities[i] = [l5._prev_activities.get(k, 0.0) for k in LAYERS]
+            pop._prev_leader[i] = LAYERS.index(l5._prev_leader) if l5._prev_leader else -1
+            pop._prev_leader_strength[i] = l5._prev_leader_strength
+            pop._prev_energy[i] = l5._prev['l1_energy']
+            pop._prev_fatigue[i] = l5._prev['l1_fatigue']
+            pop._prev_valence[i] = l5._prev['l2_valence']
+            pop._prev_arousal[i] = l5._prev['l2_arousal']
+            pop._prev_qualia[i] = [l5._prev['l2_qualia'].get(k, 0) for k in QUALIA_KEYS]
+            pop._prev_activation[i] = l5._prev['l4_found_count']
+            pop.step_count[i] = a.step_count
+        return pop
+
+    # ==========================================
+    # 参照用
+    # ==========================================
+
+    def get_cause(self, i: int, emotion: str) -> Optional[str]:
+        """感情の原因を返す（忘れてたらNone）: L2Qualia.get_cause 相当"""
+        if emotion in C and self.cause_strength[i, C[emotion]] > 0.1:
+            return self.causes[i].get(emotion)
+        return None
+
+    def get_qualia(self, i: int) -> Dict[str, float]:
+        """エージェントiの個別クオリアを辞書で返す"""
+        return dict(zip(QUALIA_KEYS, self.qualia[i].tolist()))
+
+    # ==========================================
+    # 格子（Worldと記憶の配列版）
+    # ==========================================
+
+    def sync_worlds(self):
+        """各Worldの地形とオブジェクトを (N, 縦, 横) の配列に写し直す
+
+        step() は最初の呼び出しでこれを行い、以降はボール取得による
+        オブジェクトの削除だけを配列に反映する。実行中にWorldを外から
+        書き換えた（壁・危険ゾーン・オブジェクトを足した）ときに呼ぶこと。
+        """
+        size = max(w.size for w in self.worlds)
+        side = size + 2 * _PAD
+        terrain = np.full((self.n, side, side), h.CELL_WALL, dtype=np.uint8)
+        objects = np.zeros((self.n, side, side), dtype=np.int32)
+        table = [None]      # オブジェクト番号 → オブジェクト（0は「なし」）
+        for i, world in enumerate(self.worlds):
+            s = world.size
+            terrain[i, _PAD:_PAD + s, _PAD:_PAD + s] = \
+                np.frombuffer(world.cells, dtype=np.uint8).reshape(s, s)
+            for (x, y), obj in world.objects.items():
+                if -_PAD <= x < size + _PAD and -_PAD <= y < size + _PAD:
+                    objects[i, y + _PAD, x + _PAD] = len(table)
+                    table.append(obj)
+        if self._known is None or self._known.shape[1] != side:
+            self._known = np.full((self.n, side, side), _KNOWN_MISSING, dtype=np.int8)
+            self._seen = np.zeros((self.n, side, side), dtype=bool)
+            self._map_src = [None] * self.n
+            self._visited_src = [None] * self.n
+        self._side = side
+        self._terrain = terrain
+        self._objects = objects
+        self._object_table = table
+
+    def _in_grid(self, x: int, y: int) -> bool:
+        lim = self._side - _PAD
+        return -_PAD <= x < lim and -_PAD <= y < lim
+
+    def _load_map(self, i: int):
+        """内部マップ（辞書）から配列版を作り直す"""
+        m = self.internal_maps[i]
+        row = self._known[i]
+        row.fill(_KNOWN_MISSING)
+        for (x, y), cell in m.items():
+            if self._in_grid(x, y):
+                row[y + _PAD, x + _PAD] = _KNOWN_CODES.get(cell, _KNOWN_OTHER)
+        self._map_src[i] = (m, getattr(m, 'version', None))
+
+    def _load_visited(self, i: int):
+        """訪問記録（集合）から配列版を作り直す"""
+        visited = self.visited[i]
+        row = self._seen[i]
+        row.fill(False)
+        for x, y in visited:
+            if self._in_grid(x, y):
+                row[y + _PAD, x + _PAD] = True
+        self._visited_src[i] = (visited, len(visited))
+
+    def _sync_memories(self, ids: List[int]):
+        """内部マップ・訪問記録が外から変わった（差し替えられた）エージェントの配列を作り直す
+
+        内部マップは VersionedMap.version、訪問記録は要素数で変化を検知する
+        （version のない素の dict は毎ステップ作り直す）。
+        """
+        for i in ids:
+            m = self.internal_maps[i]
+            src = self._map_src[i]
+            if src is None or src[0] is not m or src[1] is None or src[1] != m.version:
+                self._load_map(i)
+            visited = self.visited[i]
+            src = self._visited_src[i]
+            if src is None or src[0] is not visited or src[1] != len(visited):
+                self._load_visited(i)
+
+    def _load_candidates(self, i: int):
+        """think() の候補表（色ごとのボール・ゴール）を発見物から作り直す"""
+        found = self.found_objects[i]
+        balls = found.ball_candidates()
+        if len(balls) > self._cand_x.shape[1]:
+            grow = ((0, 0), (0, len(balls) - self._cand_x.shape[1]))
+            self._cand_x = np.pad(self._cand_x, grow)
+            self._cand_y = np.pad(self._cand_y, grow)
+            self._cand_pref = np.pad(self._cand_pref, grow)
+            self._cand_rotten = np.pad(self._cand_rotten, grow)
+            self._cand_valid = np.pad(self._cand_valid, grow)
+        pref = self.color_preference[i]
+        self._cand_valid[i] = False
+        for c, (color, (x, y)) in enumerate(balls):
+            self._cand_x[i, c] = x
+            self._cand_y[i, c] = y
+            self._cand_pref[i, c] = pref.get(color, 0.5) * 10
+            self._cand_rotten[i, c] = bool(found[(x, y)].get('rotten', False))
+            self._cand_valid[i, c] = True
+        self._cand_colors[i] = [color for color, _ in balls]
+        goal = found.goal_position()
+        self._has_goal[i] = goal is not None
+        if goal is not None:
+            self._goal[i] = goal
+        self._found_src[i] = (found, found.version)
+
+    # ==========================================
+    # 一括ステップ
+    # ==========================================
+
+    def step(self) -> Dict:
+        """全アクティブエージェントを1ステップ進める（HIDA.step(verbose=False)相当）
+
+        Returns: 全N体分の結果配列。'active' は今回進めたエージェントのマスク
+        """
+        active = self.active.copy()
+        ids = np.flatnonzero(active).tolist()
+        rows = np.asarray(ids, dtype=np.intp)
+        sel = slice(None) if len(ids) == self.n else rows
+        n_sel = len(ids)
+        Qf, Qd, Qs, Qc, Qu = Q['fear'], Q['desire'], Q['surprise'], Q['curiosity'], Q['urgency']
+        Qa, Qsad, Qj, Qdis = Q['anger'], Q['sadness'], Q['joy'], Q['disgust']
+
+        if self._terrain is None:
+            self.sync_worlds()
+        self._sync_memories(ids)
+        self.step_count[sel] += 1
+
+        # 前ステップのcheck_syncで決まった引き込みゲイン
+        gain = self.gain[sel]
+        g1, g2, g3, g4 = gain[:, 0], gain[:, 1], gain[:, 2], gain[:, 3]
+
+        energy = self.energy[sel]
+        fatigue = self.fatigue[sel]
+        damage = self.damage[sel]
+        valence = self.valence[sel]
+        arousal = self.arousal[sel]
+        qualia = self.qualia[sel]
+
+        # --- L2: 身体状態からクオリア更新（update_from_body） ---
+        low = energy < 0.3
+        valence = np.where(low, valence - 0.1 * g2, valence)
+        arousal = np.where(low, arousal - 0.05 * g2, arousal)
+        qualia[:, Qu] = np.where(low, np.minimum(1.0, qualia[:, Qu] + 0.2 * g2), qualia[:, Qu])
+        tired = fatigue > 0.5
+        valence = np.where(tired, valence - 0.05 * fatigue * g2, valence)
+        arousal = np.where(tired, arousal - 0.05 * fatigue * g2, arousal)
+        hurt = damage > 0
+        qualia[:, Qf] = np.where(hurt, np.minimum(1.0, qualia[:, Qf] + damage * 0.5 * g2), qualia[:, Qf])
+        valence = np.where(hurt, valence - damage * 0.3 * g2, valence)
+        valence = np.clip(valence, -1, 1)
+        arousal = np.clip(arousal, -1, 1)
+
+        # --- 感覚入力（L1 → L3 → L4） ---
+        xy = self.position[sel].copy()
+        x, y = xy[:, 0], xy[:, 1]
+        d = self.direction[sel].astype(np.intp)
+        l3_sum, count, etype, emag = self._sense(ids, rows, x, y, d, g3, g4, _seq_sum(qualia))
+
+        # L1: 見ることのエネルギー消費
+        amount = _COST_LOOK * g1
+        energy = np.maximum(0, energy - amount)
+        fatigue = np.minimum(1.0, fatigue + amount * _FATIGUE_PER_ENERGY)
+
+        # --- L2: 予測誤差からクオリア更新（誤差スロットごとに一括） ---
+        for k in np.flatnonzero(etype.any(axis=0)).tolist():
+            m = np.minimum(1.0, emag[:, k] * g2)
+            t = etype[:, k]
+            new = t == ERR_NEW_OBJECT
+            qualia[:, Qs] = np.where(new, np.minimum(1.0, qualia[:, Qs] + m * 0.5), qualia[:, Qs])
+            qualia[:, Qc] = np.where(new, np.minimum(1.0, qualia[:, Qc] + m * 0.3), qualia[:, Qc])
+            arousal = np.where(new, arousal + m * 0.2, arousal)
+            dng = t == ERR_DANGER
+            qualia[:, Qf] = np.where(dng, np.minimum(1.0, qualia[:, Qf] + m * 0.3), qualia[:, Qf])
+            valence = np.where(dng, valence - m * 0.2, valence)
+            arousal = np.where(dng, arousal + m * 0.3, arousal)
+            gf = t == ERR_GOAL_FOUND
+            qualia[:, Qd] = np.where(gf, np.minimum(1.0, qualia[:, Qd] + m * 0.5), qualia[:, Qd])
+            valence = np.where(gf, valence + m * 0.3, valence)
+        valence = np.clip(valence, -1, 1)
+        arousal = np.clip(arousal, -1, 1)
+
+        # --- L2: 危険ゾーンチェック ---
+        in_danger = self._terrain[rows, y + _PAD, x + _PAD] == h.CELL_DANGER
+        qualia[:, Qf] = np.where(in_danger, np.minimum(1.0, qualia[:, Qf] + 0.15 * g2),
+                                 np.maximum(0, qualia[:, Qf] - 0.05))
+        arousal = np.where(in_danger, np.minimum(1.0, arousal + 0.1 * g2), arousal)
+
+        # --- 思考（think）: 候補の採点を一括で ---
+        action, target, chosen = self._think(ids, rows, x, y, energy, qualia)
+        actions = [None] * self.n
+        for j, i in enumerate(ids):
+            a = action[j]
+            actions[i] = ('explore' if a == _ACT_EXPLORE else 'go_to_goal' if a == _ACT_GOAL
+                          else f'go_to_{self._cand_colors[i][chosen[j]]}')
+
+        # --- 行動（act）: 移動の解決を一括で（乱数を使う分岐はエージェントごと） ---
+        fx = self._act(ids, rows, x, y, d, action, target)
+        x, y = fx['x'], fx['y']
+        self.position[sel] = np.stack([x, y], axis=1)
+        self.direction[sel] = fx['direction']
+
+        # 訪問記録（mark_visited）
+        new_visit = ~self._seen[rows, y + _PAD, x + _PAD]
+        self.activation_count[sel] = count + np.where(new_visit, h.L4Memory.ACT_NEW_VISIT * g4, 0.0)
+        if new_visit.any():
+            self._seen[rows, y + _PAD, x + _PAD] = True
+            for j, px, py in zip(np.flatnonzero(new_visit).tolist(),
+                                 x[new_visit].tolist(), y[new_visit].tolist()):
+                i = ids[j]
+                self.visited[i].add((px, py))
+                self._visited_src[i] = (self.visited[i], len(self.visited[i]))
+
+        # --- 行動の数値効果を一括適用 ---
+        amount = fx['cost'] * g1
+        energy = np.maximum(0, energy - amount)
+        fatigue = np.minimum(1.0, fatigue + amount * _FATIGUE_PER_ENERGY)
+
+        rotten = fx['rotten']
+        qualia[:, Qdis] = np.where(rotten, np.minimum(1.0, qualia[:, Qdis] + 0.6), qualia[:, Qdis])
+        valence = np.where(rotten, valence - 0.4, valence)
+
+        blocked = fx['blocked']
+        qualia[:, Qa] = np.where(blocked, np.minimum(1.0, qualia[:, Qa] + 0.3), qualia[:, Qa])
+        arousal = np.where(blocked, arousal + 0.2, arousal)
+
+        pain = fx['pain']
+        qualia[:, Qf] = np.where(pain, np.minimum(1.0, qualia[:, Qf] + 0.4), qualia[:, Qf])
+        qualia[:, Qa] = np.where(pain, np.minimum(1.0, qualia[:, Qa] + 0.2), qualia[:, Qa])
+        valence = np.where(pain, valence - 0.3, valence)
+        arousal = np.where(pain, arousal + 0.3, arousal)
+
+        drained = fx['tired']
+        energy = np.where(drained, np.maximum(0, energy - 0.15), energy)
+        qualia[:, Qsad] = np.where(drained, np.minimum(1.0, qualia[:, Qsad] + 0.15), qualia[:, Qsad])
+
+        cause_strength = self.cause_strength[sel]
+        cause_strength[:, C['anger']] = np.where(blocked | pain, 1.0, cause_strength[:, C['anger']])
+        cause_strength[:, C['fear']] = np.where(pain, 1.0, cause_strength[:, C['fear']])
+
+        # --- ボール取得・ゴール到達のイベント ---
+        event = fx['event']
+        goal = event == _EV_GOAL
+        joy_bonus = np.zeros(n_sel, dtype=bool)
+        for j in np.flatnonzero(pain | drained | (event != _EV_NONE)).tolist():
+            i = ids[j]
+            step_no = int(self.step_count[i])
+            if pain[j]:
+                self.events[i].append((step_no, "danger_pain"))
+            if drained[j]:
+                self.events[i].append((step_no, "danger_fatigue"))
+            if event[j] == _EV_GRAB:
+                self.events[i].append((step_no, f"grabbed_{self.last_grabbed_color[i]}"))
+            elif event[j] == _EV_GOAL:
+                color = self.last_grabbed_color[i]
+                joy_bonus[j] = self.color_preference[i].get(color, 0.5) > 0.7
+                self.events[i].append((step_no, f"goal_reached_with_{color}"))
+        qualia[:, Qj] = np.where(goal, np.minimum(1.0, qualia[:, Qj] + 0.5), qualia[:, Qj])
+        qualia[:, Qj] = np.where(joy_bonus, np.minimum(1.0, qualia[:, Qj] + 0.3), qualia[:, Qj])
+        valence = np.where(goal, valence + 0.3, valence)
+
+        # --- クオリア減衰（decay_qualia） ---
+        qualia = qualia * self.decay[sel]
+        valence = valence * 0.98
+        arousal = arousal * 0.95
+        cause_strength = cause_strength * self.cause_decay
+        cause_strength[cause_strength < 0.1] = 0.0
+
+        self.energy[sel] = energy
+        self.fatigue[sel] = fatigue
+        self.valence[sel] = valence
+        self.arousal[sel] = arousal
+        self.qualia[sel] = qualia
+        self.cause_strength[sel] = cause_strength
+
+        # --- L5: 同期判定と引き込み ---
+        self._check_sync(sel, l3_sum)
+
+        # --- NPCを動かす（エージェントごとの乱数） ---
+        for i in ids:
+            self.worlds[i].step_npcs(self.rngs[i])
+
+        goal_all = np.zeros(self.n, dtype=bool)
+        goal_all[sel] = goal
+        if self.stop_when_done:
+            self.active &= ~(goal_all | (self.energy <= 0))
+
+        return {
+            'active': active,
+            'step': self.step_count.copy(),
+            'action': actions,
+            'position': self.position.copy(),
+            'energy': self.energy.copy(),
+            'holding': list(self.holding),
+            'conscious': self.is_conscious.copy(),
+            'sync_score': self.sync_score.copy(),
+            'sync_type': self.sync_type.copy(),
+            'leader_strength': self.leader_strength.copy(),
+            'sync_coherence': self.sync_coherence.copy(),
+            'goal_reached': goal_all,
+        }
+
+    def _sense(self, ids, rows, x, y, d, g3, g4, qualia_intensity):
+        """L1の視野 → L3予測比較 → L4記憶更新（HIDA.sense の世界依存部分）の一括版
+
+        視野のスロット（周囲3×3 + 前方2〜4マス目）ごとに、地形・オブジェクト・
+        内部マップを配列から読む。予測誤差はスロットごとに [オブジェクトの誤差,
+        未知の危険ゾーンの誤差] の2列で表す（スカラー版の誤差リストと同じ順序。
+        誤差のない列は0で、後段の加算・更新では何もしない）。
+        辞書（内部マップ・発見物）への書き込みは、値が変わるマスとオブジェクトの
+        見えたマスだけ。
+
+        Returns: (予測誤差の強度合計, L4活動量, 誤差の種類[n, 2×スロット], 誤差の強度)
+        """
+        P = _PAD
+        r = rows[:, None]
+        sx = x[:, None] + _SLOT_DX[d] + P
+        sy = y[:, None] + _SLOT_DY[d] + P
+        cells = self._terrain[r, sy, sx]
+        # 前方は壁の手前まで（1〜4マス目のどこかが壁なら、その先は見えない）
+        ray = self._terrain[r, y[:, None] + _RAY_DY[d] + P, x[:, None] + _RAY_DX[d] + P]
+        valid = np.ones(cells.shape, dtype=bool)
+        valid[:, N_WINDOW:] = ~np.logical_or.accumulate(ray == h.CELL_WALL, axis=1)[:, 1:]
+        objs = np.where(valid, self._objects[r, sy, sx], 0)
+        known = self._known[r, sy, sx]
+
+        # オブジェクトの見えたスロット（まばら）: 新規かどうかの判定と発見物の更新
+        new_obj = np.zeros(cells.shape, dtype=bool)
+        goal_obj = np.zeros(cells.shape, dtype=bool)
+        hits = {}   # (j, スロット) -> (位置, オブジェクト): 新規発見のみ
+        oj, os_ = np.nonzero(objs)
+        table = self._object_table
+        for j, s, px, py, oid in zip(oj.tolist(), os_.tolist(), (sx[oj, os_] - P).tolist(),
+                                     (sy[oj, os_] - P).tolist(), objs[oj, os_].tolist()):
+            found = self.found_objects[ids[j]]
+            obj = table[oid]
+            pos = (px, py)
+            if pos not in found:
+                new_obj[j, s] = True
+                goal_obj[j, s] = obj.get('name') == 'goal'
+                hits[(j, s)] = (pos, obj)
+            if dict.get(found, pos) is not obj:
+                found[pos] = obj
+
+        # L3: 予測誤差
+        danger = cells == h.CELL_DANGER
+        unseen = (known == _KNOWN_MISSING) | (known == _KNOWN_UNKNOWN)
+        cell_err = valid & unseen & danger
+        width = cells.shape[1]
+        etype = np.zeros((len(ids), 2 * width), dtype=np.int8)
+        emag = np.zeros((len(ids), 2 * width))
+        etype[:, 0::2] = np.where(new_obj, np.where(goal_obj, ERR_GOAL_FOUND,
+                                                    np.where(danger, ERR_DANGER, ERR_NEW_OBJECT)),
+                                  ERR_NONE)
+        emag[:, 0::2] = np.where(new_obj, np.where(danger, np.minimum(1.0, g3)[:, None],
+                                                   np.minimum(1.0, 0.8 * g3)[:, None]), 0.0)
+        etype[:, 1::2] = np.where(cell_err, ERR_DANGER, ERR_NONE)
+        emag[:, 1::2] = np.where(cell_err, np.minimum(1.0, 0.6 * g3)[:, None], 0.0)
+
+        errors = self.errors
+        for i in ids:
+            if errors[i]:
+                errors[i] = []
+        ej, ec = np.nonzero(etype)
+        for j, c in zip(ej.tolist(), ec.tolist()):
+            s = c // 2
+            if c % 2 == 0:
+                pos, obj = hits[(j, s)]
+                error = {'type': _ERR_NAMES[etype[j, c]], 'pos': pos, 'object': obj,
+                         'magnitude': float(emag[j, c])}
+            else:
+                error = {'type': 'danger', 'pos': (int(sx[j, s]) - P, int(sy[j, s]) - P),
+                         'magnitude': float(emag[j, c])}
+            errors[ids[j]].append(error)
+        l3_sum = np.zeros(len(ids))
+        for c in range(2 * width):
+            l3_sum = l3_sum + emag[:, c]
+
+        # L4: 感覚データから記憶更新（スロット順に足す。増加量はL4Memoryの初期DNA）
+        mem = h.L4Memory
+        cell_inc = np.where(valid & (known == _KNOWN_MISSING), (mem.ACT_NEW_CELL * g4)[:, None], 0.0)
+        obj_inc = np.where(objs > 0, np.where(new_obj, (mem.ACT_NEW_OBJECT * g4)[:, None],
+                                              (mem.ACT_REOBSERVE * g4)[:, None]), 0.0)
+        count = self.activation_count[rows]
+        for s in range(width):
+            count = count + cell_inc[:, s]
+            count = count + obj_inc[:, s]
+
+        changed = valid & (known != cells)
+        if changed.any():
+            cj, cs = np.nonzero(changed)
+            touched = set()
+            for j, px, py, c in zip(cj.tolist(), (sx[cj, cs] - P).tolist(),
+                                    (sy[cj, cs] - P).tolist(), cells[cj, cs].tolist()):
+                self.internal_maps[ids[j]][(px, py)] = h.CELL_TYPES[c]
+                touched.add(ids[j])
+            self._known[r, sy, sx] = np.where(valid, cells, known)
+            for i in touched:
+                m = self.internal_maps[i]
+                if self._map_src[i][1] is not None:
+                    self._map_src[i] = (m, m.version)
+
+        # L4: 予測誤差から記憶更新（新規発見のオブジェクトに記憶の強さをつける）
+        if hits:
+            qi = qualia_intensity.tolist()
+            for (j, s), (pos, obj) in hits.items():
+                self.found_objects[ids[j]][pos] = {**obj, 'memory_strength': qi[j]}
+            err_inc = np.where(new_obj, ((mem.ACT_ERROR_BASE + qualia_intensity) * g4)[:, None], 0.0)
+            for s in range(width):
+                count = count + err_inc[:, s]
+
+        return l3_sum, count, etype, emag
+
+    def _think(self, ids, rows, x, y, energy, qualia):
+        """HIDA.think と同じ行動決定の一括版
+
+        Returns: (行動コード, 目標位置[n, 2], 選んだボールの候補番号)
+        """
+        for i in ids:
+            found = self.found_objects[i]
+            src = self._found_src[i]
+            if src is None or src[0] is not found or src[1] != found.version:
+                self._load_candidates(i)
+        n_sel = len(ids)
+        holding = np.array([bool(self.holding[i]) for i in ids], dtype=bool)
+        to_goal = holding & self._has_goal[rows]
+        valid = self._cand_valid[rows]
+        to_ball = ~to_goal & ~holding & valid.any(axis=1)
+
+        action = np.where(to_goal, _ACT_GOAL, np.where(to_ball, _ACT_BALL, _ACT_EXPLORE))
+        target = self._goal[rows].copy()
+        chosen = np.zeros(n_sel, dtype=np.intp)
+        if not to_ball.any() or valid.shape[1] == 0:
+            return action, target, chosen
+
+        cx, cy = self._cand_x[rows], self._cand_y[rows]
+        dist = np.abs(cx - x[:, None]) + np.abs(cy - y[:, None])
+        lim = self._side - _PAD
+        inside = (cx >= -_PAD) & (cx < lim) & (cy >= -_PAD) & (cy < lim)
+        is_danger = inside & (self._known[rows[:, None], np.clip(cy + _PAD, 0, self._side - 1),
+                                          np.clip(cx + _PAD, 0, self._side - 1)] == h.CELL_DANGER)
+        for j, c in zip(*np.nonzero(valid & ~inside)):
+            is_danger[j, c] = self.internal_maps[ids[j]].get((int(cx[j, c]), int(cy[j, c]))) == 'danger'
+
+        urgency = qualia[:, Q['urgency']]
+        fear = qualia[:, Q['fear']]
+        disgust = qualia[:, Q['disgust']]
+        fear_weight = self.fear_weight[rows]
+        safe_pref = self.safe_preference[rows]
+        energy_caution = self.energy_caution[rows]
+
+        dist_penalty = -dist * (0.5 + urgency)[:, None]
+        base_danger = -3 * fear_weight
+        fear_penalty = -5 * fear * fear_weight
+        danger_penalty = np.where(is_danger, (base_danger + fear_penalty)[:, None], 0.0)
+        safe_bonus = np.where(~is_danger, (safe_pref * 2)[:, None], 0.0)
+        energy_penalty = np.where((dist > 3) & (energy < 0.5)[:, None],
+                                  (-5 * (1 - energy) * (1 + energy_caution))[:, None], 0.0)
+        disgust_penalty = np.where(self._cand_rotten[rows], (-8 * (1 + disgust))[:, None], 0.0)
+        scores = self._cand_pref[rows] + dist_penalty + danger_penalty + safe_bonus + \
+            energy_penalty + disgust_penalty
+        # 同点なら候補の並び順（色が最初に見つかった順）で先勝ち
+        chosen = np.argmax(np.where(valid, scores, -np.inf), axis=1)
+        pick = np.arange(n_sel)
+        target[:, 0] = np.where(to_ball, cx[pick, chosen], target[:, 0])
+        target[:, 1] = np.where(to_ball, cy[pick, chosen], target[:, 1])
+        return action, target, chosen
+
+    def _act(self, ids, rows, x, y, d, action, target):
+        """HIDA.act の一括版
+
+        向き決め・回転・前進（壁判定）は配列で一括に解決する。目標での
+        つかむ/置く、NPCの確認、探索のランダムな行動選択、危険ゾーンの
+        判定は、該当するエージェントだけをループで処理する。
+
+        Returns: 移動後の位置・向きと数値効果（コスト・各種マスク・イベント）
+        """
+        n_sel = len(ids)
+        P = _PAD
+        cost = np.zeros(n_sel)
+        rotten = np.zeros(n_sel, dtype=bool)
+        blocked = np.zeros(n_sel, dtype=bool)
+        event = np.full(n_sel, _EV_NONE, dtype=np.int8)
+        new_dir = d.copy()
+        tx, ty = target[:, 0], target[:, 1]
+        has_target = action != _ACT_EXPLORE
+
+        # 目標に着いている: つかむ / ゴールに置く
+        at = has_target & (x == tx) & (y == ty)
+        for j in np.flatnonzero(at).tolist():
+            i = ids[j]
+            world = self.worlds[i]
+            gx, gy = int(tx[j]), int(ty[j])
+            obj = world.get_object(gx, gy)
+            if obj and obj.get('name') == 'ball' and not self.holding[i]:
+                self.last_grabbed_color[i] = obj.get('color', 'unknown')
+                rotten[j] = bool(obj.get('rotten'))
+                self.holding[i] = obj
+                cost[j] = _COST_HAND
+                world.remove_object(gx, gy)
+                if self._in_grid(gx, gy):
+                    self._objects[i, gy + P, gx + P] = 0
+                self.found_objects[i].pop((gx, gy), None)
+                event[j] = _EV_GRAB
+            elif obj and obj.get('name') == 'goal' and self.holding[i]:
+                self.holding[i] = None
+                cost[j] = _COST_HAND
+                event[j] = _EV_GOAL
+
+        # 目標に向かう: 向きを決め、違えば回転、合っていれば前進
+        move = has_target & ~at
+        dx = np.sign(tx - x)
+        dy = np.sign(ty - y)
+        if self.planner is not None:
+            for j in np.flatnonzero(move).tolist():
+                i = ids[j]
+                hx, hy = int(x[j]), int(y[j])
+                step = self.planner.next_step(self.internal_maps[i], (hx, hy),
+                                              (int(tx[j]), int(ty[j])), float(self.fear_weight[i]))
+                if step is not None:
+                    dx[j], dy[j] = step[0] - hx, step[1] - hy
+        td = np.where(dx > 0, 1, np.where(dx < 0, 3, np.where(dy > 0, 2, 0)))
+        turn = move & (d != td)
+        new_dir = np.where(turn, np.where((td - d) % 4 == 1, (d + 1) % 4, (d - 1) % 4), new_dir)
+        cost = np.where(turn, _COST_TURN, cost)
+        ahead = move & (d == td)
+        fx_, fy_ = x + _DIR_DX[d], y + _DIR_DY[d]
+        for j in np.flatnonzero(ahead).tolist():
+            i = ids[j]
+            npc = self.worlds[i].get_npc_at(int(fx_[j]), int(fy_[j]))
+            if npc:
+                blocked[j] = True
+                self.causes[i]['anger'] = f"{npc.name}に進路を塞がれた"
+        forward = ahead & ~blocked
+
+        # 探索: ランダムに前進・左・右（エージェントごとの乱数）
+        for j in np.flatnonzero(~has_target).tolist():
+            choice = self.rngs[ids[j]].choice(['forward', 'left', 'right'])
+            if choice == 'forward':
+                forward[j] = True
+            else:
+                new_dir[j] = (d[j] - 1) % 4 if choice == 'left' else (d[j] + 1) % 4
+                cost[j] = _COST_TURN
+
+        # 前進（壁なら動かない）
+        wall = self._terrain[rows, fy_ + P, fx_ + P] == h.CELL_WALL
+        moved = forward & ~wall
+        x = np.where(moved, fx_, x)
+        y = np.where(moved, fy_, y)
+        cost = np.where(forward, np.where(wall, 0.0, _COST_FORWARD), cost)
+
+        # 前進を試みた先（動けなければ今の位置）が危険ゾーンなら痛み・疲労の判定
+        pain = np.zeros(n_sel, dtype=bool)
+        tired = np.zeros(n_sel, dtype=bool)
+        hazard = forward & (self._terrain[rows, y + P, x + P] == h.CELL_DANGER)
+        for j in np.flatnonzero(hazard).tolist():
+            i = ids[j]
+            rng = self.rngs[i]
+            pain[j] = rng.random() < 0.33
+            tired[j] = rng.random() < 0.33
+            if pain[j]:
+                self.causes[i]['fear'] = "危険ゾーンで痛みを受けた"
+                self.causes[i]['anger'] = "危険ゾーンで痛みを受けた"
+
+        return {'x': x, 'y': y, 'direction': new_dir, 'cost': cost, 'rotten': rotten,
+                'blocked': blocked, 'pain': pain, 'tired': tired, 'event': event}
+
+    def _check_sync(self, sel, l3_sum: np.ndarray):
+        """L5Consciousness.check_sync の一括版"""
+        energy = self.energy[sel]
+        fatigue = self.fatigue[sel]
+        valence = self.valence[sel]
+        arousal = self.arousal[sel]
+        qualia = self.qualia[sel]
+        count = self.activation_count[sel]
+
+        # Step 1: 活動量（前ステップからの変化量）
+        l1_act = _clip01(np.abs(energy - self._prev_energy[sel]) +
+                         np.abs(fatigue - self._prev_fatigue[sel]))
+        l2_change = np.abs(valence - self._prev_valence[sel]) + \
+            np.abs(arousal - self._prev_arousal[sel]) + \
+            _seq_sum(np.abs(qualia - self._prev_qualia[sel]))
+        l2_act = _clip01(l2_change / 3.0)
+        l3_act = _clip01(l3_sum / 3.0)
+        l4_act = _clip01(np.maximum(0, count - self._prev_activation[sel]) / 3.0)
+        acts = np.stack([l1_act, l2_act, l3_act, l4_act], axis=1)
+
+        # Step 2: 主導層（閾値超過層のうち最大。同値なら L1→L4 の順で先勝ち）
+        candidates = np.where(acts >= self.LEADER_THRESHOLD, acts, -np.inf)
+        leader = np.argmax(candidates, axis=1)
+        has_leader = np.isfinite(candidates[np.arange(len(leader)), leader])
+        strength = np.where(has_leader, acts[np.arange(len(leader)), leader], 0.0)
+        leader = np.where(has_leader, leader, -1)
+
+        # Step 3: 追随整合性（同時応答＋時間遅れ応答）
+        follower_mean = 0.0
+        for k in range(4):
+            follower_mean = follower_mean + np.where(leader != k, acts[:, k], 0.0)
+        follower_mean = follower_mean / 3.0
+
+        prev_leader = self._prev_leader[sel]
+        prev_strength = self._prev_leader_strength[sel]
+        prev_acts = self._prev_activities[sel]
+        lagged = (prev_leader >= 0) & (prev_strength > 0)
+        rise = 0.0
+        for k in range(4):
+            rise = rise + np.where(prev_leader != k,
+                                   np.maximum(0.0, acts[:, k] - prev_acts[:, k]), 0.0)
+        rise = rise / 3.0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            lag_response = _clip01(rise / np.where(lagged, prev_strength, 1.0))
+        coherence = np.where(lagged,
+                             (1.0 - self.LAG_WEIGHT) * follower_mean + self.LAG_WEIGHT * lag_response,
+                             follower_mean)
+        coherence = _clip01(coherence)
+
+        # Step 4: 同期スコア（幾何平均）
+        raw_sync = np.where(has_leader, np.sqrt(strength * coherence), 0.0)
+        self.sync_type[sel] = leader
+        self.leader_strength[sel] = strength
+        self.sync_coherence[sel] = np.where(has_leader, coherence, 0.0)
+
+        # Step 5: EMA平滑化とヒステリシス
+        ema = (1 - self.EMA_ALPHA) * self._ema[sel] + self.EMA_ALPHA * raw_sync
+        self._ema[sel] = ema
+        self.sync_score[sel] = ema
+        conscious = self.is_conscious[sel]
+        self.is_conscious[sel] = np.where(conscious, ema >= self.OFF_THRESHOLD,
+                                          ema >= self.ON_THRESHOLD)
+
+        # Step 6: 引き込みゲイン（次ステップの各層に適用。主導層自身は1.0）
+        boost = 1.0 + self.entrain_k[sel] * strength
+        cols = np.arange(4)
+        self.gain[sel] = np.where(has_leader[:, None] & (cols[None, :] != leader[:, None]),
+                                  boost[:, None], 1.0)
+
+        # Step 7: 次ステップ用の状態保存
+        self.last_activities[sel] = acts
+        self._prev_activities[sel] = acts
+        self._prev_leader[sel] = leader
+        self._prev_leader_strength[sel] = strength
+        self._prev_energy[sel] = energy
+        self._prev_fatigue[sel] = fatigue
+        self._prev_valence[sel] = valence
+        self._prev_arousal[sel] = arousal
+        self._prev_qualia[sel] = qualia
+        self._prev_activation[sel] = count
+
+    def run(self, max_steps: int) -> List[Dict]:
+        """max_steps まで（または全員停止まで）進め、各ステップの結果を返す"""
+        results = []
+        for _ in range(max_steps):
+            if not self.active.any():
+                break
+            results.append(self.step())
+        return results
@@ -0,0 +1,378 @@
+"""
+hida_sweep.py
+初期DNA定数のパラメータ掃引（グリッド / ランダム / 逐次半減）
+
+L5Consciousness の定数（ENTRAIN_K, LAG_WEIGHT, LEADER_THRESHOLD, EMA_ALPHA,
+ON/OFF_THRESHOLD）と L4Memory の activation_count 増加量（ACT_*）は
+「初期DNA」であり、最適値はコミュニティ検証に開かれている（各クラスの注記参照）。
+本モジュールは定数を書き換えずに、エージェントのインスタンス属性として
+上書きしてシナリオを走らせ、次の2つの目的量を集計する。
+
+  on_rate     意識ONだったステップの割合（全シード合計）
+  lagged_corr 時間遅れ相関 r(主導強度t, 追随層平均活動t+1)
+              （test_entrainment_ablation.py と同じ定義）
+
+シナリオは test_entrainment_ablation.py と同じ（赤好き、初期知識あり、
+空の記憶から開始。開始状態は h.prepare_test_session、相関は
+test_entrainment_ablation.pearson をそのまま使う）。
+
+OFF_THRESHOLD は ON_THRESHOLD より小さくなければならない（ヒステリシス）。
+ランダム探索では OFF_THRESHOLD を ON_THRESHOLD に対する比で引き、
+グリッドなどで OFF ≥ ON の候補を渡すと complete() が ValueError にする。
+
+- 探索: grid（直積）、random（一様乱数）、successive_halving（逐次半減:
+  少ないシードで全候補を評価し、上位だけシード数を増やして再評価）
+- 並列: シードごとの試行（セル）をプロセスプールで実行
+- キャッシュ: セル単位の結果を SQLite に保存。キーは
+  (パラメータのハッシュ, シード, コードのバージョン)。再実行時は
+  済んだセルを飛ばす。コードのバージョンは hida_unified_v2.py・
+  test_entrainment_ablation.py・本ファイルのハッシュなので、モデルを
+  変更すると自動的に無効になる。
+
+実行:
+  python3 hida_sweep.py grid --param ENTRAIN_K=0,0.25,0.5,1 --param LAG_WEIGHT=0.3,0.5,0.7 --workers 4
+  python3 hida_sweep.py random --n 40 --workers 4
+  python3 hida_sweep.py halving --n 32 --objective lagged_corr --workers 4
+"""
+
+import hashlib
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import sqlite3
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import hida_unified_v2 as h
+import test_entrainment_ablation as ablation
+from test_entrainment_ablation import pearson
+
+
+LAYERS = ('L1', 'L2', 'L3', 'L4')
+MAX_STEPS = 40
+N_SEEDS = 30
+CACHE_FILE = "hida_sweep.sqlite3"
+
+# 掃引できる定数: 名前 -> (層, ランダム探索の範囲)
+# OFF_THRESHOLD の範囲だけは ON_THRESHOLD に対する比（OFF = ON × 比）
+PARAMS = {
+    'ENTRAIN_K': ('l5', (0.0, 1.5)),
+    'LAG_WEIGHT': ('l5', (0.0, 1.0)),
+    'LEADER_THRESHOLD': ('l5', (0.1, 0.6)),
+    'EMA_ALPHA': ('l5', (0.1, 0.7)),
+    'ON_THRESHOLD': ('l5', (0.03, 0.15)),
+    'OFF_THRESHOLD': ('l5', (0.2, 0.9)),
+    'ACT_NEW_CELL': ('l4', (0.0, 2.0)),
+    'ACT_NEW_OBJECT': ('l4', (0.0, 2.0)),
+    'ACT_REOBSERVE': ('l4', (0.0, 1.0)),
+    'ACT_ERROR_BASE': ('l4', (0.0, 2.0)),
+    'ACT_NEW_VISIT': ('l4', (0.0, 1.0)),
+}
+_LAYER_CLASS = {'l4': h.L4Memory, 'l5': h.L5Consciousness}
+
+
+def defaults() -> Dict[str, float]:
+    """掃引対象の定数の現在値（クラス定数 = 初期DNA）"""
+    return {name: float(getattr(_LAYER_CLASS[layer], name)) for name, (layer, _) in PARAMS.items()}
+
+
+def complete(params: Dict[str, float]) -> Dict[str, float]:
+    """指定のない定数を初期DNAで補う（同じ設定は同じハッシュになる）"""
+    unknown = set(params) - set(PARAMS)
+    if unknown:
+        raise ValueError(f"掃引できない定数: {sorted(unknown)}")
+    full = defaults()
+    full.update({k: float(v) for k, v in params.items()})
+    if full['OFF_THRESHOLD'] >= full['ON_THRESHOLD']:
+        raise ValueError(f"OFF_THRESHOLD（{full['OFF_THRESHOLD']}）は "
+                         f"ON_THRESHOLD（{full['ON_THRESHOLD']}）より小さくすること")
+    return full
+
+
+def param_hash(params: Dict[str, float]) -> str:
+    material = json.dumps(complete(params), sort_keys=True)
+    return hashlib.sha1(material.encode('utf-8')).hexdigest()
+
+
+def code_version() -> str:
+    """モデル（hida_unified_v2.py）と目的量・シナリオ（test_entrainment_ablation.py、本ファイル）のハッシュ"""
+    digest = hashlib.sha1()
+    for path in (h.__file__, ablation.__file__, __file__):
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+# ==========================================
+# 1セル（パラメータ × シード）の試行
+# ==========================================
+
+def run_cell(params: Dict[str, float], seed: int, max_steps: int = MAX_STEPS) -> Dict:
+    """1シード分のシナリオを走らせ、目的量の材料を返す
+
+    返り値: {'steps', 'on_steps', 'leader_events', 'pairs': [[主導強度t, 追随平均t+1], ...]}
+    """
+    rng = random.Random(seed)
+    world = h.create_test_world(rng)
+    agent = h.HIDA(color_preference={'red': 1.0, 'blue': 0.3, 'green': 0.3},
+                   store=h.InMemoryStore(), events=h.NullSink(), rng=rng)
+    for name, value in complete(params).items():
+        setattr(getattr(agent, PARAMS[name][0]), name, value)
+    h.prepare_test_session(agent, world)    # run_test()と同じ開始状態・初期知識
+
+    steps = on_steps = leader_events = 0
+    pairs = []
+    prev = None  # (主導層, 主導強度)
+    for _ in range(max_steps):
+        result = agent.step(world, verbose=False)
+        l5 = agent.l5
+        steps += 1
+        on_steps += l5.is_conscious
+        if prev is not None and prev[0] is not None:
+            followers = [l5.last_activities[k] for k in LAYERS if k != prev[0]]
+            pairs.append([prev[1], sum(followers) / len(followers)])
+        if l5.sync_type is not None:
+            leader_events += 1
+        prev = (l5.sync_type, l5.leader_strength)
+        if result['goal_reached'] or agent.l1.energy <= 0:
+            break
+    return {'steps': steps, 'on_steps': on_steps, 'leader_events': leader_events, 'pairs': pairs}
+
+
+def _run_task(task):
+    """ワーカープロセス用: (パラメータ, シード, 最大ステップ) を実行する"""
+    params, seed, max_steps = task
+    return param_hash(params), seed, run_cell(params, seed, max_steps)
+
+
+# ==========================================
+# 目的量
+# ==========================================
+
+def summarize(params: Dict[str, float], cells: Sequence[Dict]) -> Dict:
+    """シード群のセル結果を1行に集計する"""
+    steps = sum(c['steps'] for c in cells)
+    pairs = [p for c in cells for p in c['pairs']]
+    return {
+        'params': dict(params),
+        'n_seeds': len(cells),
+        'steps': steps,
+        'leader_events': sum(c['leader_events'] for c in cells),
+        'on_rate': sum(c['on_steps'] for c in cells) / steps if steps else 0.0,
+        'lagged_corr': pearson(pairs),
+    }
+
+
+OBJECTIVES = {
+    'lagged_corr': lambda row: row['lagged_corr'],
+    'on_rate': lambda row: row['on_rate'],
+}
+
+
+def _score(row: Dict, objective: Callable[[Dict], float]) -> float:
+    value = objective(row)
+    return -math.inf if value is None or math.isnan(value) else value
+
+
+# ==========================================
+# キャッシュ
+# ==========================================
+
+class SweepCache:
+    """セル結果のキャッシュ（SQLite）。キー: (パラメータのハッシュ, シード, コードのバージョン)"""
+
+    def __init__(self, path: str = CACHE_FILE):
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cells ("
+            " param_hash TEXT, seed INTEGER, code_version TEXT, max_steps INTEGER,"
+            " params TEXT, result TEXT,"
+            " PRIMARY KEY (param_hash, seed, code_version, max_steps))")
+        self._conn.commit()
+
+    def get(self, phash: str, seeds: Sequence[int], version: str, max_steps: int) -> Dict[int, Dict]:
+        """済んだセルを {シード: 結果} で返す"""
+        rows = self._conn.execute(
+            "SELECT seed, result FROM cells WHERE param_hash = ? AND code_version = ? AND max_steps = ?",
+            (phash, version, max_steps)).fetchall()
+        wanted = set(seeds)
+        return {seed: json.loads(result) for seed, result in rows if seed in wanted}
+
+    def put(self, phash: str, seed: int, version: str, max_steps: int,
+            params: Dict[str, float], result: Dict):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO cells VALUES (?, ?, ?, ?, ?, ?)",
+            (phash, seed, version, max_steps, json.dumps(complete(params), sort_keys=True),
+             json.dumps(result)))
+
+    def commit(self):
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+# ==========================================
+# 掃引エンジン
+# ==========================================
+
+class Sweep:
+    """パラメータ掃引（キャッシュつき、プロセスプールで並列）"""
+
+    def __init__(self, cache_path: Optional[str] = CACHE_FILE, workers: int = 1,
+                 max_steps: int = MAX_STEPS):
+        """
+        cache_path: キャッシュのSQLiteファイル。Noneならメモリ上（プロセス終了で消える）
+        """
+        self.cache = SweepCache(cache_path or ":memory:")
+        self.workers = workers
+        self.max_steps = max_steps
+        self.version = code_version()
+        self.cells_run = 0      # 実際に走らせたセル数（キャッシュヒットは数えない）
+
+    def evaluate(self, candidates: Sequence[Dict[str, float]], seeds: Sequence[int]) -> List[Dict]:
+        """候補ごとに全シードを評価して集計する（済んだセルはキャッシュから）"""
+        done = {}
+        tasks = []
+        for params in candidates:
+            phash = param_hash(params)
+            if phash in done:
+                continue
+            done[phash] = self.cache.get(phash, seeds, self.version, self.max_steps)
+            tasks.extend((params, seed, self.max_steps) for seed in seeds if seed not in done[phash])
+
+        by_hash = {param_hash(p): p for p in candidates}
+        if tasks:
+            if self.workers <= 1:
+                results = map(_run_task, tasks)
+                pool = None
+            else:
+                pool = multiprocessing.Pool(self.workers)
+                results = pool.imap_unordered(_run_task, tasks)
+            try:
+                for phash, seed, result in results:
+                    done[phash][seed] = result
+                    self.cache.put(phash, seed, self.version, self.max_steps, by_hash[phash], result)
+                    self.cells_run += 1
+            finally:
+                self.cache.commit()
+                if pool is not None:
+                    pool.close()
+                    pool.join()
+
+        return [summarize(p, [done[param_hash(p)][s] for s in seeds]) for p in candidates]
+
+    def grid(self, axes: Dict[str, Sequence[float]], seeds: Sequence[int]) -> List[Dict]:
+        """直積グリッド"""
+        names = list(axes)
+        candidates = [dict(zip(names, values)) for values in itertools.product(*axes.values())]
+        return self.evaluate(candidates, seeds)
+
+    def random(self, n: int, seeds: Sequence[int],
+               ranges: Optional[Dict[str, Tuple[float, float]]] = None, rng_seed: int = 0) -> List[Dict]:
+        """一様乱数で n 候補（rangesを省略するとL5の定数をPARAMSの範囲で）"""
+        return self.evaluate(random_candidates(n, ranges, rng_seed), seeds)
+
+    def successive_halving(self, candidates: Sequence[Dict[str, float]], seeds: Sequence[int],
+                           objective: Union[str, Callable[[Dict], float]] = 'lagged_corr',
+                           eta: int = 2, min_seeds: int = 4) -> Tuple[List[Dict], List[List[Dict]]]:
+        """逐次半減: 全候補を min_seeds シードで評価し、上位 1/eta を残してシード数を eta 倍…
+
+        返り値: (最終ラウンドの結果（目的量の降順）, 各ラウンドの結果)
+        """
+        objective = OBJECTIVES[objective] if isinstance(objective, str) else objective
+        survivors = list(candidates)
+        n_seeds = min(min_seeds, len(seeds))
+        rounds = []
+        while True:
+            rows = self.evaluate(survivors, seeds[:n_seeds])
+            rows.sort(key=lambda row: _score(row, objective), reverse=True)
+            rounds.append(rows)
+            if len(rows) == 1 or n_seeds >= len(seeds):
+                return rows, rounds
+            keep = max(1, math.ceil(len(rows) / eta))
+            survivors = [row['params'] for row in rows[:keep]]
+            n_seeds = min(len(seeds), n_seeds * eta)
+
+    def close(self):
+        self.cache.close()
+
+
+def random_candidates(n: int, ranges: Optional[Dict[str, Tuple[float, float]]] = None,
+                      rng_seed: int = 0) -> List[Dict[str, float]]:
+    """一様乱数の候補（OFF_THRESHOLD の範囲は ON_THRESHOLD に対する比）"""
+    if ranges is None:
+        ranges = {name: rng for name, (layer, rng) in PARAMS.items() if layer == 'l5'}
+    rng = random.Random(rng_seed)
+    on_default = defaults()['ON_THRESHOLD']
+    candidates = []
+    for _ in range(n):
+        params = {name: rng.uniform(lo, hi) for name, (lo, hi) in ranges.items()}
+        if 'OFF_THRESHOLD' in params:
+            params['OFF_THRESHOLD'] *= params.get('ON_THRESHOLD', on_default)
+        candidates.append(params)
+    return candidates
+
+
+def report(rows: Sequence[Dict], names: Optional[Sequence[str]] = None) -> str:
+    """結果の表（テキスト）。namesを省略すると初期DNAから変えた定数を列にする"""
+    if names is None:
+        base = defaults()
+        names = sorted({k for row in rows for k, v in complete(row['params']).items()
+                        if v != base[k]})
+    header = "".join(f"{n[:16]:>17}" for n in names) + f"{'seeds':>7}{'on_rate':>9}{'lag_r':>9}"
+    lines = [header]
+    for row in rows:
+        p = complete(row['params'])
+        lines.append("".join(f"{p[n]:>17.3f}" for n in names)
+                     + f"{row['n_seeds']:>7}{row['on_rate']:>9.3f}{row['lagged_corr']:>9.3f}")
+    return "\n".join(lines)
+
+
+def _parse_axes(specs: Sequence[str]) -> Dict[str, List[float]]:
+    axes = {}
+    for spec in specs:
+        name, _, values = spec.partition('=')
+        axes[name] = [float(v) for v in values.split(',')]
+    return axes
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="初期DNA定数のパラメータ掃引")
+    parser.add_argument("mode", choices=["grid", "random", "halving"])
+    parser.add_argument("--param", action="append", default=[],
+                        help="gridの軸 NAME=v1,v2,...（複数指定可）")
+    parser.add_argument("--n", type=int, default=20, help="random/halvingの候補数")
+    parser.add_argument("--seeds", type=int, default=N_SEEDS)
+    parser.add_argument("--max-steps", type=int, default=MAX_STEPS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--objective", choices=sorted(OBJECTIVES), default="lagged_corr")
+    parser.add_argument("--cache", default=CACHE_FILE)
+    args = parser.parse_args()
+
+    sweep = Sweep(args.cache, workers=args.workers, max_steps=args.max_steps)
+    seeds = list(range(args.seeds))
+    t0 = time.perf_counter()
+    if args.mode == "grid":
+        axes = _parse_axes(args.param) or {'ENTRAIN_K': [0.0, 0.25, 0.5, 1.0],
+                                           'LAG_WEIGHT': [0.3, 0.5, 0.7]}
+        rows = sweep.grid(axes, seeds)
+    elif args.mode == "random":
+        rows = sweep.random(args.n, seeds)
+        rows.sort(key=lambda row: _score(row, OBJECTIVES[args.objective]), reverse=True)
+    else:
+        rows, rounds = sweep.successive_halving(random_candidates(args.n), seeds, args.objective)
+        for i, r in enumerate(rounds):
+            print(f"ラウンド{i + 1}: {len(r)}候補 × {r[0]['n_seeds']}シード")
+    elapsed = time.perf_counter() - t0
+
+    print(report(rows))
+    print(f"\n{sweep.cells_run}セルを実行（残りはキャッシュ）, {elapsed:.1f}秒, "
+          f"キャッシュ: {args.cache} (code {sweep.version})")
+    sweep.close()
@@ -0,0 +1,240 @@
+"""
+hida_trace.py
+ステップ結果の列指向トレース記録 - 型付き列バッファ → .npy（追記）→ 遅延読み出し
+
+HIDA.step() は毎ステップ新しい辞書を返し、実験スクリプトはそれを
+リストにためていく（test_entrainment_ablation.py の series など）。
+100万ステップでは数百MBのPythonオブジェクトになる。本モジュールは
+各ステップの値を、あらかじめ確保した型付きの列バッファ（NumPy配列）に
+書き込み、バッファが埋まるたびに列ごとの .npy ファイルへ追記する。
+
+記録する列（FIELDS）:
+  step             int32       ステップ番号
+  action           int16       行動のID（文字列は meta.json の actions）
+  position         int32 (2,)  位置
+  energy           float64
+  conscious        bool
+  sync_score       float64
+  sync_type        int8        主導層（LAYERSのインデックス。-1 = None）
+  leader_strength  float64
+  coherence        float64     sync_coherence
+  activities       float64 (4,) 各層の活動量（last_activities, L1→L4）
+
+浮動小数点は float64 のまま保存するので、値は step() の返り値と完全に一致する。
+
+ファイル構成（1ラン = 1ディレクトリ）:
+  <dir>/<列名>.npy   列ごとのファイル。ヘッダは固定長（128バイト）で、
+                     追記のたびに行数だけ書き換える。追記の途中で
+                     プロセスが落ちても、直前の flush までは読める
+  <dir>/meta.json    行数・行動の語彙など（flushのたびに書き直す）
+
+使い方:
+  with TraceWriter("runs/seed0") as trace:
+      for _ in range(steps):
+          trace.record(agent, agent.step(world, verbose=False))
+
+  tr = TraceReader("runs/seed0")      # ここではメタ情報しか読まない
+  tr['energy'][-100:]                 # 列はメモリマップで開く（全体を読み込まない）
+  tr.actions()                        # 行動の文字列（必要な範囲だけ復号）
+
+依存: NumPy
+"""
+
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import hida_unified_v2 as h
+
+
+LAYERS = ('L1', 'L2', 'L3', 'L4')
+
+# 列: 名前 -> (dtype, 1行あたりの形)
+FIELDS = {
+    'step': (np.int32, ()),
+    'action': (np.int16, ()),
+    'position': (np.int32, (2,)),
+    'energy': (np.float64, ()),
+    'conscious': (np.bool_, ()),
+    'sync_score': (np.float64, ()),
+    'sync_type': (np.int8, ()),
+    'leader_strength': (np.float64, ()),
+    'coherence': (np.float64, ()),
+    'activities': (np.float64, (4,)),
+}
+
+CHUNK_ROWS = 65536
+META_FILE = "meta.json"
+
+# .npy ヘッダ（バージョン1.0）の全長。行数の桁が増えても書き換えられるよう固定する
+_HEADER_LEN = 128
+_MAGIC = b'\x93NUMPY\x01\x00'
+
+
+def _npy_header(dtype: np.dtype, shape: Tuple[int, ...]) -> bytes:
+    """固定長の .npy ヘッダ（np.load が読める形式）"""
+    d = {'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)),
+         'fortran_order': False, 'shape': shape}
+    text = repr(d).encode('latin1')
+    pad = _HEADER_LEN - len(_MAGIC) - 2 - len(text) - 1
+    if pad < 0:
+        raise ValueError(f"ヘッダが長すぎる: {text!r}")
+    body = text + b' ' * pad + b'\n'
+    return _MAGIC + len(body).to_bytes(2, 'little') + body
+
+
+class TraceWriter:
+    """ステップ結果を列バッファにため、chunk_rows 行ごとに .npy へ追記する"""
+
+    def __init__(self, path: str, chunk_rows: int = CHUNK_ROWS):
+        if chunk_rows < 1:
+            raise ValueError("chunk_rows は1以上")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.rows = 0                   # ファイルに書いた行数
+        self._n = 0                     # バッファ内の行数
+        self._buf = {name: np.empty((chunk_rows,) + shape, dtype=dtype)
+                     for name, (dtype, shape) in FIELDS.items()}
+        self._files = {}
+        for name, (dtype, shape) in FIELDS.items():
+            f = open(os.path.join(path, f"{name}.npy"), 'wb')
+            f.write(_npy_header(dtype, (0,) + shape))
+            self._files[name] = f
+        self._action_ids: Dict[str, int] = {}
+        self._write_meta()
+
+    def _action_id(self, action: str) -> int:
+        aid = self._action_ids.get(action)
+        if aid is None:
+            aid = self._action_ids[action] = len(self._action_ids)
+        return aid
+
+    def record(self, agent: h.HIDA, result: Dict):
+        """1ステップ分を追加する（result は agent.step() の返り値）"""
+        i = self._n
+        b = self._buf
+        b['step'][i] = result['step']
+        b['action'][i] = self._action_id(result['action'])
+        b['position'][i] = result['position']
+        b['energy'][i] = result['energy']
+        b['conscious'][i] = result['conscious']
+        b['sync_score'][i] = result['sync_score']
+        leader = result['sync_type']
+        b['sync_type'][i] = -1 if leader is None else LAYERS.index(leader)
+        b['leader_strength'][i] = result['leader_strength']
+        b['coherence'][i] = result['sync_coherence']
+        acts = agent.l5.last_activities
+        b['activities'][i] = [acts[k] for k in LAYERS]
+        self._n = i + 1
+        if self._n == self.chunk_rows:
+            self.flush()
+
+    def __len__(self) -> int:
+        return self.rows + self._n
+
+    def flush(self):
+        """バッファの内容を追記し、ヘッダの行数と meta.json を更新する"""
+        if self._n:
+            n = self._n
+            for name, f in self._files.items():
+                f.seek(0, os.SEEK_END)
+                f.write(self._buf[name][:n].tobytes())
+            self.rows += n
+            self._n = 0
+        # データを書いてからヘッダを更新する（途中で落ちても行数は書けた分まで）
+        for name, (dtype, shape) in FIELDS.items():
+            f = self._files[name]
+            f.flush()
+            f.seek(0)
+            f.write(_npy_header(dtype, (self.rows,) + shape))
+            f.flush()
+        self._write_meta()
+
+    def _write_meta(self):
+        meta = {
+            'rows': self.rows,
+            'fields': {name: [np.dtype(dtype).str, list(shape)]
+                       for name, (dtype, shape) in FIELDS.items()},
+            'actions': list(self._action_ids),
+            'layers': list(LAYERS),
+        }
+        tmp = os.path.join(self.path, META_FILE + ".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp, os.path.join(self.path, META_FILE))
+
+    def close(self):
+        if self._files:
+            self.flush()
+            for f in self._files.values():
+                f.close()
+            self._files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TraceReader:
+    """TraceWriter が書いたトレースを遅延して読む
+
+    開いた時点では meta.json だけを読む。列は最初に参照したときに
+    メモリマップ（読み取り専用）で開き、全体は読み込まない。
+    書き込み中のトレースも、直前の flush までの行を読める。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, META_FILE), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.rows: int = self.meta['rows']
+        self.action_names: List[str] = self.meta['actions']
+        self._columns: Dict[str, np.ndarray] = {}
+
+    @property
+    def fields(self) -> Tuple[str, ...]:
+        return tuple(self.meta['fields'])
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        col = self._columns.get(name)
+        if col is None:
+            if name not in self.meta['fields']:
+                raise KeyError(name)
+            col = np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode='r')
+            col = col[:self.rows]       # meta.json より後に追記された行は見せない
+            self._columns[name] = col
+        return col
+
+    def actions(self, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        """行動の文字列（start:stop の範囲だけ復号）"""
+        names = self.action_names
+        return [names[i] for i in self['action'][start:stop].tolist()]
+
+    def sync_types(self, start: int = 0, stop: Optional[int] = None) -> List[Optional[str]]:
+        """主導層（'L1'〜'L4' / None）"""
+        return [LAYERS[i] if i >= 0 else None for i in self['sync_type'][start:stop].tolist()]
+
+    def row(self, i: int) -> Dict:
+        """i 行目を step() の返り値と同じキーの辞書で返す（記録した列のみ）"""
+        leader = int(self['sync_type'][i])
+        return {
+            'step': int(self['step'][i]),
+            'action': self.action_names[int(self['action'][i])],
+            'position': self['position'][i].tolist(),
+            'energy': float(self['energy'][i]),
+            'conscious': bool(self['conscious'][i]),
+            'sync_score': float(self['sync_score'][i]),
+            'sync_type': LAYERS[leader] if leader >= 0 else None,
+            'leader_strength': float(self['leader_strength'][i]),
+            'sync_coherence': float(self['coherence'][i]),
+            'activities': dict(zip(LAYERS, self['activities'][i].tolist())),
+        }
+
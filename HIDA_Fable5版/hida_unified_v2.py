@@ -66,18 +66,173 @@ import json
 import urllib.request
 import urllib.error
 import os
+import sqlite3
+import threading
+import queue
+import hashlib
+import heapq
+import bisect
+import functools
+import operator
+import time
+import mmap
+import pickle
+import io
+from abc import ABC, abstractmethod
+from array import array
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Tuple
-from enum import Enum
+from types import MappingProxyType
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+from enum import Enum, IntEnum
+
+
+# ==========================================
+# イベント出力（printの置き換え）
+# ==========================================
+#
+# 各層はprint()の代わりに events.emit(kind, level, **payload) を呼ぶ。
+# payloadは書式化前の生の値（float/str/bool）のまま渡し、文字列への
+# 書式化はPrintSinkだけが行う。NullSinkは何もしないので、静かな
+# バッチ実行では入出力もf-stringの書式化コストもかからない。
+
+class EventLevel(IntEnum):
+    DEBUG = 10
+    INFO = 20
+    WARNING = 30
+
+
+@dataclass(frozen=True)
+class Event:
+    kind: str
+    level: int
+    payload: Dict
+
+
+def _format_step(p: Dict) -> str:
+    mark = '●' if p['conscious'] else '○'
+    lines = [
+        f"\n  Step {p['step']}: {p['action']}",
+        f"    E={p['energy']:.2f} F={p['fear']:.2f} D={p['desire']:.2f} U={p['urgency']:.2f}",
+        f"    {mark} sync_score={p['sync_score']:.3f} leader={p['sync_type'] or '-'} "
+        f"(strength={p['leader_strength']:.2f} coherence={p['sync_coherence']:.2f})",
+    ]
+    if p['scores']:
+        lines.append("    Scores: " + str([(c, f"{t:.1f}") for c, t in p['scores'].items()]))
+    return "\n".join(lines)
+
+
+# kind -> 表示書式（テンプレート文字列、またはpayloadを受け取る関数）
+# 書式中の名前がそのkindのpayloadのキー
+EVENT_FORMATS = {
+    'ltm_loaded': "  [LTM] {count}件の記憶を読み込み",
+    'ltm_new': "  [LTM] 新規（記憶なし）",
+    'ltm_saved': "  [LTM] 記憶保存: {event}",
+    'ltm_error': "  [{tag}] {message}: {error}",
+    'modulation_loaded': "  [Mod] 変調値を読み込み: fear={fear_weight:.2f}, safe={safe_preference:.2f}",
+    'modulation_updated': "  [Mod] 変調値更新: fear={fear_before:.2f}→{fear_after:.2f}, "
+                          "safe={safe_before:.2f}→{safe_after:.2f}",
+    'rotten': "    🤢 腐ってる！ disgust={disgust:.2f}",
+    'blocked': "    😠 {npc}に邪魔された！ anger={anger:.2f}",
+    'danger_pain': "    ⚡ 痛い！ fear={fear:.2f} anger={anger:.2f}",
+    'danger_fatigue': "    💦 疲れた！ E={energy:.2f} sadness={sadness:.2f}",
+    'step': _format_step,
+    'reflection': "    💭 {text}",
+}
+
+
+def format_event(event: Event) -> str:
+    """イベントを表示用の文字列にする（未登録のkindはpayloadをそのまま）"""
+    fmt = EVENT_FORMATS.get(event.kind)
+    if fmt is None:
+        return f"  [{event.kind}] {event.payload}"
+    if callable(fmt):
+        return fmt(event.payload)
+    return fmt.format(**event.payload)
+
+
+class EventSink:
+    """イベントの受け口（基底）。level未満のイベントは捨てる"""
+    
+    def __init__(self, level: int = EventLevel.INFO):
+        self.level = level
+    
+    def enabled(self, level: int) -> bool:
+        """このレベルのイベントを受け取るか（payloadの計算が重いときの事前確認用）"""
+        return level >= self.level
+    
+    def emit(self, kind: str, level: int = EventLevel.INFO, **payload):
+        if level >= self.level:
+            self.handle(Event(kind, level, payload))
+    
+    def handle(self, event: Event):
+        raise NotImplementedError
+
+
+class NullSink(EventSink):
+    """何もしない（Eventも作らない）"""
+    
+    def enabled(self, level: int) -> bool:
+        return False
+    
+    def emit(self, kind: str, level: int = EventLevel.INFO, **payload):
+        pass
+    
+    def handle(self, event: Event):
+        pass
+
+
+class PrintSink(EventSink):
+    """従来どおり標準出力に表示する（既定）"""
+    
+    def __init__(self, level: int = EventLevel.INFO, stream=None):
+        super().__init__(level)
+        self.stream = stream
+    
+    def handle(self, event: Event):
+        print(format_event(event), file=self.stream)
+
+
+class RecordingSink(EventSink):
+    """イベントを書式化せずにリストへ溜める（テスト・解析用）"""
+    
+    def __init__(self, level: int = EventLevel.DEBUG):
+        super().__init__(level)
+        self.events: List[Event] = []
+    
+    def handle(self, event: Event):
+        self.events.append(event)
+    
+    def of_kind(self, kind: str) -> List[Event]:
+        return [e for e in self.events if e.kind == kind]
 
 
 # ==========================================
 # L1: 身体層
 # ==========================================
 
+# セルの種類（World.cells の1バイトの値 = このタプルの添字）
+CELL_TYPES = ('empty', 'wall', 'danger')
+CELL_EMPTY, CELL_WALL, CELL_DANGER = range(len(CELL_TYPES))
+
+# 3×3窓（look_window(x, y, 1)）の (dx, dy, 添字)。順序は L1Body.look の走査順
+_NEIGHBORS3 = tuple((dx, dy, (dy + 1) * 3 + dx + 1) for dx in (-1, 0, 1) for dy in (-1, 0, 1))
+
+
 class L1Body:
     """身体プリミティブとエネルギー管理"""
     
+    __slots__ = ('position', 'direction', 'energy', 'fatigue', 'damage',
+                 'holding', 'gain', 'sense_buffer')
+    
+    # 行動ごとのエネルギー消費の基本量（hida_population も参照する）
+    COST_FORWARD = 0.02       # 前進
+    COST_TURN = 0.005         # 左右の回転
+    COST_HAND = 0.01          # 掴む・離す
+    COST_LOOK = 0.005         # 見る
+    FATIGUE_PER_ENERGY = 0.3  # 消費したエネルギーに対する疲労の蓄積率
+    
     def __init__(self):
         # 位置・方向
         self.position = [0, 0]
@@ -109,31 +264,31 @@ class L1Body:
             return False
         
         self.position = new_pos
-        self._consume_energy(0.02)
+        self._consume_energy(self.COST_FORWARD)
         return True
     
     def turn_left(self):
         """左回転"""
         dirs = ['N', 'W', 'S', 'E']
         self.direction = dirs[(dirs.index(self.direction) + 1) % 4]
-        self._consume_energy(0.005)
+        self._consume_energy(self.COST_TURN)
     
     def turn_right(self):
         """右回転"""
         dirs = ['N', 'E', 'S', 'W']
         self.direction = dirs[(dirs.index(self.direction) + 1) % 4]
-        self._consume_energy(0.005)
+        self._consume_energy(self.COST_TURN)
     
     def grab(self, obj):
         """掴む"""
         self.holding = obj
-        self._consume_energy(0.01)
+        self._consume_energy(self.COST_HAND)
     
     def release(self):
         """離す"""
         released = self.holding
         self.holding = None
-        self._consume_energy(0.01)
+        self._consume_energy(self.COST_HAND)
         return released
     
     def look(self, world) -> Dict:
@@ -141,13 +296,13 @@ class L1Body:
         visible = {}
         x, y = self.position
         
-        # 周囲8方向 + 前方3マス
-        for dx in [-1, 0, 1]:
-            for dy in [-1, 0, 1]:
-                nx, ny = x + dx, y + dy
-                cell = world.get_cell(nx, ny)
-                obj = world.get_object(nx, ny)
-                visible[(nx, ny)] = {'cell': cell, 'object': obj}
+        # 周囲8方向 + 前方3マス（周囲は3×3窓をまとめて読む）
+        window = world.look_window(x, y, 1)
+        for dx, dy, i in _NEIGHBORS3:
+            nx, ny = x + dx, y + dy
+            cell = CELL_TYPES[window[i]]
+            obj = world.get_object(nx, ny)
+            visible[(nx, ny)] = {'cell': cell, 'object': obj}
         
         # 前方を遠くまで見る
         fdx, fdy = {'N': (0, -1), 'S': (0, 1), 'E': (1, 0), 'W': (-1, 0)}[self.direction]
@@ -160,7 +315,7 @@ class L1Body:
             visible[(fx, fy)] = {'cell': cell, 'object': obj}
         
         self.sense_buffer = visible
-        self._consume_energy(0.005)
+        self._consume_energy(self.COST_LOOK)
         return visible
     
     def _consume_energy(self, amount: float):
@@ -172,7 +327,7 @@ class L1Body:
         """
         amount = amount * self.gain
         self.energy = max(0, self.energy - amount)
-        self.fatigue = min(1.0, self.fatigue + amount * 0.3)
+        self.fatigue = min(1.0, self.fatigue + amount * self.FATIGUE_PER_ENERGY)
     
     def rest(self):
         """休憩（エネルギー回復）"""
@@ -181,7 +336,7 @@ class L1Body:
     
     def get_state(self) -> Dict:
         return {
-            'position': self.position.copy(),
+            'position': list(self.position),
             'direction': self.direction,
             'energy': self.energy,
             'fatigue': self.fatigue,
@@ -194,8 +349,165 @@ class L1Body:
 # L2: クオリア層
 # ==========================================
 
+# 個別クオリアの並び（固定インデックス）
+QUALIA_KEYS = ('fear', 'desire', 'surprise', 'curiosity', 'urgency',
+               'anger', 'sadness', 'joy', 'disgust')
+QUALIA_INDEX = {k: i for i, k in enumerate(QUALIA_KEYS)}
+
+# 感情の原因を持つ感情の並び（固定インデックス）
+CAUSE_KEYS = ('fear', 'anger', 'sadness', 'joy', 'disgust', 'surprise', 'urgency')
+CAUSE_INDEX = {k: i for i, k in enumerate(CAUSE_KEYS)}
+
+
+class EmotionVector:
+    """感情名 → float の固定長ベクトル（array('d')）
+    
+    キーの並びは固定（QUALIA_KEYS / CAUSE_KEYS）。辞書と同じように
+    v['fear'] で読み書きでき、keys/values/items/get も辞書と同じ順で返す。
+    知らないキーへの代入はKeyError（辞書と違い、キーは増えない）。
+    """
+    
+    __slots__ = ('_keys', '_index', '_v')
+    
+    def __init__(self, keys: Tuple[str, ...], index: Dict[str, int], values=None):
+        self._keys = keys
+        self._index = index
+        self._v = array('d', values) if values is not None else array('d', bytes(8 * len(keys)))
+    
+    @classmethod
+    def from_dict(cls, keys: Tuple[str, ...], index: Dict[str, int], d: Dict[str, float],
+                  default: float = 0.0) -> 'EmotionVector':
+        return cls(keys, index, [d.get(k, default) for k in keys])
+    
+    def __getitem__(self, key: str) -> float:
+        return self._v[self._index[key]]
+    
+    def __setitem__(self, key: str, value: float):
+        self._v[self._index[key]] = value
+    
+    def __contains__(self, key) -> bool:
+        return key in self._index
+    
+    def __iter__(self):
+        return iter(self._keys)
+    
+    def __len__(self) -> int:
+        return len(self._keys)
+    
+    def __eq__(self, other) -> bool:
+        if isinstance(other, EmotionVector):
+            return self._keys == other._keys and self._v == other._v
+        return NotImplemented
+    
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self.items())})"
+    
+    def get(self, key: str, default=None):
+        i = self._index.get(key)
+        return default if i is None else self._v[i]
+    
+    def keys(self) -> Tuple[str, ...]:
+        return self._keys
+    
+    def values(self) -> memoryview:
+        """値の読み取り専用ビュー（コピーしない）"""
+        return memoryview(self._v).toreadonly()
+    
+    def items(self):
+        return zip(self._keys, self._v)
+    
+    def copy(self) -> Dict[str, float]:
+        """辞書としてのコピー"""
+        return dict(zip(self._keys, self._v))
+    
+    def snapshot(self) -> 'FrozenEmotionVector':
+        """現在値の読み取り専用スナップショット（配列1本のコピーのみ）"""
+        return FrozenEmotionVector(self._keys, self._index, self._v)
+    
+    def view(self) -> 'EmotionVectorView':
+        """読み取り専用のライブビュー（コピーしない。値は元のベクトルに追従する）"""
+        return EmotionVectorView(self)
+    
+    def any_nonzero(self) -> bool:
+        return any(self._v)
+    
+    def scale(self, factors: 'EmotionVector'):
+        """要素ごとに factors を掛ける（1回の一括演算）"""
+        self._v = array('d', map(operator.mul, self._v, factors._v))
+    
+    def abs_diff_sum(self, other: 'EmotionVector') -> float:
+        """Σ|self[k] - other[k]|（キーの並び順に加算）"""
+        return sum(map(abs, map(operator.sub, self._v, other._v)))
+
+
+class FrozenEmotionVector(EmotionVector):
+    """読み取り専用のEmotionVector（get_stateの返り値など）"""
+    
+    __slots__ = ()
+    
+    def __setitem__(self, key: str, value: float):
+        raise TypeError("FrozenEmotionVector is read-only")
+    
+    def scale(self, factors: EmotionVector):
+        raise TypeError("FrozenEmotionVector is read-only")
+
+
+class EmotionVectorView:
+    """EmotionVectorの読み取り専用ビュー（L2Qualia.state_viewの返り値）
+    
+    ライブビューなので、後で値を比べたいときはsnapshot()で固定すること。
+    """
+    
+    __slots__ = ('_src',)
+    
+    def __init__(self, src: EmotionVector):
+        self._src = src
+    
+    def __getitem__(self, key: str) -> float:
+        src = self._src
+        return src._v[src._index[key]]
+    
+    def __contains__(self, key) -> bool:
+        return key in self._src._index
+    
+    def __iter__(self):
+        return iter(self._src._keys)
+    
+    def __len__(self) -> int:
+        return len(self._src._keys)
+    
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self.items())})"
+    
+    def get(self, key: str, default=None):
+        return self._src.get(key, default)
+    
+    def keys(self) -> Tuple[str, ...]:
+        return self._src._keys
+    
+    def values(self) -> memoryview:
+        return self._src.values()
+    
+    def items(self):
+        return self._src.items()
+    
+    def copy(self) -> Dict[str, float]:
+        return self._src.copy()
+    
+    def snapshot(self) -> 'FrozenEmotionVector':
+        return self._src.snapshot()
+
+
 class L2Qualia:
-    """クオリア（感情的評価）"""
+    """クオリア（感情的評価）
+    
+    個別クオリア・減衰率・原因の残存強度はEmotionVector（固定インデックスの
+    float配列）で持つ。decay_qualia()の減衰は配列ごとの一括演算。
+    """
+    
+    __slots__ = ('valence', 'arousal', 'qualia', 'decay', 'causes',
+                 'cause_strength', 'cause_decay', 'color_preference',
+                 'modulation', 'gain', '_qualia_view')
     
     def __init__(self, color_preference=None):
         # 基本2軸（Russell円環モデル）
@@ -203,7 +515,7 @@ class L2Qualia:
         self.arousal = 0.0   # 覚醒-沈静 (-1 to 1)
         
         # 個別クオリア（基本軸から派生 or 直接設定）
-        self.qualia = {
+        self.qualia = EmotionVector.from_dict(QUALIA_KEYS, QUALIA_INDEX, {
             'fear': 0.0,       # 恐怖
             'desire': 0.0,     # 欲求
             'surprise': 0.0,   # 驚き
@@ -213,10 +525,10 @@ class L2Qualia:
             'sadness': 0.0,    # 悲しみ（新規）
             'joy': 0.0,        # 喜び（新規）
             'disgust': 0.0,    # 嫌悪（新規）
-        }
+        })
         
         # 減衰率
-        self.decay = {
+        self.decay = EmotionVector.from_dict(QUALIA_KEYS, QUALIA_INDEX, {
             'fear': 0.9,
             'desire': 0.95,
             'surprise': 0.7,
@@ -226,24 +538,16 @@ class L2Qualia:
             'sadness': 0.92,   # 悲しみはゆっくり消える
             'joy': 0.9,        # 喜びも比較的早く消える
             'disgust': 0.8,    # 嫌悪は早く消える
-        }
+        })
         
         # 感情の原因（言語）- 感情より早く忘れる
-        self.causes = {
-            'fear': None,
-            'anger': None,
-            'sadness': None,
-            'joy': None,
-            'disgust': None,
-            'surprise': None,
-            'urgency': None,
-        }
+        self.causes = dict.fromkeys(CAUSE_KEYS)
         
         # 原因の残存強度（1.0=鮮明、0.0=忘れた）
-        self.cause_strength = {k: 0.0 for k in self.causes}
+        self.cause_strength = EmotionVector(CAUSE_KEYS, CAUSE_INDEX)
         
         # 原因の減衰率（感情より速く忘れる）
-        self.cause_decay = {
+        self.cause_decay = EmotionVector.from_dict(CAUSE_KEYS, CAUSE_INDEX, {
             'fear': 0.7,
             'anger': 0.5,    # 怒りの原因は特に早く忘れる
             'sadness': 0.75,
@@ -251,7 +555,7 @@ class L2Qualia:
             'disgust': 0.6,
             'surprise': 0.5,
             'urgency': 0.7,
-        }
+        })
         
         # 色の好み（DNA由来）
         self.color_preference = color_preference or {
@@ -268,6 +572,8 @@ class L2Qualia:
         # 引き込みゲイン（v2.1: L5主導層による追随変調）
         # 主導層に引き込まれると上昇し、情動応答の感度が増幅される
         self.gain = 1.0
+        
+        self._qualia_view = None  # state_view用（qualiaが差し替えられたら作り直す）
     
     def apply_modulation(self, mod: Dict):
         """変調値を適用"""
@@ -342,19 +648,21 @@ class L2Qualia:
     
     def decay_qualia(self):
         """クオリアの自然減衰"""
-        for key in self.qualia:
-            self.qualia[key] *= self.decay.get(key, 0.95)
+        self.qualia.scale(self.decay)
         
         # 基本軸も中央に戻る
         self.valence *= 0.98
         self.arousal *= 0.95
         
         # 原因も減衰（感情より速く忘れる）
-        for key in self.cause_strength:
-            self.cause_strength[key] *= self.cause_decay.get(key, 0.7)
-            if self.cause_strength[key] < 0.1:
-                self.causes[key] = None  # 完全に忘れた
-                self.cause_strength[key] = 0.0
+        # 覚えている原因がなければ全0のままなので何もしない
+        strength = self.cause_strength
+        if strength.any_nonzero():
+            strength.scale(self.cause_decay)
+            for key, value in strength.items():
+                if value < 0.1 and value:
+                    self.causes[key] = None  # 完全に忘れた
+                    strength[key] = 0.0
     
     def set_cause(self, emotion: str, cause: str):
         """感情の原因を記録"""
@@ -373,11 +681,28 @@ class L2Qualia:
         return self.color_preference.get(color, 0.5)
     
     def get_state(self) -> Dict:
+        """状態（qualia・color_preferenceはその時点の読み取り専用コピー）"""
+        return {
+            'valence': self.valence,
+            'arousal': self.arousal,
+            'qualia': self.qualia.snapshot(),
+            'color_preference': MappingProxyType(dict(self.color_preference))
+        }
+    
+    def state_view(self) -> Dict:
+        """get_state() のコピーしない版（qualia・color_preferenceは読み取り専用ビュー）
+        
+        ビューは現在値に追従する。受け取ったその場で読み終える呼び出し元
+        （記憶・自認・ラベル付け）用。値を保持したい場合は get_state() を使うこと。
+        """
+        view = self._qualia_view
+        if view is None or view._src is not self.qualia:
+            view = self._qualia_view = self.qualia.view()
         return {
             'valence': self.valence,
             'arousal': self.arousal,
-            'qualia': self.qualia.copy(),
-            'color_preference': self.color_preference.copy()
+            'qualia': view,
+            'color_preference': MappingProxyType(self.color_preference)
         }
 
 
@@ -389,17 +714,26 @@ class L3Prediction:
     """予測と誤差検出"""
     
     def __init__(self):
-        self.predictions = {}  # 予測した内容
+        self.predictions = {}  # 予測した内容（L4内部マップの読み取り専用ビュー）
+        self.predicted_version = -1  # 予測時点の内部マップのバージョン
+        self.predictions_count = 0
         self.errors = []       # 今ステップの予測誤差
         
         # 引き込みゲイン（v2.1: L5主導層による追随変調）
         # 主導層に引き込まれると上昇し、予測誤差の検出感度が増幅される
         self.gain = 1.0
     
-    def predict(self, l4_memory) -> Dict:
-        """L4記憶に基づいて予測"""
-        # 既知のマップから次に見えるものを予測
-        self.predictions = l4_memory.internal_map.copy()
+    def predict(self, l4_memory) -> Mapping:
+        """L4記憶に基づいて予測
+        
+        既知のマップから次に見えるものを予測する。マップ全体はコピーせず、
+        L4の読み取り専用ビューとバージョンを記録するだけ（マップの大きさに
+        よらずO(1)）。誤差は compare_with_reality で感覚に入ったセルだけ計算する。
+        L4の記憶更新は比較の後に行われるため、比較時のビューは予測時点の内容と一致する。
+        """
+        self.predictions = l4_memory.map_view()
+        self.predicted_version = l4_memory.internal_map.version
+        self.predictions_count = len(self.predictions)
         return self.predictions
     
     def compare_with_reality(self, sense_data: Dict, l4_memory) -> List[Dict]:
@@ -448,30 +782,698 @@ class L3Prediction:
     
     def get_state(self) -> Dict:
         return {
-            'predictions_count': len(self.predictions),
+            'predictions_count': self.predictions_count,
             'errors': self.errors.copy()
         }
 
 
+# ==========================================
+# L4の保存先（長期記憶・傾向集計・変調値）
+# ==========================================
+
+class MemoryStore(ABC):
+    """L4Memoryの永続化先のインターフェース
+    
+    長期記憶は通し番号(seq)付きの追記専用ログとして扱う。
+    傾向集計（チェックポイント）は「seq < count の記憶を集計した値」で、
+    起動時はチェックポイント＋それ以降の記憶だけを読めばよい。
+    
+    必要なメソッド（@abstractmethod）が欠けた保存先は作成時に TypeError になる。
+    読み書きのエラーは events に 'ltm_error' イベントとして送る。events は
+    この保存先を持つ L4Memory が自分の events を設定する（未設定なら標準出力）。
+    """
+    
+    events: Optional[EventSink] = None
+    
+    def _error(self, tag: str, message: str, error):
+        sink = self.events if self.events is not None else PrintSink()
+        sink.emit('ltm_error', EventLevel.WARNING, tag=tag, message=message, error=str(error))
+    
+    @abstractmethod
+    def load_summary(self, version: int) -> Optional[Tuple[Dict, int]]:
+        """有効なチェックポイント (tendencies, count) を返す。なければNone（全件再生）"""
+    
+    @abstractmethod
+    def read_records(self, start: int = 0):
+        """seq >= start の記憶を順に返す"""
+    
+    @abstractmethod
+    def append(self, seq: int, memory: Dict):
+        """記憶を1件追記する"""
+    
+    @abstractmethod
+    def checkpoint(self, version: int, tendencies: Dict, count: int, background: bool = True) -> bool:
+        """傾向集計を保存する（保存先によっては圧縮も行う）
+        
+        開始しなかった（前の圧縮がまだ実行中）ならFalse。呼び出し側は後で再試行する
+        """
+    
+    def flush(self):
+        """バックグラウンド処理の完了を待つ"""
+    
+    @abstractmethod
+    def load_modulation(self) -> Optional[Dict]:
+        """変調値を返す。未保存ならNone"""
+    
+    @abstractmethod
+    def save_modulation(self, modulation: Dict):
+        """変調値を保存する"""
+    
+    @abstractmethod
+    def clear(self) -> List[str]:
+        """保存内容をすべて消す（消したものの名前を返す）"""
+
+
+class InMemoryStore(MemoryStore):
+    """プロセス内のみの保存先（ディスクI/Oなし）
+    
+    シミュレーション・掃引用。同じインスタンスを次のHIDAに渡せば
+    セッションをまたいで記憶が引き継がれる。
+    """
+    
+    def __init__(self):
+        self.records = []
+        self.summary = None       # (version, tendencies, count)
+        self.modulation = None
+    
+    def load_summary(self, version):
+        if self.summary and self.summary[0] == version:
+            return dict(self.summary[1]), self.summary[2]
+        return None
+    
+    def read_records(self, start=0):
+        return iter(self.records[start:])
+    
+    def append(self, seq, memory):
+        self.records.append(memory)
+    
+    def checkpoint(self, version, tendencies, count, background=True):
+        self.summary = (version, dict(tendencies), count)
+        return True
+    
+    def load_modulation(self):
+        return dict(self.modulation) if self.modulation is not None else None
+    
+    def save_modulation(self, modulation):
+        self.modulation = dict(modulation)
+    
+    def clear(self):
+        self.__init__()
+        return []
+
+
+class DirectoryStore(MemoryStore):
+    """ディレクトリ内のファイルに保存する（既定はカレントディレクトリ）
+    
+    - hida_ltm.json: スナップショット（圧縮済みの全件、JSONリスト）
+    - hida_ltm.jsonl: 追記専用ジャーナル（1行 = {"seq", "memory"}）
+    - hida_tendencies.json: 傾向集計（スナップショットと対で保存）
+    - hida_modulation.json: 変調値
+    
+    記憶の追記はジャーナルへの1行追記のみ（記憶の総量によらず一定コスト）。
+    チェックポイントでバックグラウンドにスナップショットへ圧縮する。
+    エージェントごとに別ディレクトリを渡せば、並列実行でも干渉しない。
+    """
+    
+    LTM_FILE = "hida_ltm.json"
+    LTM_JOURNAL = "hida_ltm.jsonl"
+    TENDENCIES_FILE = "hida_tendencies.json"
+    MODULATION_FILE = "hida_modulation.json"
+    
+    def __init__(self, path: str = '.'):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._compactor = None
+        self._snapshot_count = None   # スナップショットの件数（有効な集計を読んだときに判明）
+        self._tail_checked = False    # ジャーナル末尾の改行を確かめたか（最初の追記で1回）
+    
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+    
+    def _snapshot_size(self) -> Optional[int]:
+        try:
+            return os.stat(self._file(self.LTM_FILE)).st_size
+        except OSError:
+            return None
+    
+    def _read_snapshot(self) -> List[Dict]:
+        try:
+            with open(self._file(self.LTM_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            self._error("LTM", "読み込みエラー", e)
+            return []
+    
+    def _read_journal(self):
+        try:
+            with open(self._file(self.LTM_JOURNAL), 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # 書き込み途中で中断した行（後の行は読む）
+                    yield entry['seq'], entry['memory']
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            self._error("LTM", "ジャーナル読み込みエラー", e)
+    
+    def load_summary(self, version):
+        """傾向集計を読む
+        
+        集計は {version, count, snapshot_size, tendencies} を持つ。
+        version（集計ルール）かsnapshot_size（スナップショットの同一性）が
+        一致しなければ無効（呼び出し側で全件再生になる）。
+        """
+        snapshot_size = self._snapshot_size()
+        if snapshot_size is None:
+            self._snapshot_count = 0
+            return None
+        try:
+            with open(self._file(self.TENDENCIES_FILE), 'r', encoding='utf-8') as f:
+                summary = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self._error("LTM", "傾向集計の読み込みエラー", e)
+            return None
+        if (summary.get('version') != version
+                or summary.get('snapshot_size') != snapshot_size):
+            return None
+        self._snapshot_count = summary['count']
+        return summary['tendencies'], summary['count']
+    
+    def read_records(self, start=0):
+        """スナップショット＋ジャーナルを再生する
+        
+        通し番号が既読件数未満の行は圧縮済みなので読み飛ばす
+        （圧縮の途中で中断しても二重に読み込まない）。
+        startがスナップショット以降なら、スナップショットは読まない。
+        """
+        if self._snapshot_count is None or start < self._snapshot_count:
+            data = self._read_snapshot()
+            yield from data[start:]
+            next_seq = len(data)
+        else:
+            next_seq = self._snapshot_count
+        for seq, memory in self._read_journal():
+            if seq == next_seq:
+                if seq >= start:
+                    yield memory
+                next_seq += 1
+    
+    def _end_torn_line(self, f):
+        """末尾が書き込み途中の行なら改行で閉じる（次の行がつながらないように）"""
+        f.seek(0, os.SEEK_END)
+        if f.tell() > 0:
+            f.seek(f.tell() - 1)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+        self._tail_checked = True
+    
+    def append(self, seq, memory):
+        with self._lock:
+            try:
+                if not self._tail_checked:
+                    with open(self._file(self.LTM_JOURNAL), 'a+b') as f:
+                        self._end_torn_line(f)
+                with open(self._file(self.LTM_JOURNAL), 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({'seq': seq, 'memory': memory}, ensure_ascii=False) + "\n")
+            except Exception as e:
+                self._error("LTM", "保存エラー", e)
+    
+    def checkpoint(self, version, tendencies, count, background=True):
+        """ジャーナルをスナップショットに圧縮し、傾向集計を対で保存する
+        
+        background=True: 別スレッドで実行（実行中なら何もせずFalse）
+        background=False: 実行中の圧縮を待ってから、同期的に圧縮する
+        """
+        if self._compactor is not None and self._compactor.is_alive():
+            if background:
+                return False
+            self._compactor.join()
+        args = (version, dict(tendencies), count)
+        if background:
+            self._compactor = threading.Thread(target=self._compact, args=args, daemon=False)
+            self._compactor.start()
+        else:
+            self._compact(*args)
+        return True
+    
+    def _compact(self, version, tendencies, count):
+        """1. 件数countまでをスナップショットに書く（一時ファイル→置換）
+        2. 傾向集計を対で保存
+        3. ジャーナルから通し番号count未満の行を除く（圧縮中に追記された行は残る）
+        """
+        records = []
+        for memory in self.read_records(0):
+            if len(records) == count:
+                break
+            records.append(memory)
+        if len(records) != count:
+            self._error("LTM", "圧縮中止", f"件数不一致（{len(records)} != {count}）")
+            return
+        
+        try:
+            tmp = self._file(self.LTM_FILE + ".tmp")
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(records, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self._file(self.LTM_FILE))
+            
+            tmp = self._file(self.TENDENCIES_FILE + ".tmp")
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'version': version,
+                    'count': count,
+                    'snapshot_size': self._snapshot_size(),
+                    'tendencies': tendencies,
+                }, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, self._file(self.TENDENCIES_FILE))
+        except Exception as e:
+            self._error("LTM", "保存エラー", e)
+            return
+        
+        with self._lock:
+            self._snapshot_count = count
+            try:
+                with open(self._file(self.LTM_JOURNAL), 'r', encoding='utf-8') as f:
+                    rest = [line for line in f if line.strip() and self._journal_seq(line) >= count]
+                tmp = self._file(self.LTM_JOURNAL + ".tmp")
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    f.writelines(rest)
+                os.replace(tmp, self._file(self.LTM_JOURNAL))
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                self._error("LTM", "ジャーナル圧縮エラー", e)
+    
+    @staticmethod
+    def _journal_seq(line: str) -> int:
+        try:
+            return json.loads(line)['seq']
+        except (ValueError, KeyError):
+            return -1
+    
+    def flush(self):
+        if self._compactor is not None:
+            self._compactor.join()
+    
+    def load_modulation(self):
+        try:
+            with open(self._file(self.MODULATION_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            return None
+    
+    def save_modulation(self, modulation):
+        try:
+            with open(self._file(self.MODULATION_FILE), 'w', encoding='utf-8') as f:
+                json.dump(modulation, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            self._error("Mod", "保存エラー", e)
+    
+    def clear(self):
+        self.flush()
+        removed = []
+        for name in (self.LTM_FILE, self.LTM_JOURNAL, self.TENDENCIES_FILE, self.MODULATION_FILE):
+            path = self._file(name)
+            if os.path.exists(path):
+                os.remove(path)
+                removed.append(path)
+        self._snapshot_count = None
+        return removed
+
+
+class SQLiteStore(MemoryStore):
+    """SQLiteデータベースに保存する
+    
+    長期記憶は seq を主キー（索引）とする表への1行挿入。
+    傾向集計・変調値は meta 表に保存する。圧縮は不要。
+    """
+    
+    def __init__(self, path: str = "hida_memory.sqlite3"):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS ltm (seq INTEGER PRIMARY KEY, memory TEXT NOT NULL)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.conn.commit()
+    
+    def _get_meta(self, key: str) -> Optional[Dict]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def _set_meta(self, key: str, value: Dict):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                          (key, json.dumps(value, ensure_ascii=False)))
+        self.conn.commit()
+    
+    def load_summary(self, version):
+        summary = self._get_meta('tendencies')
+        if summary and summary.get('version') == version:
+            return summary['tendencies'], summary['count']
+        return None
+    
+    def read_records(self, start=0):
+        cur = self.conn.execute("SELECT memory FROM ltm WHERE seq >= ? ORDER BY seq", (start,))
+        for (memory,) in cur:
+            yield json.loads(memory)
+    
+    def append(self, seq, memory):
+        try:
+            self.conn.execute("INSERT INTO ltm (seq, memory) VALUES (?, ?)",
+                              (seq, json.dumps(memory, ensure_ascii=False)))
+            self.conn.commit()
+        except sqlite3.Error as e:
+            self._error("LTM", "保存エラー", e)
+    
+    def checkpoint(self, version, tendencies, count, background=True):
+        self._set_meta('tendencies', {'version': version, 'count': count, 'tendencies': tendencies})
+        return True
+    
+    def load_modulation(self):
+        return self._get_meta('modulation')
+    
+    def save_modulation(self, modulation):
+        self._set_meta('modulation', modulation)
+    
+    def clear(self):
+        self.conn.execute("DELETE FROM ltm")
+        self.conn.execute("DELETE FROM meta")
+        self.conn.commit()
+        return [self.path]
+    
+    def close(self):
+        self.conn.close()
+
+
+class DeferredStore(InMemoryStore):
+    """別の保存先への書き込みをまとめて遅らせる保存先
+
+    作成時に元の保存先（DirectoryStore / SQLiteStore など）の内容を一度だけ
+    読み込み、以降の追記・チェックポイント・変調値はメモリ上で行う。
+    persist() を呼んだときだけ、未反映の分をまとめて元の保存先に書く。
+    多数のセッションを続けて走らせる場合に使う（run_sessions）。
+    """
+
+    def __init__(self, target: MemoryStore, version: Optional[int] = None):
+        """version: 傾向集計のバージョン（Noneなら L4Memory.TENDENCIES_VERSION）"""
+        super().__init__()
+        self.target = target
+        if version is None:
+            version = L4Memory.TENDENCIES_VERSION
+        # DirectoryStore はチェックポイントを読んでから全件を読む（スナップショットの件数）
+        summary = target.load_summary(version)
+        self.records = list(target.read_records(0))
+        if summary is not None:
+            self.summary = (version, summary[0], summary[1])
+        self.modulation = target.load_modulation()
+        self.persist_count = 0
+        self._mark_persisted()
+
+    @property
+    def events(self) -> Optional[EventSink]:
+        """エラーの送り先（元の保存先と共有する）"""
+        return self.target.events
+
+    @events.setter
+    def events(self, sink: Optional[EventSink]):
+        self.target.events = sink
+
+    def _mark_persisted(self):
+        self._persisted = len(self.records)
+        self._persisted_summary = self.summary
+        self._persisted_modulation = self.load_modulation()
+
+    @property
+    def pending(self) -> int:
+        """元の保存先に未反映の記憶の件数"""
+        return len(self.records) - self._persisted
+
+    def persist(self):
+        """未反映の記憶・チェックポイント・変調値を元の保存先に書く"""
+        for seq in range(self._persisted, len(self.records)):
+            self.target.append(seq, self.records[seq])
+        if self.summary is not None and self.summary != self._persisted_summary:
+            self.target.checkpoint(*self.summary, background=False)
+        if self.modulation is not None and self.modulation != self._persisted_modulation:
+            self.target.save_modulation(self.modulation)
+        self.target.flush()
+        self.persist_count += 1
+        self._mark_persisted()
+
+    def clear(self):
+        removed = self.target.clear()
+        self.records = []
+        self.summary = None
+        self.modulation = None
+        self._mark_persisted()
+        return removed
+
+
 # ==========================================
 # L4: 記憶層
 # ==========================================
 
+_MISSING = object()
+
+
+class VersionedMap(dict):
+    """内容が変わるたびに version が進む辞書（L4の内部マップ用）
+    
+    値が変わらない上書きではversionは進まない。予測（L3）や経路計画などの
+    キャッシュは、versionを比べるだけでマップの変化を検知できる。
+    
+    fingerprint は内容の指紋（各 (キー, 値) のハッシュのXOR）で、変更のたびに
+    O(1)で更新される。別々のマップでも内容が同じなら同じ値になるので、
+    エージェント間でキャッシュを共有するキーに使える（PathPlanner）。
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = 0
+        self.fingerprint = 0
+        for item in dict.items(self):
+            self.fingerprint ^= hash(item)
+    
+    def __setitem__(self, key, value):
+        old = dict.get(self, key, _MISSING)
+        if old != value:
+            if old is not _MISSING:
+                self.fingerprint ^= hash((key, old))
+            dict.__setitem__(self, key, value)
+            self.fingerprint ^= hash((key, value))
+            self.version += 1
+    
+    def __delitem__(self, key):
+        self.fingerprint ^= hash((key, dict.__getitem__(self, key)))
+        dict.__delitem__(self, key)
+        self.version += 1
+    
+    def pop(self, key, *default):
+        if key in self:
+            value = dict.pop(self, key)
+            self.fingerprint ^= hash((key, value))
+            self.version += 1
+            return value
+        return dict.pop(self, key, *default)
+    
+    def popitem(self):
+        item = dict.popitem(self)
+        self.fingerprint ^= hash(item)
+        self.version += 1
+        return item
+    
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return dict.__getitem__(self, key)
+    
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+    
+    def clear(self):
+        if self:
+            self.version += 1
+        self.fingerprint = 0
+        dict.clear(self)
+    
+    def __reduce__(self):
+        # pickleの既定は属性より先に要素を__setitem__で戻すため、自前で復元する
+        return self.__class__._restore, (dict(self), self.version)
+    
+    @classmethod
+    def _restore(cls, items: Dict, version: int) -> 'VersionedMap':
+        restored = cls(items)
+        restored.version = version
+        return restored
+
+
+class ObjectIndex(dict):
+    """発見物の辞書 (x,y) -> object_info と種類別の副索引（L4の found_objects 用）
+    
+    think() が毎ステップ全件を走査しなくて済むように、名前別（by_name）と
+    ボールの色別（balls_by_color）に位置を持つ。各索引は {位置: None} で、
+    この辞書の並び順（最初に登録された順）を保つ。そのため ball_candidates() /
+    goal_position() は全件を走査した場合と同じ結果を返す。
+    登録済みのオブジェクトの名前・色を書き換えるときは、登録し直すこと。
+    
+    version は登録・削除・別のオブジェクトへの置き換えのたびに進む
+    （同じオブジェクトの再登録では進まない）。集団エンジンが候補表の
+    キャッシュを作り直すかどうかの判定に使う。
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.version = 0
+        self._seq = {}              # 位置 -> 登録番号（辞書の並び順）
+        self._next_seq = 0
+        self.by_name: Dict[str, Dict[Tuple[int, int], None]] = {}
+        self.balls_by_color: Dict[str, Dict[Tuple[int, int], None]] = {}
+        self.update(*args, **kwargs)
+    
+    def _tables(self, obj) -> list:
+        """objが載る索引 [(索引, キー)]"""
+        name = obj.get('name')
+        tables = [(self.by_name, name)]
+        if name == 'ball':
+            tables.append((self.balls_by_color, obj.get('color', 'unknown')))
+        return tables
+    
+    @staticmethod
+    def _kind(obj) -> tuple:
+        name = obj.get('name')
+        return name, (obj.get('color', 'unknown') if name == 'ball' else None)
+    
+    def _link(self, pos, obj, reorder: bool):
+        for table, key in self._tables(obj):
+            bucket = table.setdefault(key, {})
+            bucket[pos] = None
+            if reorder and len(bucket) > 1:
+                # 既存の位置の種類が変わった: 辞書の並び順に並べ直す（まれ）
+                table[key] = dict.fromkeys(sorted(bucket, key=self._seq.__getitem__))
+    
+    def _unlink(self, pos, obj):
+        for table, key in self._tables(obj):
+            bucket = table[key]
+            del bucket[pos]
+            if not bucket:
+                del table[key]
+    
+    def __setitem__(self, key, value):
+        old = dict.get(self, key, _MISSING)
+        dict.__setitem__(self, key, value)
+        if old is not value:
+            self.version += 1
+        if old is _MISSING:
+            self._seq[key] = self._next_seq
+            self._next_seq += 1
+            self._link(key, value, reorder=False)
+        elif self._kind(old) != self._kind(value):
+            self._unlink(key, old)
+            self._link(key, value, reorder=True)
+    
+    def __delitem__(self, key):
+        self._unlink(key, dict.__getitem__(self, key))
+        dict.__delitem__(self, key)
+        del self._seq[key]
+        self.version += 1
+    
+    def pop(self, key, *default):
+        if key in self:
+            value = dict.__getitem__(self, key)
+            del self[key]
+            return value
+        return dict.pop(self, key, *default)
+    
+    def popitem(self):
+        key = next(reversed(self.keys()))
+        return key, self.pop(key)
+    
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return dict.__getitem__(self, key)
+    
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+    
+    def clear(self):
+        dict.clear(self)
+        self.version += 1
+        self._seq.clear()
+        self.by_name.clear()
+        self.balls_by_color.clear()
+    
+    def __reduce__(self):
+        # 索引は登録順に作り直す（pickleの既定の復元順では属性がまだない）
+        return self.__class__, (dict(self),)
+    
+    def ball_candidates(self) -> List[Tuple[str, Tuple[int, int]]]:
+        """色ごとに1つのボール [(色, 位置)]
+        
+        全件を順に見て balls[色] = … と上書きした場合と同じ: 色の並びは
+        その色が最初に現れた順、位置はその色で最後に登録されたもの。
+        """
+        buckets = self.balls_by_color
+        seq = self._seq
+        colors = sorted(buckets, key=lambda c: seq[next(iter(buckets[c]))])
+        return [(c, next(reversed(buckets[c].keys()))) for c in colors]
+    
+    def goal_position(self) -> Optional[Tuple[int, int]]:
+        """最後に登録されたゴールの位置（なければNone）"""
+        goals = self.by_name.get('goal')
+        return next(reversed(goals.keys())) if goals else None
+
+
 class L4Memory:
-    """記憶（内部マップ、発見物、ラベル辞書、長期記憶）"""
+    """記憶（内部マップ、発見物、ラベル辞書、長期記憶）
     
-    LTM_FILE = "hida_ltm.json"
+    長期記憶・傾向集計・変調値の保存先は store（MemoryStore）で差し替えられる。
+    既定はカレントディレクトリの DirectoryStore。
+    """
     
-    def __init__(self):
-        self.internal_map = {}      # (x,y) -> cell_type
-        self.found_objects = {}     # (x,y) -> object_info
+    LTM_COMPACT_EVERY = 200               # この件数の追記ごとにチェックポイント（圧縮）
+    TENDENCIES_VERSION = 1                # 傾向の集計ルールを変えたら上げる（全件再構築になる）
+    
+    # activation_count の増加量（v2.0 初期DNA。L5のL4活動量の元になる）
+    # いずれも引き込みゲイン（self.gain）を掛けて加算する
+    ACT_NEW_CELL = 1.0        # 新規セル発見
+    ACT_NEW_OBJECT = 1.0      # 新規オブジェクト発見
+    ACT_REOBSERVE = 0.3       # 既知オブジェクトの再観測
+    ACT_ERROR_BASE = 1.0      # 予測誤差由来の記憶更新（これにクオリア強度を足す）
+    ACT_NEW_VISIT = 0.5       # 新規訪問
+    
+    def __init__(self, store: Optional[MemoryStore] = None, events: Optional[EventSink] = None):
+        self.events = events if events is not None else PrintSink()
+        self.internal_map = VersionedMap()  # (x,y) -> cell_type（変更のたびにversionが進む）
+        self._map_view = MappingProxyType(self.internal_map)
+        self.found_objects = ObjectIndex()  # (x,y) -> object_info（名前・色別の索引つき）
         self.visited = set()        # 訪れた場所
         
         # 短期記憶（今回のセッション）
         self.stm = []
         
         # 長期記憶（永続化）
-        self.ltm = self._load_ltm()
+        # 記憶本体（self.ltm）は参照されたときに初めて読み込む。起動時に読むのは
+        # 固定サイズの傾向集計と、前回のチェックポイント以降の記憶のみ。
+        self.store = store if store is not None else DirectoryStore('.')
+        self._ltm_lock = threading.Lock()
+        self._journal_count = 0     # 前回のチェックポイント以降の追記件数
+        self._ltm = None            # 記憶本体（遅延読み込み）
+        self._tendencies, self._ltm_count = self._load_tendencies()
+        if self._ltm_count:
+            self.events.emit('ltm_loaded', count=self._ltm_count)
+        else:
+            self.events.emit('ltm_new')
         
         # 記憶活性化カウンタ（v2.0: L5の主導・追随モデルで使用）
         # 増加トリガー: 新規発見、記憶照合、長期記憶参照、感情原因想起など
@@ -493,43 +1495,46 @@ class L4Memory:
             '急がなきゃ': {'urgency': (0.6, 1.0)},
         }
         
-        # 経験から学んだ傾向（長期記憶から構築）
-        self.learned_tendencies = self._build_tendencies()
+        # 経験から学んだ傾向（セッション開始時点の長期記憶から。セッション中は固定）
+        # 追記のたびに更新される集計は self._tendencies が持つ
+        self.learned_tendencies = dict(self._tendencies)
         
         # 変調値（数値のみ、テキストなし）
         self.modulation = self._load_modulation()
         self._update_modulation()
     
+    @property
+    def store(self) -> MemoryStore:
+        """長期記憶・傾向集計・変調値の保存先（読み書きのエラーは self.events に送る）"""
+        return self._store
+    
+    @store.setter
+    def store(self, store: MemoryStore):
+        if store is not None:
+            store.events = self.events
+        self._store = store
+    
     def _load_modulation(self) -> Dict:
-        """変調値をファイルから読み込む"""
-        try:
-            with open("hida_modulation.json", 'r', encoding='utf-8') as f:
-                mod = json.load(f)
-                print(f"  [Mod] 変調値を読み込み: fear={mod.get('fear_weight', 1.0):.2f}, safe={mod.get('safe_preference', 0.0):.2f}")
-                return mod
-        except FileNotFoundError:
-            return {
-                'fear_weight': 1.0,      # 恐怖感度（1.0=標準）
-                'safe_preference': 0.0,  # 安全志向（0.0=なし）
-                'energy_caution': 0.0,   # エネルギー慎重さ
-                'experience_count': 0,   # 経験回数
-                'last_danger_count': 0,  # 前回処理済みのdanger回数
-                'last_safe_count': 0,    # 前回処理済みのsafe成功回数
-                'last_red_count': 0,     # 前回処理済みのred成功回数
-            }
-        except:
-            return {
-                'fear_weight': 1.0, 'safe_preference': 0.0, 'energy_caution': 0.0,
-                'experience_count': 0, 'last_danger_count': 0, 'last_safe_count': 0, 'last_red_count': 0
-            }
+        """変調値を保存先から読み込む"""
+        mod = self.store.load_modulation()
+        if mod is not None:
+            self.events.emit('modulation_loaded',
+                             fear_weight=mod.get('fear_weight', 1.0),
+                             safe_preference=mod.get('safe_preference', 0.0))
+            return mod
+        return {
+            'fear_weight': 1.0,      # 恐怖感度（1.0=標準）
+            'safe_preference': 0.0,  # 安全志向（0.0=なし）
+            'energy_caution': 0.0,   # エネルギー慎重さ
+            'experience_count': 0,   # 経験回数
+            'last_danger_count': 0,  # 前回処理済みのdanger回数
+            'last_safe_count': 0,    # 前回処理済みのsafe成功回数
+            'last_red_count': 0,     # 前回処理済みのred成功回数
+        }
     
     def _save_modulation(self):
-        """変調値をファイルに保存"""
-        try:
-            with open("hida_modulation.json", 'w', encoding='utf-8') as f:
-                json.dump(self.modulation, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"  [Mod] 保存エラー: {e}")
+        """変調値を保存先に保存"""
+        self.store.save_modulation(self.modulation)
     
     def _update_modulation(self):
         """経験から変調値を更新（数値のみ）
@@ -594,40 +1599,76 @@ class L4Memory:
         # 変化があれば保存
         if self.modulation != old_mod:
             self._save_modulation()
-            fear_before = old_mod.get('fear_weight', 1.0)
-            fear_after = self.modulation['fear_weight']
-            safe_before = old_mod.get('safe_preference', 0.0)
-            safe_after = self.modulation['safe_preference']
-            print(f"  [Mod] 変調値更新: fear={fear_before:.2f}→{fear_after:.2f}, safe={safe_before:.2f}→{safe_after:.2f}")
+            self.events.emit('modulation_updated',
+                             fear_before=old_mod.get('fear_weight', 1.0),
+                             fear_after=self.modulation['fear_weight'],
+                             safe_before=old_mod.get('safe_preference', 0.0),
+                             safe_after=self.modulation['safe_preference'])
     
     def get_modulation(self) -> Dict:
         """変調値を返す"""
         return self.modulation.copy()
     
-    def _load_ltm(self) -> List[Dict]:
-        """長期記憶をファイルから読み込む"""
-        try:
-            with open(self.LTM_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                print(f"  [LTM] {len(data)}件の記憶を読み込み")
-                return data
-        except FileNotFoundError:
-            print(f"  [LTM] 新規（記憶なし）")
-            return []
-        except Exception as e:
-            print(f"  [LTM] 読み込みエラー: {e}")
-            return []
-    
-    def _save_ltm(self):
-        """長期記憶をファイルに保存"""
-        try:
-            with open(self.LTM_FILE, 'w', encoding='utf-8') as f:
-                json.dump(self.ltm, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"  [LTM] 保存エラー: {e}")
+    @property
+    def ltm(self) -> List[Dict]:
+        """長期記憶の全件（初回参照時に保存先から読み込む）"""
+        if self._ltm is None:
+            with self._ltm_lock:
+                if self._ltm is None:
+                    self._ltm = list(self.store.read_records(0))
+        return self._ltm
+    
+    def _load_tendencies(self) -> Tuple[Dict, int]:
+        """傾向集計と長期記憶の件数を読み込む（O(1) + チェックポイント以降の記憶）
+        
+        保存先に有効なチェックポイントがない場合（初回・集計ルールの
+        バージョン不一致・スナップショットの差し替え）のみ、全件を再生して
+        再構築する。再構築が大きければ直ちに新しいチェックポイントを作る。
+        """
+        summary = self.store.load_summary(self.TENDENCIES_VERSION)
+        if summary is None:
+            tendencies, count = self._build_tendencies([]), 0
+        else:
+            tendencies, count = summary
+        
+        for memory in self.store.read_records(count):
+            self._apply_tendency(tendencies, memory)
+            count += 1
+            self._journal_count += 1
+        
+        if self._journal_count >= self.LTM_COMPACT_EVERY:
+            if self.store.checkpoint(self.TENDENCIES_VERSION, tendencies, count):
+                self._journal_count = 0
+        return tendencies, count
+    
+    def _append_ltm(self, memory: Dict):
+        """長期記憶に1件追加して保存先に追記する（傾向集計も更新）"""
+        with self._ltm_lock:
+            seq = self._ltm_count
+            self._ltm_count += 1
+            if self._ltm is not None:
+                self._ltm.append(memory)
+            self._apply_tendency(self._tendencies, memory)
+            self.store.append(seq, memory)
+            self._journal_count += 1
+            # 前の圧縮が実行中で始まらなければ、次の追記で再試行する
+            if self._journal_count >= self.LTM_COMPACT_EVERY:
+                if self.store.checkpoint(self.TENDENCIES_VERSION, self._tendencies, self._ltm_count):
+                    self._journal_count = 0
+    
+    def compact_ltm(self, background: bool = False):
+        """チェックポイントを作る（DirectoryStoreではスナップショットへの圧縮）
+        
+        background=False: 完了まで待つ
+        """
+        with self._ltm_lock:
+            if self.store.checkpoint(self.TENDENCIES_VERSION, self._tendencies,
+                                     self._ltm_count, background=background):
+                self._journal_count = 0
     
-    def _build_tendencies(self) -> Dict:
-        """長期記憶から傾向を構築"""
+    @staticmethod
+    def _build_tendencies(records: List[Dict]) -> Dict:
+        """長期記憶から傾向を構築（全件走査。集計が使えない場合の再構築用）"""
         tendencies = {
             'danger_pain': 0,          # 痛い経験の回数
             'danger_fatigue': 0,       # 疲労経験の回数
@@ -639,40 +1680,42 @@ class L4Memory:
             'avg_final_energy': 0.5,   # 平均最終エネルギー
         }
         
-        if not self.ltm:
-            return tendencies
-        
-        for memory in self.ltm:
-            event = memory.get('event', '')
-            qualia = memory.get('qualia', {})
-            
-            # 痛み経験
-            if 'danger_pain' in event:
-                tendencies['danger_pain'] += 1
-                tendencies['danger_encounters'] += 1
-                tendencies['danger_fear_total'] += qualia.get('fear', 0)
-            
-            # 疲労経験
-            if 'danger_fatigue' in event:
-                tendencies['danger_fatigue'] += 1
-            
-            # goal_reached_with_XXX を解析
-            if 'goal_reached_with_red' in event:
-                tendencies['success_with_red'] += 1
-            elif 'goal_reached_with_green' in event or 'goal_reached_with_blue' in event:
-                tendencies['success_with_safe'] += 1
-            
-            if memory.get('is_session_end'):
-                tendencies['total_sessions'] += 1
-                energy = memory.get('energy', 0.5)
-                # 移動平均
-                tendencies['avg_final_energy'] = (
-                    tendencies['avg_final_energy'] * 0.7 + 
-                    energy * 0.3
-                )
+        for memory in records:
+            L4Memory._apply_tendency(tendencies, memory)
         
         return tendencies
     
+    @staticmethod
+    def _apply_tendency(tendencies: Dict, memory: Dict):
+        """記憶1件分を傾向集計に加える（追記時の増分更新と全件再構築で共通）"""
+        event = memory.get('event', '')
+        qualia = memory.get('qualia', {})
+        
+        # 痛み経験
+        if 'danger_pain' in event:
+            tendencies['danger_pain'] += 1
+            tendencies['danger_encounters'] += 1
+            tendencies['danger_fear_total'] += qualia.get('fear', 0)
+        
+        # 疲労経験
+        if 'danger_fatigue' in event:
+            tendencies['danger_fatigue'] += 1
+        
+        # goal_reached_with_XXX を解析
+        if 'goal_reached_with_red' in event:
+            tendencies['success_with_red'] += 1
+        elif 'goal_reached_with_green' in event or 'goal_reached_with_blue' in event:
+            tendencies['success_with_safe'] += 1
+        
+        if memory.get('is_session_end'):
+            tendencies['total_sessions'] += 1
+            energy = memory.get('energy', 0.5)
+            # 移動平均
+            tendencies['avg_final_energy'] = (
+                tendencies['avg_final_energy'] * 0.7 + 
+                energy * 0.3
+            )
+    
     def remember_consciously(self, event: str, l1_state: Dict, l2_state: Dict, 
                              is_session_end: bool = False):
         """意識的に記憶する（L5がONの時だけ呼ばれる）"""
@@ -697,9 +1740,8 @@ class L4Memory:
         
         # 重要なイベントは長期記憶にも
         if self._is_significant(event, memory):
-            self.ltm.append(memory)
-            self._save_ltm()
-            print(f"  [LTM] 記憶保存: {event}")
+            self._append_ltm(memory)
+            self.events.emit('ltm_saved', event=event)
     
     def _is_significant(self, event: str, memory: Dict) -> bool:
         """重要なイベントかどうか"""
@@ -762,28 +1804,28 @@ class L4Memory:
         """感覚データから記憶更新
         
         v2.0: activation_count増加ルール（初期DNA）
-        - 新規セル発見: +1（新しい記憶形成）
-        - 新規オブジェクト発見: +1
-        - 既知オブジェクトの再観測: +0.3（パターン照合）
+        - 新規セル発見: +ACT_NEW_CELL (1)（新しい記憶形成）
+        - 新規オブジェクト発見: +ACT_NEW_OBJECT (1)
+        - 既知オブジェクトの再観測: +ACT_REOBSERVE (0.3)（パターン照合）
         """
         for pos, data in sense_data.items():
             # 新規発見か既知かでactivation増加（新規の方が強く発火）
             if pos not in self.internal_map:
-                self.activation_count += 1 * self.gain  # 新規セル
+                self.activation_count += self.ACT_NEW_CELL * self.gain  # 新規セル
             self.internal_map[pos] = data['cell']
             if data['object']:
                 if pos not in self.found_objects:
-                    self.activation_count += 1 * self.gain  # 新規オブジェクト発見
+                    self.activation_count += self.ACT_NEW_OBJECT * self.gain  # 新規オブジェクト発見
                 else:
                     # 既知オブジェクトの再観測も弱く活性化（パターン照合）
-                    self.activation_count += 0.3 * self.gain
+                    self.activation_count += self.ACT_REOBSERVE * self.gain
                 self.found_objects[pos] = data['object']
     
     def update_from_errors(self, errors: List[Dict], qualia_intensity: float):
         """予測誤差から記憶更新（クオリア強度で重み付け）
         
         v2.0: activation_count増加ルール（初期DNA）
-        - 予測誤差由来の記憶更新: +1 + qualia_intensity
+        - 予測誤差由来の記憶更新: +ACT_ERROR_BASE (1) + qualia_intensity
           （強い感情を伴う記憶ほど活性化が強い、論文§5.5.2と整合）
         """
         for error in errors:
@@ -795,19 +1837,23 @@ class L4Memory:
                     'memory_strength': qualia_intensity
                 }
                 # 予測誤差由来の記憶更新は強く活性化
-                self.activation_count += (1 + qualia_intensity) * self.gain
+                self.activation_count += (self.ACT_ERROR_BASE + qualia_intensity) * self.gain
     
     def mark_visited(self, pos: Tuple[int, int]):
         """訪問記録
         
         v2.0: activation_count増加ルール（初期DNA）
-        - 新規訪問: +0.5（空間記憶の形成）
+        - 新規訪問: +ACT_NEW_VISIT (0.5)（空間記憶の形成）
         """
         # 既訪問か新規訪問かで活性化
         if pos not in self.visited:
-            self.activation_count += 0.5 * self.gain
+            self.activation_count += self.ACT_NEW_VISIT * self.gain
         self.visited.add(pos)
     
+    def map_view(self) -> Mapping:
+        """内部マップの読み取り専用ビュー（コピーなし。内容は常に最新）"""
+        return self._map_view
+    
     def remove_object(self, pos: Tuple[int, int]):
         """オブジェクト削除（取得時）"""
         if pos in self.found_objects:
@@ -933,7 +1979,7 @@ class L5Consciousness:
             'l1_fatigue': 0.0,
             'l2_valence': 0.0,
             'l2_arousal': 0.0,
-            'l2_qualia': {},
+            'l2_qualia': EmotionVector(QUALIA_KEYS, QUALIA_INDEX),  # 全0
             'l3_error_count': 0,
             'l4_found_count': 0,
         }
@@ -961,8 +2007,7 @@ class L5Consciousness:
         # L2: 価値変化量（valence/arousal/qualiaの変動）
         l2_change = abs(l2.valence - self._prev['l2_valence']) + \
                     abs(l2.arousal - self._prev['l2_arousal']) + \
-                    sum(abs(l2.qualia.get(k, 0) - self._prev['l2_qualia'].get(k, 0))
-                        for k in l2.qualia)
+                    l2.qualia.abs_diff_sum(self._prev['l2_qualia'])
         l2_act = self._clip01(l2_change / 3.0)
         
         # L3: 予測誤差の強度合計
@@ -1044,7 +2089,7 @@ class L5Consciousness:
         self._prev['l1_fatigue'] = l1.fatigue
         self._prev['l2_valence'] = l2.valence
         self._prev['l2_arousal'] = l2.arousal
-        self._prev['l2_qualia'] = dict(l2.qualia)
+        self._prev['l2_qualia'] = l2.qualia.snapshot()
         # L3はerrorsをmagnitude合計で評価するため、件数の保存は不要だが互換性のため残す
         self._prev['l3_error_count'] = len(l3.errors) if l3.errors else 0
         # L4はactivation_countで評価
@@ -1120,7 +2165,7 @@ class L5Consciousness:
     
     def self_recognize(self, l1: L1Body, l2: L2Qualia, l3: L3Prediction, l4: L4Memory) -> Dict:
         """L1〜L4の状態を自認してパッケージ化"""
-        l2_state = l2.get_state()
+        l2_state = l2.state_view()
         emotion_label = l4.get_emotion_label(l2_state)
         
         self.state_package = {
@@ -1242,21 +2287,170 @@ class L5Consciousness:
 # ==========================================
 
 class LLMVerbalizer:
-    """LLM言語化（ollama / Claude）"""
+    """LLM言語化（ollama / Claude）
+
+    verbalize(): 同期呼び出し（最大でClaude 30秒 + ollama 60秒ブロックする）
+    submit():    バックグラウンドのワーカーキューに投げてFutureを返す。
+                 step()のループはLLMの応答を待たない。
+
+    どちらもcache_key()（プロンプトに書く値を量子化したもの）で結果をキャッシュし、
+    同じプロンプトになる内部状態には以前の言語化を再利用する（LLMを呼ばない）。
+
+    endpoint: Claude互換のメッセージAPIのURL。環境変数HIDA_LLM_ENDPOINTでも指定可。
+              既定のAPI以外（llm_stub_server.py等）ではAPIキーなしでも呼ぶ。
+    """
+    
+    CLAUDE_ENDPOINT = "https://api.anthropic.com/v1/messages"
+    CACHE_QUANTUM = 0.1   # 量子化の刻み（これより小さい差は同じ状態とみなす）
+    CACHE_COUNT_QUANTUM = 10   # 探索した場所の数の刻み
+    CACHE_SIZE = 256      # キャッシュ上限（LRU）
     
-    def __init__(self, prefer_claude=True):
+    def __init__(self, prefer_claude=True, endpoint: Optional[str] = None,
+                 use_ollama=True, cache_size: Optional[int] = None):
         self.prefer_claude = prefer_claude
+        self.endpoint = endpoint or os.environ.get('HIDA_LLM_ENDPOINT') or self.CLAUDE_ENDPOINT
+        self.use_ollama = use_ollama
+        self.cache_size = self.CACHE_SIZE if cache_size is None else cache_size
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._cache = OrderedDict()   # key -> (text, llm_type)
+        self._inflight = {}           # key -> Future（同じ状態の二重投入を防ぐ）
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = None
+    
+    @classmethod
+    def cache_key(cls, state_package: Dict, action: str, decision_details: Optional[Dict] = None,
+                  modulation: Optional[Dict] = None, quantum: Optional[float] = None) -> str:
+        """プロンプトに書く値だけを量子化したハッシュ（内容アドレス）
+
+        L5Consciousness.format_for_llm() と同じ引数を取り、プロンプトに出る項目
+        （経験・身体・感情・原因・認識の数・行動・行動の内部計算）だけから作る。
+        位置や発見物の中身など、プロンプトに出ない値は含めない。
+        探索した場所の数は CACHE_COUNT_QUANTUM 刻みにまとめる。
+        """
+        q = cls.CACHE_QUANTUM if quantum is None else quantum
+        
+        def quantize(v):
+            if isinstance(v, bool) or v is None or isinstance(v, (int, str)):
+                return v
+            if isinstance(v, float):
+                return round(v / q)
+            if isinstance(v, dict):
+                return {str(k): quantize(x) for k, x in v.items()}
+            if isinstance(v, (list, tuple)):
+                return [quantize(x) for x in v]
+            return str(v)
+        
+        body = state_package.get('body', {})
+        qualia = state_package.get('qualia', {})
+        memory = state_package.get('memory', {})
+        mod = modulation or {}
+        fields = {
+            'experience': [mod.get('experience_count', 0), mod.get('fear_weight', 1.0),
+                           mod.get('safe_preference', 0.0)],
+            'body': [body.get('energy'), body.get('fatigue'), str(body.get('holding') or 'なし')],
+            'qualia': [qualia.get(k) for k in ('valence', 'arousal', 'fear', 'desire', 'urgency',
+                                               'anger', 'sadness', 'joy', 'disgust')],
+            'causes': [qualia.get(f'{k}_cause') or '不明' for k in ('fear', 'anger', 'sadness', 'joy')],
+            'memory': [len(memory.get('objects_found', ())),
+                       memory.get('visited_count', 0) // cls.CACHE_COUNT_QUANTUM],
+            'action': action,
+            'details': decision_details or None,
+        }
+        material = json.dumps(quantize(fields), sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(material.encode('utf-8')).hexdigest()
+    
+    def _cache_get(self, key: Optional[str]) -> Optional[Tuple[str, str]]:
+        if key is None:
+            return None
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+            return hit
+    
+    def _cache_put(self, key: Optional[str], result: Tuple[str, str]):
+        # 未接続（"none"）はキャッシュしない（次回つながるかもしれない）
+        if key is None or result[1] == "none" or self.cache_size <= 0:
+            return
+        with self._lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+    
+    def verbalize(self, prompt: str, key: Optional[str] = None) -> Tuple[str, str]:
+        """プロンプトを言語化（同期）"""
+        hit = self._cache_get(key)
+        if hit is not None:
+            return hit
+        result = self._verbalize_uncached(prompt)
+        self._cache_put(key, result)
+        return result
     
-    def verbalize(self, prompt: str) -> Tuple[str, str]:
-        """プロンプトを言語化"""
+    def submit(self, prompt: str, key: Optional[str] = None) -> Future:
+        """プロンプトを言語化（非同期）。Futureの結果は(text, llm_type)
+        
+        キャッシュにあれば完了済みのFutureを返す。
+        """
+        hit = self._cache_get(key)
+        if hit is not None:
+            future = Future()
+            future.set_result(hit)
+            return future
+        
+        with self._lock:
+            if key is not None and key in self._inflight:
+                return self._inflight[key]
+            future = Future()
+            if key is not None:
+                self._inflight[key] = future
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._work, daemon=True,
+                                                name="hida-verbalizer")
+                self._worker.start()
+        self._queue.put((future, prompt, key))
+        return future
+    
+    def pending(self) -> int:
+        """未処理の言語化要求の数"""
+        return self._queue.unfinished_tasks
+    
+    def _work(self):
+        """ワーカースレッド: キューの要求を順に処理する"""
+        while True:
+            future, prompt, key = self._queue.get()
+            try:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    result = self._verbalize_uncached(prompt)
+                except Exception as e:
+                    future.set_exception(e)
+                else:
+                    self._cache_put(key, result)
+                    future.set_result(result)
+            finally:
+                if key is not None:
+                    with self._lock:
+                        if self._inflight.get(key) is future:
+                            del self._inflight[key]
+                self._queue.task_done()
+    
+    def _verbalize_uncached(self, prompt: str) -> Tuple[str, str]:
         if self.prefer_claude:
             result = self._ask_claude(prompt)
             if result:
                 return result, "claude"
         
-        result = self._ask_ollama(prompt)
-        if result:
-            return result, "ollama"
+        if self.use_ollama:
+            result = self._ask_ollama(prompt)
+            if result:
+                return result, "ollama"
         
         return "(LLM未接続)", "none"
     
@@ -1278,7 +2472,7 @@ class LLMVerbalizer:
     
     def _ask_claude(self, prompt: str) -> Optional[str]:
         api_key = os.environ.get('ANTHROPIC_API_KEY', '')
-        if not api_key:
+        if not api_key and self.endpoint == self.CLAUDE_ENDPOINT:
             return None
         
         data = json.dumps({
@@ -1288,7 +2482,7 @@ class LLMVerbalizer:
         }).encode('utf-8')
         
         req = urllib.request.Request(
-            "https://api.anthropic.com/v1/messages",
+            self.endpoint,
             data=data,
             headers={
                 "Content-Type": "application/json",
@@ -1305,6 +2499,29 @@ class LLMVerbalizer:
             return None
 
 
+# ==========================================
+# 乱数源
+# ==========================================
+#
+# HIDA（探索行動・危険ゾーン判定）、World、NPC はそれぞれ乱数源（random.Random）を
+# 持てる。持たない場合はグローバルのrandomモジュールを使う（従来どおり
+# random.seed(seed) で再現できる）。
+#
+# 1本の random.Random(seed) をエージェントとそのWorldで共有すると、
+# random.seed(seed) と同じ乱数列になる（集団エンジンの各エージェントも同じ）。
+# 複数のエージェントを並べたり別プロセスに分けたりするときは、
+# spawn_rng(ルートシード, 'agent', i) のように経路ごとに独立した乱数源を作る。
+
+def spawn_rng(root_seed: int, *path) -> random.Random:
+    """ルートシードと経路から決まる独立した乱数源
+
+    経路（例: 'agent', 3 / 'world', 3, 'npc', 0）ごとに別の系列になる。
+    他の乱数源の消費順に依存しないので、実行順やプロセス分割に関係なく再現できる。
+    """
+    material = json.dumps([root_seed, *path]).encode('utf-8')
+    return random.Random(int.from_bytes(hashlib.sha256(material).digest()[:8], 'big'))
+
+
 # ==========================================
 # NPC（他のエージェント）
 # ==========================================
@@ -1312,21 +2529,29 @@ class LLMVerbalizer:
 class NPC:
     """他のエージェント（邪魔する存在）"""
     
-    def __init__(self, name: str, position: List[int]):
+    def __init__(self, name: str, position: List[int], rng: Optional[random.Random] = None):
+        """
+        rng: このNPC専用の乱数源。NoneならWorldの乱数源（それもなければグローバル）
+        """
         self.name = name
         self.position = position.copy()
         self.holding = None
+        self.rng = rng
     
-    def step(self, world):
-        """ランダムに動く"""
+    def step(self, world, rng=None):
+        """ランダムに動く
+
+        rng: 乱数源（random.Random）。省略時は NPC自身 → World → グローバルの順。
+             集団エンジン（hida_population.py）はエージェントごとの乱数源を渡す。
+        """
         directions = [(0, -1), (0, 1), (-1, 0), (1, 0)]
-        random.shuffle(directions)
+        (rng or self.rng or world.rng or random).shuffle(directions)
         
         for dx, dy in directions:
             nx, ny = self.position[0] + dx, self.position[1] + dy
             cell = world.get_cell(nx, ny)
             if cell not in ['wall', 'danger']:
-                self.position = [nx, ny]
+                world.move_npc(self, [nx, ny])
                 break
     
     def get_position(self) -> tuple:
@@ -1338,45 +2563,150 @@ class NPC:
 # ==========================================
 
 class World:
-    """グリッドワールド環境"""
+    """グリッドワールド環境
+
+    地形は1マス1バイトのセル符号（CELL_TYPESの添字）で、行優先の
+    平たいバッファ self.cells（y * size + x）に持つ。4096×4096でも16MiB。
+    path を渡すとファイルにメモリマップする（既存ファイルならその地形を使う。
+    大きさが size×size バイトでなければ ValueError）。使い終わったら close()。
+    チェックポイントから復元したWorldの cells は分岐間で共有する bytes で、
+    最初の書き込みで自分用の bytearray に複製される（コピーオンライト）。
+    NumPyからは np.frombuffer(world.cells, np.uint8).reshape(size, size) で
+    コピーなしに (y, x) の配列として読み書きできる。
+    """
     
-    def __init__(self, size=10):
+    def __init__(self, size=10, rng: Optional[random.Random] = None, path: Optional[str] = None):
+        """
+        rng: NPCの移動に使う乱数源（NPCが自分の乱数源を持たない場合）。
+             Noneならグローバルのrandomモジュール
+        path: 地形をメモリマップするファイル。Noneならメモリ上（bytearray）。
+              新規（空）なら空き地で初期化する。大きさが違う既存ファイルは
+              別の盤面の地形なので、切り詰め・継ぎ足しをせず ValueError にする
+        """
         self.size = size
-        self.grid = [['empty' for _ in range(size)] for _ in range(size)]
+        self.rng = rng
+        self.path = path
+        n = size * size
+        if path is None:
+            self.cells = bytearray(n)
+        else:
+            with open(path, 'a+b') as f:
+                existing = os.fstat(f.fileno()).st_size
+                if existing == 0:
+                    f.truncate(n)   # 新規は空き地で初期化
+                elif existing != n:
+                    raise ValueError(f"地形ファイルの大きさが違う: {path}"
+                                     f"（{existing}バイト、size={size} なら {n}バイト）")
+                self.cells = mmap.mmap(f.fileno(), n)
         self.objects = {}
         self.npcs = []  # 他のエージェント
+        # 占有インデックス: (x,y) -> そのマスにいるNPC（npcsの登録順）
+        # NPCの位置はmove_npc()経由で変えること（直接書き換えた場合はreindex_npcs()）
+        self._npc_at = {}
     
     def add_npc(self, npc: NPC):
         self.npcs.append(npc)
+        self._npc_at.setdefault(tuple(npc.position), []).append(npc)
     
-    def get_npc_at(self, x, y) -> Optional[NPC]:
-        """指定位置のNPCを取得"""
+    def move_npc(self, npc: NPC, new_pos: List[int]):
+        """NPCを移動し、占有インデックスを更新する
+
+        add_npc() を通していないNPC（npcs に直接入れた・Worldに登録していない）は
+        インデックスにないので、位置を変えてからインデックスを作り直す。
+        """
+        old = tuple(npc.position)
+        occupants = self._npc_at.get(old)
+        if occupants is None or npc not in occupants:
+            npc.position = list(new_pos)
+            self.reindex_npcs()
+            return
+        occupants.remove(npc)
+        if not occupants:
+            del self._npc_at[old]
+        npc.position = list(new_pos)
+        occupants = self._npc_at.setdefault(tuple(new_pos), [])
+        occupants.append(npc)
+        if len(occupants) > 1:
+            # 同じマスに複数いる場合もget_npc_atは登録順で最初のNPCを返す
+            occupants.sort(key=self.npcs.index)
+    
+    def reindex_npcs(self):
+        """NPCの位置から占有インデックスを作り直す"""
+        self._npc_at = {}
         for npc in self.npcs:
-            if npc.position[0] == x and npc.position[1] == y:
-                return npc
-        return None
+            self._npc_at.setdefault(tuple(npc.position), []).append(npc)
+    
+    def get_npc_at(self, x, y) -> Optional[NPC]:
+        """指定位置のNPCを取得（O(1)）"""
+        occupants = self._npc_at.get((x, y))
+        return occupants[0] if occupants else None
     
-    def step_npcs(self):
-        """全NPCを動かす"""
+    def step_npcs(self, rng=None):
+        """全NPCを動かす（rng: 全NPCに共通で使う乱数源。省略時は各NPCの既定）"""
         for npc in self.npcs:
-            npc.step(self)
+            npc.step(self, rng)
+    
+    def _writable_cells(self):
+        if type(self.cells) is bytes:   # 共有中の地形: 書き込む前に複製する
+            self.cells = bytearray(self.cells)
+        return self.cells
     
     def add_wall(self, x, y):
         if 0 <= x < self.size and 0 <= y < self.size:
-            self.grid[y][x] = 'wall'
+            self._writable_cells()[y * self.size + x] = CELL_WALL
     
     def add_danger(self, x, y):
         if 0 <= x < self.size and 0 <= y < self.size:
-            self.grid[y][x] = 'danger'
+            self._writable_cells()[y * self.size + x] = CELL_DANGER
     
     def add_object(self, name, x, y, color=None, rotten=False):
         self.objects[(x, y)] = {'name': name, 'color': color, 'rotten': rotten}
     
     def get_cell(self, x, y) -> str:
-        if 0 <= x < self.size and 0 <= y < self.size:
-            return self.grid[y][x]
+        size = self.size
+        if 0 <= x < size and 0 <= y < size:
+            return CELL_TYPES[self.cells[y * size + x]]
         return 'wall'
     
+    def look_window(self, x, y, r) -> bytes:
+        """(x, y) を中心とする (2r+1)×(2r+1) 窓のセル符号（行優先）
+
+        win[(dy + r) * (2r + 1) + (dx + r)] が (x+dx, y+dy) のセル。
+        範囲外は壁（CELL_WALL）。コストは窓の大きさだけで決まる。
+        """
+        size = self.size
+        w = 2 * r + 1
+        if r <= x < size - r and r <= y < size - r:
+            # 窓が盤面の内側に収まる（ほとんどの場合）: 行ごとのスライスをつなぐだけ
+            cells = self.cells
+            start = (y - r) * size + x - r
+            return b''.join([cells[i:i + w] for i in range(start, start + w * size, size)])
+        x0, x1 = max(x - r, 0), min(x + r + 1, size)
+        if x0 >= x1:
+            return bytes([CELL_WALL]) * (w * w)
+        left = bytes([CELL_WALL]) * (x0 - (x - r))
+        right = bytes([CELL_WALL]) * (x + r + 1 - x1)
+        wall_row = bytes([CELL_WALL]) * w
+        rows = []
+        for yy in range(y - r, y + r + 1):
+            if 0 <= yy < size:
+                base = yy * size
+                rows.append(left + self.cells[base + x0:base + x1] + right)
+            else:
+                rows.append(wall_row)
+        return b''.join(rows)
+    
+    def flush(self):
+        """メモリマップ中の地形をファイルに書き出す"""
+        if isinstance(self.cells, mmap.mmap):
+            self.cells.flush()
+    
+    def close(self):
+        """メモリマップを書き出して閉じる（以降この World の地形は使えない。2回目以降は何もしない）"""
+        if isinstance(self.cells, mmap.mmap) and not self.cells.closed:
+            self.cells.flush()
+            self.cells.close()
+    
     def get_object(self, x, y) -> Optional[Dict]:
         return self.objects.get((x, y))
     
@@ -1400,15 +2730,208 @@ class World:
                         row += f"[{obj['color'][0]}]"
                     else:
                         row += "[G]"
-                elif self.grid[y][x] == 'wall':
+                elif self.get_cell(x, y) == 'wall':
                     row += "[#]"
-                elif self.grid[y][x] == 'danger':
+                elif self.get_cell(x, y) == 'danger':
                     row += "[!]"
                 else:
                     row += "[ ]"
             print(row)
 
 
+# ==========================================
+# 経路計画（距離場）
+# ==========================================
+
+class PathPlanner:
+    """内部マップ上の距離場による経路計画（HIDA.act の目標への移動用）
+
+    目標ごとに、内部マップの既知の通行可能マス（壁以外）から目標までの
+    最小コストをダイクストラ法で求めておく（距離場）。1マス進むコストは1、
+    危険ゾーンに入るときは DANGER_COST × fear_weight を加える。
+
+    距離場は (マップの内容, 目標, 危険コスト) をキーにキャッシュし、
+    マップの内容が変わったときだけ作り直す。キーは VersionedMap.fingerprint
+    なので、1つのPathPlannerを複数のエージェントに渡せば、同じ知識・同じ目標の
+    エージェント同士で距離場を共有する。距離場ができていれば、1歩ごとの計画は
+    隣接4マスを比べるだけ。
+    """
+
+    DANGER_COST = 3.0
+    # 隣接マスを比べる順（同コストならx方向を優先。貪欲法の向きの決め方と同じ）
+    _STEPS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+    def __init__(self, max_fields: int = 256):
+        self.max_fields = max_fields
+        self._fields: "OrderedDict[tuple, Dict[Tuple[int, int], float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _fingerprint(internal_map) -> int:
+        fingerprint = getattr(internal_map, 'fingerprint', None)
+        if fingerprint is None:  # 素のdict: その場で計算（O(マップの大きさ)）
+            fingerprint = hash(frozenset(internal_map.items()))
+        return fingerprint
+
+    def distance_field(self, internal_map: Mapping, target, fear_weight: float = 1.0
+                       ) -> Dict[Tuple[int, int], float]:
+        """目標までの最小コスト {マス: コスト}（到達できないマスは含まない）"""
+        target = (target[0], target[1])
+        danger_cost = self.DANGER_COST * fear_weight
+        key = (self._fingerprint(internal_map), len(internal_map), target, danger_cost)
+        field = self._fields.get(key)
+        if field is not None:
+            self.hits += 1
+            self._fields.move_to_end(key)
+            return field
+        self.misses += 1
+        field = self._build(internal_map, target, danger_cost)
+        self._fields[key] = field
+        if len(self._fields) > self.max_fields:
+            self._fields.popitem(last=False)
+        return field
+
+    def _build(self, internal_map: Mapping, target: Tuple[int, int], danger_cost: float):
+        """目標から逆向きにダイクストラ法で距離場を作る"""
+        field = {target: 0.0}
+        heap = [(0.0, target)]
+        while heap:
+            d, pos = heapq.heappop(heap)
+            if d > field[pos]:
+                continue
+            # 隣のマスからposに入るコスト
+            nd = d + (1.0 + danger_cost if internal_map.get(pos) == 'danger' else 1.0)
+            x, y = pos
+            for dx, dy in self._STEPS:
+                n = (x + dx, y + dy)
+                cell = internal_map.get(n)
+                if cell is None or cell == 'wall':
+                    continue
+                if nd < field.get(n, math.inf):
+                    field[n] = nd
+                    heapq.heappush(heap, (nd, n))
+        return field
+
+    def next_step(self, internal_map: Mapping, position, target,
+                  fear_weight: float = 1.0) -> Optional[Tuple[int, int]]:
+        """目標に向かって次に進むべき隣接マス
+
+        Noneを返すのは、目標に着いている・現在地が距離場の外（未知のマス）・
+        目標に到達できない場合。呼び出し側は従来の向き決め（貪欲法）に戻す。
+        """
+        field = self.distance_field(internal_map, target, fear_weight)
+        x, y = position[0], position[1]
+        if (x, y) not in field or (x, y) == (target[0], target[1]):
+            return None
+        danger_cost = self.DANGER_COST * fear_weight
+        best, best_cost = None, math.inf
+        for dx, dy in self._STEPS:
+            n = (x + dx, y + dy)
+            d = field.get(n)
+            if d is None:
+                continue
+            cost = d + (1.0 + danger_cost if internal_map.get(n) == 'danger' else 1.0)
+            if cost < best_cost:
+                best, best_cost = n, cost
+        return best
+
+    def clear(self):
+        self._fields.clear()
+
+
+# ==========================================
+# 計測（フェーズ別の所要時間）
+# ==========================================
+
+class PhaseStats:
+    """1フェーズ分の集計: 呼び出し回数・合計/最小/最大時間・固定バケットのヒストグラム"""
+    
+    __slots__ = ('count', 'total', 'min', 'max', 'buckets')
+    
+    def __init__(self, n_buckets: int):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self.buckets = [0] * n_buckets
+
+
+class StepProfiler:
+    """HIDA.stepのフェーズ別計測
+    
+    HIDA.enable_profiling()が計測対象のオブジェクトのクラスを、時間計測つきの
+    ラッパーを持つ使い捨てのサブクラスに差し替える（disable_profiling()で
+    元のクラスに戻す）。無効時（既定）は元のクラスのメソッドがそのまま
+    呼ばれるので、計測のコストは一切かからない。
+    
+    ヒストグラムは BUCKET_EDGES_US（マイクロ秒）を上限とする固定バケット。
+    最後のバケットはそれより長いもの全部。
+    """
+    
+    BUCKET_EDGES_US = (1, 2, 5, 10, 20, 50, 100, 200, 500,
+                       1000, 2000, 5000, 10000, 20000, 50000, 100000, 1000000)
+    
+    def __init__(self):
+        self.phases: Dict[str, PhaseStats] = {}
+    
+    def record(self, phase: str, seconds: float):
+        stats = self.phases.get(phase)
+        if stats is None:
+            stats = self.phases[phase] = PhaseStats(len(self.BUCKET_EDGES_US) + 1)
+        stats.count += 1
+        stats.total += seconds
+        if seconds < stats.min:
+            stats.min = seconds
+        if seconds > stats.max:
+            stats.max = seconds
+        stats.buckets[bisect.bisect_left(self.BUCKET_EDGES_US, seconds * 1e6)] += 1
+    
+    def wrap(self, phase: str, fn):
+        """fnを計測つきにしたものを返す"""
+        if phase not in self.phases:  # 表示順を登録順にそろえる
+            self.phases[phase] = PhaseStats(len(self.BUCKET_EDGES_US) + 1)
+        clock = time.perf_counter
+        record = self.record
+        
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            t0 = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(phase, clock() - t0)
+        return timed
+    
+    def to_dict(self) -> Dict:
+        phases = {}
+        for name, st in self.phases.items():
+            phases[name] = {
+                'count': st.count,
+                'total_s': st.total,
+                'mean_us': st.total / st.count * 1e6 if st.count else 0.0,
+                'min_us': st.min * 1e6 if st.count else 0.0,
+                'max_us': st.max * 1e6,
+                'histogram': st.buckets,
+            }
+        return {
+            'bucket_edges_us': list(self.BUCKET_EDGES_US),
+            'phases': phases,
+        }
+    
+    def export_json(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+    
+    def report(self) -> str:
+        """フェーズ別の表（テキスト）"""
+        lines = [f"  {'phase':<18}{'count':>7}{'total ms':>11}{'mean us':>10}{'max us':>10}"]
+        for name, st in self.phases.items():
+            mean = st.total / st.count * 1e6 if st.count else 0.0
+            lines.append(f"  {name:<18}{st.count:>7}{st.total * 1e3:>11.2f}{mean:>10.1f}{st.max * 1e6:>10.1f}")
+        return "\n".join(lines)
+
+
 # ==========================================
 # HIDA統合クラス
 # ==========================================
@@ -1416,16 +2939,85 @@ class World:
 class HIDA:
     """5層統合エージェント"""
     
-    def __init__(self, color_preference=None):
+    def __init__(self, color_preference=None, store: Optional[MemoryStore] = None,
+                 events: Optional[EventSink] = None, rng: Optional[random.Random] = None,
+                 planner: Optional[PathPlanner] = None):
+        """
+        store: L4の保存先（InMemoryStore / DirectoryStore / SQLiteStore）。
+               Noneならカレントディレクトリ（DirectoryStore('.')）
+        events: イベントの出力先。NoneならPrintSink（標準出力）。
+                静かなバッチ実行にはNullSink()を渡す
+        rng: 探索行動・危険ゾーン判定の乱数源（random.Random）。
+             Noneならグローバルのrandomモジュール
+        planner: 目標への移動に使う経路計画（PathPlanner。複数体で共有可）。
+                 Noneなら従来の向き決め（目標の方向へ貪欲に進む。壁・危険は見ない）
+        """
+        self.events = events if events is not None else PrintSink()
+        self.rng = rng if rng is not None else random
+        self.planner = planner
         self.l1 = L1Body()
         self.l2 = L2Qualia(color_preference)
         self.l3 = L3Prediction()
-        self.l4 = L4Memory()
+        self.l4 = L4Memory(store, self.events)
         self.l5 = L5Consciousness()  # v2.0: デフォルト閾値を使用（クラス定数）
         self.llm = LLMVerbalizer(prefer_claude=True)
         
         self.step_count = 0
         self.action_history = []
+        self._pending_reflections = []  # [(step, Future)] 言語化待ち
+        self.profiler: Optional[StepProfiler] = None
+        self._profiled = []             # 計測中の (オブジェクト, 元のクラス)
+    
+    def _profile_targets(self):
+        """(フェーズ名, オブジェクト, メソッド名)
+        sense.* はsenseの内訳（L1 look → L3 予測・比較 → L4 更新）。
+        reflectはプロンプト生成とLLMへの投入まで（LLMの応答はワーカー側で待つ）。
+        """
+        return [
+            ('step', self, 'step'),
+            ('sense', self, 'sense'),
+            ('sense.look', self.l1, 'look'),
+            ('sense.predict', self.l3, 'predict'),
+            ('sense.compare', self.l3, 'compare_with_reality'),
+            ('sense.l4_update', self.l4, 'update_from_sense'),
+            ('sense.l4_update', self.l4, 'update_from_errors'),
+            ('think', self, 'think'),
+            ('act', self, 'act'),
+            ('decay_qualia', self.l2, 'decay_qualia'),
+            ('check_sync', self.l5, 'check_sync'),
+            ('reflect', self, 'reflect_async'),
+        ]
+    
+    def enable_profiling(self, profiler: Optional[StepProfiler] = None) -> StepProfiler:
+        """フェーズ別の計測を開始する（複数のHIDAで1つのprofilerを共有してもよい）
+        
+        対象オブジェクトのクラスを、計測ラッパーを持つ使い捨てのサブクラスに
+        差し替える（L1/L2は__slots__でインスタンス属性を持てないため）。
+        """
+        self.disable_profiling()
+        self.profiler = profiler if profiler is not None else StepProfiler()
+        wrapped: Dict[int, Tuple[object, Dict]] = {}
+        for phase, obj, name in self._profile_targets():
+            _, methods = wrapped.setdefault(id(obj), (obj, {}))
+            methods[name] = self.profiler.wrap(phase, getattr(type(obj), name))
+        for obj, methods in wrapped.values():
+            cls = type(obj)
+            methods['__slots__'] = ()
+            obj.__class__ = type(cls.__name__, (cls,), methods)
+            self._profiled.append((obj, cls))
+        return self.profiler
+    
+    def disable_profiling(self) -> Optional[StepProfiler]:
+        """計測をやめ、クラスを元に戻す。集計済みのprofilerを返す"""
+        for obj, cls in self._profiled:
+            obj.__class__ = cls
+        self._profiled = []
+        profiler, self.profiler = self.profiler, None
+        return profiler
+    
+    def snapshot(self, world: World) -> 'Checkpoint':
+        """自分とworldの全状態のチェックポイント（Checkpoint.capture と同じ）"""
+        return Checkpoint.capture(self, world)
     
     def sense(self, world: World):
         """感覚入力（L1 → L3 → L4）"""
@@ -1452,21 +3044,17 @@ class HIDA:
     
     def think(self, world: World) -> Tuple[str, Dict]:
         """思考・行動決定（L2/L3/L4で決定、L5は関与しない）"""
-        # 発見したボール
+        # 発見したボール（色ごとに1つ。L4の索引から引くので全件は走査しない）
+        found = self.l4.found_objects
         balls = {}
-        for pos, obj in self.l4.found_objects.items():
-            if obj.get('name') == 'ball':
-                color = obj.get('color', 'unknown')
-                dist = abs(pos[0] - self.l1.position[0]) + abs(pos[1] - self.l1.position[1])
-                is_danger = self.l4.internal_map.get(pos) == 'danger'
-                is_rotten = obj.get('rotten', False)
-                balls[color] = {'pos': pos, 'dist': dist, 'is_danger': is_danger, 'is_rotten': is_rotten}
+        for color, pos in found.ball_candidates():
+            dist = abs(pos[0] - self.l1.position[0]) + abs(pos[1] - self.l1.position[1])
+            is_danger = self.l4.internal_map.get(pos) == 'danger'
+            is_rotten = found[pos].get('rotten', False)
+            balls[color] = {'pos': pos, 'dist': dist, 'is_danger': is_danger, 'is_rotten': is_rotten}
         
         # ゴール
-        goal_pos = None
-        for pos, obj in self.l4.found_objects.items():
-            if obj.get('name') == 'goal':
-                goal_pos = pos
+        goal_pos = found.goal_position()
         
         # 行動決定
         if self.l1.holding and goal_pos:
@@ -1539,7 +3127,7 @@ class HIDA:
                     if obj.get('rotten'):
                         self.l2.qualia['disgust'] = min(1.0, self.l2.qualia['disgust'] + 0.6)
                         self.l2.valence -= 0.4
-                        print(f"    🤢 腐ってる！ disgust={self.l2.qualia['disgust']:.2f}")
+                        self.events.emit('rotten', disgust=self.l2.qualia['disgust'])
                     
                     self.l1.grab(obj)
                     world.remove_object(tx, ty)
@@ -1549,9 +3137,16 @@ class HIDA:
                     self.l1.release()
                     return "goal_reached"
             else:
-                # 移動
-                dx = 1 if tx > hx else (-1 if tx < hx else 0)
-                dy = 1 if ty > hy else (-1 if ty < hy else 0)
+                # 移動（経路計画があれば距離場で次のマスを決める）
+                step = None
+                if self.planner is not None:
+                    step = self.planner.next_step(self.l4.internal_map, (hx, hy), (tx, ty),
+                                                  self.l2.modulation.get('fear_weight', 1.0))
+                if step is not None:
+                    dx, dy = step[0] - hx, step[1] - hy
+                else:
+                    dx = 1 if tx > hx else (-1 if tx < hx else 0)
+                    dy = 1 if ty > hy else (-1 if ty < hy else 0)
                 
                 # 方向調整
                 if dx > 0:
@@ -1583,14 +3178,14 @@ class HIDA:
                         self.l2.qualia['anger'] = min(1.0, self.l2.qualia['anger'] + 0.3)
                         self.l2.arousal += 0.2
                         self.l2.set_cause('anger', f"{npc.name}に進路を塞がれた")
-                        print(f"    😠 {npc.name}に邪魔された！ anger={self.l2.qualia['anger']:.2f}")
+                        self.events.emit('blocked', npc=npc.name, anger=self.l2.qualia['anger'])
                     else:
                         self.l1.move_forward(world)
                         # 危険ゾーンダメージチェック（33%）
                         self._check_danger_damage(world)
         else:
             # 探索（ランダム）
-            action = random.choice(['forward', 'left', 'right'])
+            action = self.rng.choice(['forward', 'left', 'right'])
             if action == 'forward':
                 self.l1.move_forward(world)
                 self._check_danger_damage(world)
@@ -1607,7 +3202,7 @@ class HIDA:
         if world.get_cell(x, y) == 'danger':
             
             # 痛み（33%）→ 恐怖・怒り上昇
-            if random.random() < 0.33:
+            if self.rng.random() < 0.33:
                 self.l2.qualia['fear'] = min(1.0, self.l2.qualia['fear'] + 0.4)
                 self.l2.qualia['anger'] = min(1.0, self.l2.qualia['anger'] + 0.2)
                 self.l2.valence -= 0.3
@@ -1618,12 +3213,12 @@ class HIDA:
                 self.l4.remember_consciously(
                     "danger_pain",
                     self.l1.get_state(),
-                    self.l2.get_state()
+                    self.l2.state_view()
                 )
-                print(f"    ⚡ 痛い！ fear={self.l2.qualia['fear']:.2f} anger={self.l2.qualia['anger']:.2f}")
+                self.events.emit('danger_pain', fear=self.l2.qualia['fear'], anger=self.l2.qualia['anger'])
             
             # 疲労（33%）→ エネルギー減少・悲しみ上昇
-            if random.random() < 0.33:
+            if self.rng.random() < 0.33:
                 damage = 0.15
                 self.l1.energy = max(0, self.l1.energy - damage)
                 self.l2.qualia['sadness'] = min(1.0, self.l2.qualia['sadness'] + 0.15)  # 疲れると悲しくなる
@@ -1631,16 +3226,25 @@ class HIDA:
                 self.l4.remember_consciously(
                     "danger_fatigue",
                     self.l1.get_state(),
-                    self.l2.get_state()
+                    self.l2.state_view()
                 )
-                print(f"    💦 疲れた！ E={self.l1.energy:.2f} sadness={self.l2.qualia['sadness']:.2f}")
+                self.events.emit('danger_fatigue', energy=self.l1.energy, sadness=self.l2.qualia['sadness'])
     
     def reflect(self, action: str, details: Dict) -> Optional[str]:
-        """内省・言語化（L5 → LLM）
+        """内省・言語化（L5 → LLM）。LLMの応答を待って文字列を返す
         
         v2.0: check_syncはstep()で毎ステップ呼ばれるため、ここでは
         意識ON時の言語化のみを担当する。is_conscious判定済みのこと。
         """
+        response, llm_type = self.reflect_async(action, details).result()
+        return f"({llm_type}) {response}"
+    
+    def reflect_async(self, action: str, details: Dict) -> Future:
+        """内省・言語化（非同期版）。Futureの結果は(text, llm_type)
+        
+        自認・記憶・プロンプト生成はこの場で行い、LLM呼び出しだけを
+        LLMVerbalizerのワーカーに任せる。
+        """
         # L5: 自認（同期判定はstep()で実施済み）
         self.l5.self_recognize(self.l1, self.l2, self.l3, self.l4)
         
@@ -1648,17 +3252,39 @@ class HIDA:
         self.l4.remember_consciously(
             action, 
             self.l1.get_state(), 
-            self.l2.get_state()
+            self.l2.state_view()
         )
         
         # L5: プロンプト生成（変調値を数値として渡す）
         modulation = self.l4.get_modulation()
         prompt = self.l5.format_for_llm(action, details.get('scores'), modulation)
         
-        # LLM: 言語化
-        response, llm_type = self.llm.verbalize(prompt)
-        
-        return f"({llm_type}) {response}"
+        # LLM: 言語化（同じ内部状態ならキャッシュを再利用）
+        key = LLMVerbalizer.cache_key(self.l5.state_package, action, details.get('scores'), modulation)
+        return self.llm.submit(prompt, key)
+    
+    def collect_reflections(self) -> List[str]:
+        """完了した言語化を取り出す（待たない）。前のステップの分は[Step n]付き"""
+        ready = []
+        pending = []
+        for step, future in self._pending_reflections:
+            if not future.done():
+                pending.append((step, future))
+                continue
+            response, llm_type = future.result()
+            tag = "" if step == self.step_count else f"[Step {step}] "
+            ready.append(f"{tag}({llm_type}) {response}")
+        self._pending_reflections = pending
+        return ready
+    
+    def flush_reflections(self, timeout: Optional[float] = None) -> List[str]:
+        """言語化待ちがすべて完了するまで待って取り出す"""
+        for _, future in self._pending_reflections:
+            try:
+                future.result(timeout)
+            except FutureTimeoutError:
+                break
+        return self.collect_reflections()
     
     def step(self, world: World, verbose=True) -> Dict:
         """1ステップ実行
@@ -1705,7 +3331,7 @@ class HIDA:
             self.l4.remember_consciously(
                 f"grabbed_{grabbed_color}",
                 self.l1.get_state(),
-                self.l2.get_state()
+                self.l2.state_view()
             )
         
         # ゴール到達時の感情イベント処理（check_syncより前に実施）
@@ -1727,7 +3353,7 @@ class HIDA:
             self.l4.remember_consciously(
                 f"goal_reached_with_{grabbed_color}",
                 self.l1.get_state(),
-                self.l2.get_state(),
+                self.l2.state_view(),
                 is_session_end=True
             )
         
@@ -1738,9 +3364,10 @@ class HIDA:
         is_conscious = self.l5.check_sync(self.l1, self.l2, self.l3, self.l4)
         
         # 内省（意識的かつ5ステップごとに言語化）
-        reflection = None
+        # LLMの応答は待たない。完了済みの分（キャッシュヒットは即時）を今回の結果に載せる
         if verbose and is_conscious and self.step_count % 5 == 0:
-            reflection = self.reflect(action, details)
+            self._pending_reflections.append((self.step_count, self.reflect_async(action, details)))
+        reflection = "\n       ".join(self.collect_reflections()) or None
         
         result = {
             'step': self.step_count,
@@ -1757,19 +3384,21 @@ class HIDA:
             'reflection': reflection
         }
         
-        if verbose:
+        if verbose and self.events.enabled(EventLevel.INFO):
             q = self.l2.qualia
-            print(f"\n  Step {self.step_count}: {action}")
-            print(f"    E={self.l1.energy:.2f} F={q['fear']:.2f} D={q['desire']:.2f} U={q['urgency']:.2f}")
-            # v2.0: 同期状態
-            sync_t = self.l5.sync_type if self.l5.sync_type else '-'
-            conscious_mark = '●' if self.l5.is_conscious else '○'
-            print(f"    {conscious_mark} sync_score={self.l5.sync_score:.3f} leader={sync_t} "
-                  f"(strength={self.l5.leader_strength:.2f} coherence={self.l5.sync_coherence:.2f})")
-            if details.get('scores'):
-                print("    Scores: " + str([(c, f"{d['total']:.1f}") for c, d in details['scores'].items()]))
+            scores = details.get('scores')
+            self.events.emit(
+                'step',
+                step=self.step_count, action=action, energy=self.l1.energy,
+                fear=q['fear'], desire=q['desire'], urgency=q['urgency'],
+                # v2.0: 同期状態
+                conscious=self.l5.is_conscious, sync_score=self.l5.sync_score,
+                sync_type=self.l5.sync_type, leader_strength=self.l5.leader_strength,
+                sync_coherence=self.l5.sync_coherence,
+                scores={c: d['total'] for c, d in scores.items()} if scores else None,
+            )
             if reflection:
-                print(f"    💭 {reflection}")
+                self.events.emit('reflection', text=reflection)
         
         # NPCも動かす
         world.step_npcs()
@@ -1777,13 +3406,204 @@ class HIDA:
         return result
 
 
+# ==========================================
+# チェックポイント（全状態の保存・復元・分岐）
+# ==========================================
+
+_LOCK_TYPE = type(threading.Lock())
+
+
+def _mapping_proxy(mapping: Mapping) -> MappingProxyType:
+    return MappingProxyType(mapping)
+
+
+class _StatePickler(pickle.Pickler):
+    """HIDA/Worldの状態用のPickler
+
+    - 環境（イベント出力・保存先・LLM・経路計画・グローバルのrandom）は
+      中身を保存せず、名前だけを書く（persistent_id）
+    - 地形バッファ（World.cells）は本体と別に持つ
+    - ロックは新しいロック、読み取り専用ビューは元の辞書のビューとして保存する
+    """
+
+    def __init__(self, file, env: Dict[int, str], terrain, proxied: Dict[int, Mapping]):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._env = env
+        self._terrain = terrain
+        self._proxied = proxied
+
+    def persistent_id(self, obj):
+        if obj is self._terrain:
+            return 'terrain'
+        return self._env.get(id(obj))
+
+    def reducer_override(self, obj):
+        if type(obj) is MappingProxyType:
+            source = self._proxied.get(id(obj))
+            return _mapping_proxy, (source if source is not None else dict(obj),)
+        if type(obj) is _LOCK_TYPE:
+            return threading.Lock, ()
+        return NotImplemented
+
+
+class _StateUnpickler(pickle.Unpickler):
+    def __init__(self, file, env: Dict[str, object]):
+        super().__init__(file)
+        self._env = env
+
+    def persistent_load(self, pid):
+        return self._env[pid]
+
+
+class Checkpoint:
+    """HIDA＋World（NPC・乱数源を含む）の全状態のスナップショット
+
+    5層すべての状態（_prev バッファ・EMA・ゲインを含む）、World・NPC・
+    乱数源の状態を pickle のバイト列（payload）に持つ。地形（World.cells）は
+    別の bytes（terrain）で持ち、restore() / fork() で作る分岐はすべて同じ
+    terrain を共有する（書き込んだ分岐だけが複製する。コピーオンライト）。
+    分岐のコストは小さな payload の復元だけなので、途中から多数の分岐を
+    走らせても、かかるのは分岐後の区間だけになる。
+
+    状態に含めないもの（環境）: events, llm, planner, 外部の保存先
+    （DirectoryStore / SQLiteStore）, 言語化待ち。
+    - events / llm / planner: restore() で渡す。省略時は取得元と同じもの
+      （ファイルから読んだ場合はHIDAの既定値。plannerはNone）
+    - 保存先: 省略時は分岐ごとに新しい InMemoryStore（その時点の長期記憶入り）。
+      InMemoryStore は状態の一部として分岐ごとに複製される。
+      分岐同士や元のランと長期記憶が混ざらない。
+      渡した保存先が空なら、その時点の長期記憶・傾向集計・変調値を入れてから
+      使う（件数の違う保存先は拒否）。fork() では store_factory で分岐ごとに渡す
+    - グローバルのrandomを使っていた場合: その時点の状態から作った
+      random.Random を分岐ごとに持たせる（NPCもそれを使う）
+    """
+
+    MAGIC = b'HIDACKP1'
+
+    def __init__(self, payload: bytes, terrain: bytes, global_rng_state, step: int = 0,
+                 env: Optional[Dict[str, object]] = None):
+        self.payload = payload
+        self.terrain = terrain
+        self.global_rng_state = global_rng_state
+        self.step = step
+        self._env = env or {}          # 取得元の環境（同じプロセス内でのみ有効）
+
+    @classmethod
+    def capture(cls, agent: 'HIDA', world: World) -> 'Checkpoint':
+        """agent と world の現在の状態を取得する"""
+        if agent.profiler is not None:
+            raise ValueError("計測中はチェックポイントを取れない（disable_profiling() してから）")
+        env = {'events': agent.events, 'llm': agent.llm, 'planner': agent.planner}
+        if type(agent.l4.store) is not InMemoryStore:      # DeferredStore も外部扱い
+            env['store'] = agent.l4.store
+            agent.l4.ltm        # 長期記憶を読み込んでおく（分岐の保存先に入れる）
+        ids = {id(obj): name for name, obj in env.items() if obj is not None}
+        ids[id(random)] = 'global_rng'
+
+        terrain = world.cells if type(world.cells) is bytes else bytes(world.cells)
+        buf = io.BytesIO()
+        pending, agent._pending_reflections = agent._pending_reflections, []
+        try:
+            _StatePickler(buf, ids, world.cells,
+                          {id(agent.l4._map_view): agent.l4.internal_map}).dump((agent, world))
+        finally:
+            agent._pending_reflections = pending
+        return cls(buf.getvalue(), terrain, random.getstate(), agent.step_count, env)
+
+    def restore(self, events: Optional[EventSink] = None, store: Optional[MemoryStore] = None,
+                llm: Optional['LLMVerbalizer'] = None, planner=_MISSING) -> Tuple['HIDA', World]:
+        """新しい (agent, world) として復元する（チェックポイント自体は変わらない）"""
+        if events is None:
+            events = self._env.get('events')
+        if llm is None:
+            llm = self._env.get('llm')
+        global_rng = random.Random()
+        global_rng.setstate(self.global_rng_state)
+        env = {
+            'events': events if events is not None else PrintSink(),
+            'llm': llm if llm is not None else LLMVerbalizer(prefer_claude=True),
+            'planner': self._env.get('planner') if planner is _MISSING else planner,
+            'store': store,             # 外部の保存先の代わり（Noneなら下で作る）
+            'terrain': self.terrain,
+            'global_rng': global_rng,
+        }
+        agent, world = _StateUnpickler(io.BytesIO(self.payload), env).load()
+
+        l4 = agent.l4
+        if store is not None:
+            records = l4.ltm        # 差し替える前に、その時点の長期記憶を読む
+            self._seed_store(store, l4, records)
+            l4._ltm = list(records)
+            l4.store = store
+            l4._journal_count = 0
+        elif l4.store is None:
+            l4.store = InMemoryStore()
+            l4.store.records = list(l4._ltm)
+            l4.store.summary = (l4.TENDENCIES_VERSION, dict(l4._tendencies), l4._ltm_count)
+        if agent.rng is global_rng and world.rng is None:
+            world.rng = global_rng
+        return agent, world
+
+    @staticmethod
+    def _seed_store(store: MemoryStore, l4: 'L4Memory', records: List[Dict]):
+        """渡された保存先に、その時点の長期記憶と傾向集計を入れる
+
+        空の保存先には seq 0.. で全件を追記してチェックポイントを作る。
+        すでに同じ件数が入っていればそのまま使う（取得元と同じ保存先）。
+        件数が違う保存先は、追記の seq が合わず読み直せなくなるので拒否する。
+        """
+        summary = store.load_summary(l4.TENDENCIES_VERSION)
+        count = summary[1] if summary is not None else 0
+        count += sum(1 for _ in store.read_records(count))
+        if count:
+            if count != l4._ltm_count:
+                raise ValueError(f"保存先の長期記憶が{count}件あり、チェックポイントの"
+                                 f"{l4._ltm_count}件と合わない（空の保存先を渡す）")
+            return
+        for seq, memory in enumerate(records):
+            store.append(seq, memory)
+        store.checkpoint(l4.TENDENCIES_VERSION, l4._tendencies, l4._ltm_count, background=False)
+        store.save_modulation(l4.modulation)
+
+    def fork(self, n: int, store_factory: Optional[Callable[[int], MemoryStore]] = None,
+             **env) -> List[Tuple['HIDA', World]]:
+        """同じ時点から n 本の分岐を作る（envは restore() と同じ）
+
+        store_factory: 分岐の番号 i → その分岐の保存先（restore() の store）。
+        保存先は分岐ごとに別でなければならないので、n > 1 で store は渡せない
+        """
+        if env.get('store') is not None and n > 1:
+            raise ValueError("分岐同士で保存先は共有できない（store_factory を使う）")
+        if store_factory is not None:
+            return [self.restore(store=store_factory(i), **env) for i in range(n)]
+        return [self.restore(**env) for _ in range(n)]
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.payload) + len(self.terrain)
+
+    def save(self, path: str):
+        """ファイルに保存する（環境は保存されない）"""
+        with open(path, 'wb') as f:
+            f.write(self.MAGIC)
+            pickle.dump((self.payload, self.terrain, self.global_rng_state, self.step),
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path: str) -> 'Checkpoint':
+        with open(path, 'rb') as f:
+            if f.read(len(cls.MAGIC)) != cls.MAGIC:
+                raise ValueError(f"チェックポイントではない: {path}")
+            return cls(*pickle.load(f))
+
+
 # ==========================================
 # テスト
 # ==========================================
 
-def create_test_world():
-    """テスト用ワールド"""
-    world = World(size=10)
+def create_test_world(rng: Optional[random.Random] = None):
+    """テスト用ワールド（rng: NPCの移動に使う乱数源）"""
+    world = World(size=10, rng=rng)
     
     # 外壁
     for i in range(10):
@@ -1813,20 +3633,12 @@ def create_test_world():
     return world
 
 
-def run_test(color_pref, initial_energy=1.0, max_steps=50):
-    """テスト実行"""
-    world = create_test_world()
-    hida = HIDA(color_preference=color_pref)
+def prepare_test_session(hida: HIDA, world: World, initial_energy: float = 1.0):
+    """テスト用ワールドでの開始状態（位置・向き・エネルギー・初期知識）を与える"""
     hida.l1.position = [3, 6]
     hida.l1.direction = 'N'
     hida.l1.energy = initial_energy
     
-    # 変調値表示
-    mod = hida.l4.get_modulation()
-    personality = hida.l4.get_personality_description()
-    print(f"  性格: {personality}")
-    print(f"  変調: fear_weight={mod['fear_weight']:.2f}, safe_pref={mod['safe_preference']:.2f}, exp={mod['experience_count']}")
-    
     # ボールを最初から発見済みにする
     hida.l4.found_objects[(6, 3)] = {'name': 'ball', 'color': 'red'}
     hida.l4.found_objects[(2, 4)] = {'name': 'ball', 'color': 'blue'}
@@ -1841,6 +3653,24 @@ def run_test(color_pref, initial_energy=1.0, max_steps=50):
                 hida.l4.internal_map[(x, y)] = 'danger'
             else:
                 hida.l4.internal_map[(x, y)] = 'empty'
+
+
+def run_test(color_pref, initial_energy=1.0, max_steps=50, profile_path=None):
+    """テスト実行
+    
+    profile_path: 指定するとフェーズ別の計測を行い、終了時にJSONで書き出す
+    """
+    world = create_test_world()
+    hida = HIDA(color_preference=color_pref)
+    if profile_path:
+        hida.enable_profiling()
+    prepare_test_session(hida, world, initial_energy)
+    
+    # 変調値表示
+    mod = hida.l4.get_modulation()
+    personality = hida.l4.get_personality_description()
+    print(f"  性格: {personality}")
+    print(f"  変調: fear_weight={mod['fear_weight']:.2f}, safe_pref={mod['safe_preference']:.2f}, exp={mod['experience_count']}")
     
     print(f"\n{'='*60}")
     print(f"色好み: {color_pref}")
@@ -1865,6 +3695,10 @@ def run_test(color_pref, initial_energy=1.0, max_steps=50):
             print(f"\n💀 エネルギー切れ")
             break
     
+    # 言語化待ちの残り
+    for reflection in hida.flush_reflections():
+        print(f"    💭 {reflection}")
+    
     # 最終内省
     print(f"\n=== 最終内省 ===")
     final_action = f"結果: {result['holding']}を取得" if result['holding'] else "探索中"
@@ -1872,9 +3706,82 @@ def run_test(color_pref, initial_energy=1.0, max_steps=50):
     if reflection:
         print(f"💭 {reflection}")
     
+    if profile_path:
+        profiler = hida.disable_profiling()
+        profiler.export_json(profile_path)
+        print(f"\n=== 計測（{profile_path}）===")
+        print(profiler.report())
+    
     return hida
 
 
+def run_sessions(n_sessions: int, color_pref, initial_energy=1.0, max_steps=30,
+                 store: Optional[MemoryStore] = None, persist_every: Optional[int] = None,
+                 rng: Optional[random.Random] = None) -> List[Dict]:
+    """セッションを n_sessions 回続けて実行し、セッションごとの指標を返す
+
+    loop / loop_high モード（run_test の繰り返し）の一括版。表示・言語化は
+    行わない。長期記憶と変調値は DeferredStore でメモリ上に保ち、元の保存先
+    には persist_every セッションごと（Noneなら最後に1回）まとめて書く。
+    変調値の更新（_update_modulation）は run_test の繰り返しと同じく、
+    次のセッションのL4Memory作成時に行われる。
+
+    store: 元の保存先。Noneならカレントディレクトリ（DirectoryStore('.')）
+    rng: 全セッションで共有する乱数源。Noneならグローバルのrandom
+    """
+    deferred = DeferredStore(store if store is not None else DirectoryStore('.'))
+    events = NullSink()
+    rows = []
+    for i in range(n_sessions):
+        world = create_test_world(rng)
+        hida = HIDA(color_preference=dict(color_pref), store=deferred, events=events, rng=rng)
+        prepare_test_session(hida, world, initial_energy)
+        mod = hida.l4.get_modulation()      # このセッションで効いている変調値
+        conscious = 0
+        outcome = 'timeout'
+        for _ in range(max_steps):
+            result = hida.step(world, verbose=False)
+            conscious += result['conscious']
+            if result['goal_reached']:
+                outcome = 'goal'
+                break
+            if hida.l1.energy <= 0:
+                outcome = 'exhausted'
+                break
+        rows.append({
+            'session': i + 1,
+            'outcome': outcome,
+            'color': getattr(hida, '_last_grabbed_color', None),
+            'steps': hida.step_count,
+            'energy': hida.l1.energy,
+            'conscious_rate': conscious / max(hida.step_count, 1),
+            'ltm': hida.l4._ltm_count,
+            'fear_weight': mod['fear_weight'],
+            'safe_preference': mod['safe_preference'],
+            'energy_caution': mod['energy_caution'],
+        })
+        if persist_every and (i + 1) % persist_every == 0:
+            deferred.persist()
+    if not persist_every or n_sessions % persist_every:
+        deferred.persist()
+    return rows
+
+
+def session_table(rows: List[Dict], every: int = 1) -> str:
+    """run_sessions() の指標の表（テキスト）。every行ごとに間引く（最終行は必ず出す）"""
+    header = (f"{'session':>8}{'outcome':>10}{'color':>8}{'steps':>6}{'energy':>8}"
+              f"{'conscious':>10}{'ltm':>7}{'fear_w':>8}{'safe':>7}{'caution':>8}")
+    lines = [header]
+    for k, row in enumerate(rows):
+        if (k + 1) % every and k != len(rows) - 1:
+            continue
+        lines.append(f"{row['session']:>8}{row['outcome']:>10}{row['color'] or '-':>8}"
+                     f"{row['steps']:>6}{row['energy']:>8.3f}{row['conscious_rate']:>10.2f}"
+                     f"{row['ltm']:>7}{row['fear_weight']:>8.3f}{row['safe_preference']:>7.3f}"
+                     f"{row['energy_caution']:>8.3f}")
+    return "\n".join(lines)
+
+
 if __name__ == "__main__":
     import sys
     
@@ -1897,19 +3804,32 @@ if __name__ == "__main__":
             print(f"{'#'*60}")
             run_test({'red': 1.0, 'blue': 0.3, 'green': 0.3}, initial_energy=1.0, max_steps=30)
     
+    elif len(sys.argv) > 1 and sys.argv[1] == "sessions":
+        # 長期セッションモード：表示なしでN回続けて実行し、指標の表を出す
+        # sessions [N] [初期エネルギー] [K]（Kセッションごとに保存。省略時は最後に1回）
+        n = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+        energy = float(sys.argv[3]) if len(sys.argv) > 3 else 1.0
+        every = int(sys.argv[4]) if len(sys.argv) > 4 else None
+        print(f"=== {n}セッション（初期エネルギー{energy}）===")
+        rows = run_sessions(n, {'red': 1.0, 'blue': 0.3, 'green': 0.3},
+                            initial_energy=energy, persist_every=every)
+        print(session_table(rows, every=max(1, n // 20)))
+    
+    elif len(sys.argv) > 1 and sys.argv[1] == "profile":
+        # 計測モード：通常エネルギーで1回実行し、フェーズ別の所要時間を書き出す
+        path = sys.argv[2] if len(sys.argv) > 2 else "hida_profile.json"
+        run_test({'red': 1.0, 'blue': 0.3, 'green': 0.3}, initial_energy=1.0, profile_path=path)
+    
     elif len(sys.argv) > 1 and sys.argv[1] == "reset":
         # リセットモード
-        import os
-        for f in ["hida_ltm.json", "hida_modulation.json"]:
-            if os.path.exists(f):
-                os.remove(f)
-                print(f"削除: {f}")
+        for f in DirectoryStore('.').clear():
+            print(f"削除: {f}")
         print("記憶と変調値をリセットしました")
     
     else:
         # 通常モード
         print("=== HIDA統合版テスト ===")
-        print("（loop: 低E5回, loop_high: 高E5回, reset: リセット）")
+        print("（loop: 低E5回, loop_high: 高E5回, sessions [N] [E] [K]: 長期, profile [path]: 計測, reset: リセット）")
         
         # テスト1: 赤好き、通常エネルギー
         print("\n【テスト1】赤好き、通常エネルギー")
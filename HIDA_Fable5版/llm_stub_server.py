@@ -0,0 +1,140 @@
+"""
+llm_stub_server.py
+オフライン検証用のLLMスタブサーバー
+
+Claudeのメッセージ API（POST /v1/messages）と同じ形の応答を返す
+ローカルHTTPサーバー。LLMVerbalizerのendpointをこのURLに向ければ、
+APIキーもネットワークもなしで言語化の経路（非同期キュー・キャッシュ）を試せる。
+
+応答は「プロンプトの先頭の行動名＋受信番号」の決まった文。
+delayで応答を遅らせ、遅いLLMを再現できる。hold() から release() までは
+応答を止める（時間によらずに「まだ返っていない」状態を作れる）。
+
+使い方:
+  python3 llm_stub_server.py --port 8765 --delay 2.0
+  HIDA_LLM_ENDPOINT=http://127.0.0.1:8765/v1/messages python3 hida_unified_v2.py
+
+  # コードから
+  with StubLLMServer(delay=0.5) as stub:
+      llm = LLMVerbalizer(endpoint=stub.url, use_ollama=False)
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubLLMServer:
+    """Claude互換のスタブサーバー（別スレッドで動く）"""
+
+    HOLD_TIMEOUT = 20.0     # hold() のまま放置されたときに応答するまでの秒数
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, delay: float = 0.0):
+        """
+        port: 0なら空いているポートを自動で選ぶ
+        delay: 1リクエストあたりの応答遅延（秒）
+        """
+        self.delay = delay
+        self.request_count = 0
+        self.prompts = []
+        self._lock = threading.Lock()
+        self._gate = threading.Event()    # セットされている間だけ応答する
+        self._gate.set()
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1/messages"
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                try:
+                    body = json.loads(self.rfile.read(length).decode('utf-8'))
+                    prompt = body['messages'][-1]['content']
+                except (ValueError, KeyError, IndexError):
+                    self.send_error(400)
+                    return
+                with stub._lock:
+                    stub.request_count += 1
+                    n = stub.request_count
+                    stub.prompts.append(prompt)
+                stub._gate.wait(stub.HOLD_TIMEOUT)
+                if stub.delay:
+                    time.sleep(stub.delay)
+
+                text = f"（スタブ応答{n}）{stub.describe(prompt)}"
+                data = json.dumps({
+                    "type": "message",
+                    "role": "assistant",
+                    "content": [{"type": "text", "text": text}],
+                }, ensure_ascii=False).encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass  # アクセスログは出さない
+
+        return Handler
+
+    def hold(self):
+        """release() まで応答を止める（受信は数える）"""
+        self._gate.clear()
+
+    def release(self):
+        self._gate.set()
+
+    @staticmethod
+    def describe(prompt: str) -> str:
+        """プロンプトの【今の行動】欄を拾って短い文にする"""
+        lines = prompt.splitlines()
+        if "【今の行動】" in lines:
+            i = lines.index("【今の行動】")
+            if i + 1 < len(lines):
+                return f"いまは{lines[i + 1].strip()}をしている。"
+        return "なんとなく動いている。"
+
+    def start(self) -> "StubLLMServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.release()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="オフライン検証用のLLMスタブサーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="応答遅延（秒）")
+    args = parser.parse_args()
+
+    server = StubLLMServer(args.host, args.port, args.delay)
+    print(f"スタブLLM: {server.url}  (delay={args.delay}s, Ctrl+Cで終了)")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
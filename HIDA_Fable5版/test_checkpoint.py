@@ -0,0 +1,225 @@
+"""
+test_checkpoint.py
+チェックポイント（Checkpoint）と分岐の検証
+
+目的:
+  1. ステップtで取ったチェックポイントから復元した分岐が、元のランを
+     そのまま続けた場合と完全に同じ軌道をたどること
+     （乱数源がエージェント専用でも、グローバルのrandomでも。経路計画ありでも）
+  2. ファイルに保存して読み直しても同じこと
+  3. 分岐でENTRAIN_Kを変えると、その分岐だけが変わること（反実仮想）
+  4. 分岐は地形を共有し、書き込んだ分岐だけが複製すること（コピーオンライト）
+  5. 外部の保存先（DirectoryStore）は分岐から書き込まれないこと。
+     空の保存先を渡した分岐は、読み直しても長期記憶が続いていること
+  6. 分岐は前半を再シミュレーションしないこと（step() を呼ばずに分岐点から始まる。
+     分岐1本と前半の再計算の時間は表示するだけ）
+
+実行: python3 test_checkpoint.py
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+import hida_unified_v2 as h
+from test_entrainment_ablation import N_SEEDS
+from test_population_equivalence import COLOR_PREF, give_initial_knowledge, scalar_step
+
+
+BRANCH_AT = 10
+SUFFIX = 30
+
+
+def check(name: str, ok: bool) -> bool:
+    print(f"  {name} ... {'PASS' if ok else 'FAIL'}")
+    return ok
+
+
+def make(seed: int, own_rng: bool = True, store=None, planner=None):
+    """run_test()と同じ配置。own_rng=Falseならグローバルのrandomを使う"""
+    if own_rng:
+        rng = random.Random(seed)
+    else:
+        rng = None
+        random.seed(seed)
+    world = h.create_test_world(rng)
+    agent = h.HIDA(color_preference=dict(COLOR_PREF), store=store or h.InMemoryStore(),
+                   events=h.NullSink(), rng=rng, planner=planner)
+    agent.l1.position = [3, 6]
+    agent.l1.direction = 'N'
+    give_initial_knowledge(agent.l4.found_objects, agent.l4.internal_map, world)
+    return agent, world
+
+
+def run(agent, world, n: int) -> list:
+    """n ステップ進めて、各ステップの出力とNPCの位置を返す"""
+    out = []
+    for _ in range(n):
+        row, _ = scalar_step(agent, world)
+        out.append((row, agent.l4.activation_count, len(agent.l4.stm),
+                    tuple(tuple(npc.position) for npc in world.npcs)))
+    return out
+
+
+def check_branches_continue(own_rng: bool, planner=None) -> bool:
+    label = "専用の乱数源" if own_rng else "グローバルのrandom"
+    if planner is not None:
+        label += "・経路計画あり"
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        for seed in range(N_SEEDS):
+            agent, world = make(seed, own_rng, planner=planner)
+            run(agent, world, BRANCH_AT)
+            ckpt = agent.snapshot(world)
+            path = os.path.join(tmp, f"{seed}.ckpt")
+            ckpt.save(path)
+            ref = run(agent, world, SUFFIX)
+            branches = [run(*b, SUFFIX) for b in ckpt.fork(2)]
+            loaded = h.Checkpoint.load(path).restore(events=h.NullSink(), planner=planner)
+            ok &= all(b == ref for b in branches) and run(*loaded, SUFFIX) == ref
+    return check(f"{label}: 分岐・ファイルから復元 = 元のランの続き（{N_SEEDS}シード）", ok)
+
+
+def check_counterfactual() -> bool:
+    changed = 0
+    same = True
+    for seed in range(N_SEEDS):
+        agent, world = make(seed)
+        run(agent, world, BRANCH_AT)
+        ckpt = agent.snapshot(world)
+        ref = run(agent, world, SUFFIX)
+        (a0, w0), (a1, w1) = ckpt.fork(2)
+        a1.l5.ENTRAIN_K = 1.5
+        same &= run(a0, w0, SUFFIX) == ref
+        changed += run(a1, w1, SUFFIX) != ref
+    ok = check("変更しない分岐は元のランと同じ", same)
+    ok &= check(f"ENTRAIN_Kを変えた分岐は変わる（{changed}/{N_SEEDS}シード）", changed > 0)
+    return ok
+
+
+def check_copy_on_write() -> bool:
+    agent, world = make(0)
+    world.add_wall(8, 8)
+    ckpt = agent.snapshot(world)
+    (_, w0), (_, w1) = ckpt.fork(2)
+    shared = w0.cells is ckpt.terrain and w1.cells is ckpt.terrain
+    w1.add_danger(1, 1)
+    ok = check("分岐は地形を共有する", shared)
+    ok &= check("書き込んだ分岐だけが複製する",
+                w1.get_cell(1, 1) == 'danger' and w0.get_cell(1, 1) == 'empty'
+                and world.get_cell(1, 1) == 'empty' and w0.cells is ckpt.terrain
+                and w0.get_cell(8, 8) == 'wall')
+    return ok
+
+
+def check_external_store() -> bool:
+    with tempfile.TemporaryDirectory() as tmp:
+        agent, world = make(1, store=h.DirectoryStore(tmp))
+        agent.l4.remember_consciously("danger", agent.l1.get_state(), agent.l2.get_state())
+        ckpt = agent.snapshot(world)
+        files = {f: os.path.getsize(os.path.join(tmp, f)) for f in sorted(os.listdir(tmp))}
+        branch, _ = ckpt.restore()
+        for _ in range(5):
+            branch.l4.remember_consciously("danger", branch.l1.get_state(), branch.l2.get_state())
+        after = {f: os.path.getsize(os.path.join(tmp, f)) for f in sorted(os.listdir(tmp))}
+        ok = check("分岐の保存先はInMemoryStore（その時点の長期記憶入り）",
+                   isinstance(branch.l4.store, h.InMemoryStore)
+                   and len(branch.l4.store.records) == agent.l4._ltm_count + 5
+                   and branch.l4.ltm[:agent.l4._ltm_count] == agent.l4.ltm)
+        ok &= check("元の保存先のファイルは変わらない", files == after)
+    return ok
+
+
+def check_supplied_store() -> bool:
+    agent, world = make(1)
+    for _ in range(3):
+        agent.l4.remember_consciously("danger", agent.l1.get_state(), agent.l2.get_state())
+    ckpt = agent.snapshot(world)
+    with tempfile.TemporaryDirectory() as tmp:
+        branch, _ = ckpt.restore(store=h.DirectoryStore(os.path.join(tmp, "a")))
+        for _ in range(2):
+            branch.l4.remember_consciously("danger", branch.l1.get_state(), branch.l2.get_state())
+        branch.l4.store.flush()
+        reloaded = h.L4Memory(store=h.DirectoryStore(os.path.join(tmp, "a")), events=h.NullSink())
+        ok = check("空のDirectoryStoreを渡した分岐: 読み直すと前半＋分岐後の長期記憶",
+                   reloaded._ltm_count == agent.l4._ltm_count + 2
+                   and reloaded.ltm == branch.l4.ltm
+                   and reloaded._tendencies == branch.l4._tendencies)
+
+        paths = [os.path.join(tmp, f"b{i}.sqlite3") for i in range(2)]
+        branches = ckpt.fork(2, store_factory=lambda i: h.SQLiteStore(paths[i]))
+        for i, (b, _) in enumerate(branches):
+            for _ in range(i + 1):
+                b.l4.remember_consciously("danger", b.l1.get_state(), b.l2.get_state())
+        counts = [h.L4Memory(store=h.SQLiteStore(path), events=h.NullSink())._ltm_count
+                  for path in paths]
+        ok &= check("fork(store_factory=...): 分岐ごとの保存先に書き込む",
+                    counts == [agent.l4._ltm_count + 1, agent.l4._ltm_count + 2])
+
+        refused = 0
+        try:
+            ckpt.fork(2, store=h.InMemoryStore())
+        except ValueError:
+            refused += 1
+        try:
+            ckpt.restore(store=h.DirectoryStore(os.path.join(tmp, "a")))
+        except ValueError:
+            refused += 1
+        ok &= check("分岐での保存先の共有・件数の違う保存先は拒否", refused == 2)
+    return ok
+
+
+def check_cost() -> bool:
+    agent, world = make(2)
+    run(agent, world, BRANCH_AT)
+    ckpt = agent.snapshot(world)
+    n = 200
+    calls = []
+    step = h.HIDA.step
+    h.HIDA.step = lambda self, *args, **kwargs: calls.append(1) or step(self, *args, **kwargs)
+    try:
+        t0 = time.perf_counter()
+        branches = ckpt.fork(n)
+        fork_time = (time.perf_counter() - t0) / n
+    finally:
+        h.HIDA.step = step
+    t0 = time.perf_counter()
+    for _ in range(20):
+        run(*make(2), BRANCH_AT)
+    prefix_time = (time.perf_counter() - t0) / 20
+    print(f"  チェックポイント {ckpt.nbytes}バイト, 分岐1本 {fork_time * 1e3:.2f}ms, "
+          f"前半{BRANCH_AT}ステップの再計算 {prefix_time * 1e3:.2f}ms")
+    return check("分岐は step() を呼ばずに分岐点から始まる",
+                 not calls and all(a.step_count == ckpt.step == BRANCH_AT and w.cells is ckpt.terrain
+                                   for a, w in branches))
+
+
+def main():
+    print("=" * 64)
+    print("チェックポイントと分岐の検証")
+    print(f"  分岐点: ステップ{BRANCH_AT}, 分岐後: {SUFFIX}ステップ")
+    print("=" * 64)
+
+    print("\n[分岐 = 元のランの続き]")
+    ok = check_branches_continue(own_rng=True)
+    ok &= check_branches_continue(own_rng=False)
+    ok &= check_branches_continue(own_rng=True, planner=h.PathPlanner())
+    print("\n[反実仮想]")
+    ok &= check_counterfactual()
+    print("\n[地形のコピーオンライト]")
+    ok &= check_copy_on_write()
+    print("\n[外部の保存先]")
+    ok &= check_external_store()
+    ok &= check_supplied_store()
+    print("\n[コスト]")
+    ok &= check_cost()
+
+    print("\n判定:", "PASS" if ok else "FAIL")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
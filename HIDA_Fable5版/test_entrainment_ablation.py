@@ -21,27 +21,23 @@ v2.1 引き込み機構のアブレーション検証
   これが確認されれば、「主導→追随」は相関ではなく、実装された
   因果チャネルとして存在することが示される（論文§4.3.4の将来拡張に対応）。
 
-実行: python3 test_entrainment_ablation.py
+実行: python3 test_entrainment_ablation.py [--workers N]
+  --workers N: シード×条件をN個のプロセスに分散して実行する。各シードは
+               メモリ内の保存先（InMemoryStore）で走るため、LTM・変調値は
+               互いに干渉せず、ディスクにも書かない。結果は逐次実行と同一。
 依存: Python標準ライブラリのみ
 """
 
-import os
+import sys
 import random
-import io
-import contextlib
+import multiprocessing
 
 import hida_unified_v2 as h
 
 
 N_SEEDS = 30
 MAX_STEPS = 40
-
-
-def clean_persistence():
-    """LTM・変調値ファイルを削除して条件間の汚染を防ぐ"""
-    for f in ("hida_ltm.json", "hida_modulation.json"):
-        if os.path.exists(f):
-            os.remove(f)
+CONDITIONS = (("OFF (K=0.0)", 0.0), ("ON  (K=0.5)", 0.5))
 
 
 def run_one(seed: int, entrain_k: float):
@@ -51,13 +47,14 @@ def run_one(seed: int, entrain_k: float):
         list of dict: 各ステップの
             {'leader': str|None, 'strength': float, 'activities': dict}
     """
-    clean_persistence()
-    random.seed(seed)
-
-    buf0 = io.StringIO()
-    with contextlib.redirect_stdout(buf0):  # LTM読み込みログ等を抑制
-        world = h.create_test_world()
-        agent = h.HIDA(color_preference={'red': 1.0, 'blue': 0.3, 'green': 0.3})
+    # エージェントとWorld(NPC)で共有する専用の乱数源（グローバルのrandomは使わない）
+    rng = random.Random(seed)
+
+    world = h.create_test_world(rng)
+    # 毎回空の記憶から始める（条件間・並列実行間の汚染を防ぐ）
+    # イベント出力はNullSinkで捨てる（書式化もしない）
+    agent = h.HIDA(color_preference={'red': 1.0, 'blue': 0.3, 'green': 0.3},
+                   store=h.InMemoryStore(), events=h.NullSink(), rng=rng)
     agent.l1.position = [3, 6]
     agent.l1.direction = 'N'
     agent.l1.energy = 1.0
@@ -77,20 +74,46 @@ def run_one(seed: int, entrain_k: float):
                 agent.l4.internal_map[(x, y)] = 'empty'
 
     series = []
-    buf = io.StringIO()
-    with contextlib.redirect_stdout(buf):  # NPC等の出力を抑制
-        for _ in range(MAX_STEPS):
-            result = agent.step(world, verbose=False)
-            series.append({
-                'leader': agent.l5.sync_type,
-                'strength': agent.l5.leader_strength,
-                'activities': dict(agent.l5.last_activities),
-            })
-            if result['goal_reached'] or agent.l1.energy <= 0:
-                break
+    for _ in range(MAX_STEPS):
+        result = agent.step(world, verbose=False)
+        series.append({
+            'leader': agent.l5.sync_type,
+            'strength': agent.l5.leader_strength,
+            'activities': dict(agent.l5.last_activities),
+        })
+        if result['goal_reached'] or agent.l1.energy <= 0:
+            break
     return series
 
 
+def _run_task(task):
+    """ワーカープロセス用: (条件ラベル, シード, K) を実行する"""
+    label, seed, k = task
+    return label, seed, run_one(seed, k)
+
+
+def collect_series(workers: int = 1) -> dict:
+    """全条件×全シードの時系列を集める
+
+    workers > 1 のときはプロセスプールに分散し、終わったタスクから
+    順に親プロセスへ時系列を受け取る。集計はシード順に行うため、
+    逐次実行と同じ結果になる。
+
+    Returns:
+        dict: {条件ラベル: [シード0の時系列, シード1の時系列, ...]}
+    """
+    tasks = [(label, seed, k) for label, k in CONDITIONS for seed in range(N_SEEDS)]
+    out = {label: [None] * N_SEEDS for label, _ in CONDITIONS}
+    if workers <= 1:
+        for label, seed, k in tasks:
+            out[label][seed] = run_one(seed, k)
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            for label, seed, series in pool.imap_unordered(_run_task, tasks):
+                out[label][seed] = series
+    return out
+
+
 def follower_mean(activities: dict, leader: str) -> float:
     """主導層を除く3層の活動量平均"""
     vals = [v for k, v in activities.items() if k != leader]
@@ -139,22 +162,23 @@ def pearson(pairs) -> float:
     return cov / (vx ** 0.5 * vy ** 0.5)
 
 
-def main():
+def main(workers: int = 1):
     print("=" * 64)
     print("v2.1 引き込み機構アブレーション検証")
     print(f"  条件: ENTRAIN_K = 0.0（OFF） vs 0.5（ON）")
     print(f"  シード数: {N_SEEDS}, 最大ステップ: {MAX_STEPS}")
     print("=" * 64)
 
+    all_series = collect_series(workers)
     results = {}
     per_seed = {}
-    for label, k in (("OFF (K=0.0)", 0.0), ("ON  (K=0.5)", 0.5)):
+    for label, k in CONDITIONS:
         all_rises = []
         all_pairs = []
         leader_events = 0
         seed_means = []
         for seed in range(N_SEEDS):
-            series = run_one(seed, k)
+            series = all_series[label][seed]
             rises = lagged_rise(series)
             all_rises.extend(rises)
             all_pairs.extend(lagged_pairs(series))
@@ -190,8 +214,10 @@ def main():
     else:
         print("\n結論: 因果は確認されなかった。ENTRAIN_Kまたは各層の")
         print("      ゲイン適用箇所の見直しが必要。")
-    clean_persistence()
 
 
 if __name__ == "__main__":
-    main()
+    workers = 1
+    if "--workers" in sys.argv:
+        workers = int(sys.argv[sys.argv.index("--workers") + 1])
+    main(workers)
@@ -0,0 +1,131 @@
+"""
+test_l5_rescore.py
+L5オフライン再採点（hida_l5_rescore.py）とcheck_syncの一致検証
+
+目的:
+  記録済みの活動量時系列をDNA定数グリッドで再採点した結果が、同じ定数で
+  シミュレーションをやり直したときの check_sync の出力（sync_type,
+  leader_strength, sync_coherence, sync_score, is_conscious）と
+  浮動小数点まで一致することを確認する。
+
+方法:
+  test_entrainment_ablation.py と同じシナリオ・シード群で、初期DNAのまま
+  活動量を記録し、グリッドの全組について
+    - ENTRAIN_K=0.0: LEADER_THRESHOLDを含む全定数を変えて比較
+    - ENTRAIN_K=0.5: LEADER_THRESHOLD以外を変えて比較（'exact'の組のみ厳密）
+  を行う。最後に大きなグリッドでのON率計算の所要時間を表示する。
+
+実行: python3 test_l5_rescore.py
+依存: NumPy
+"""
+
+import sys
+import time
+import random
+
+import numpy as np
+
+import hida_unified_v2 as h
+from hida_l5_rescore import DNA_KEYS, dna_grid, record_activities, rescore, on_rate
+from hida_population import LAYERS
+from test_entrainment_ablation import N_SEEDS, MAX_STEPS
+from test_population_equivalence import COLOR_PREF, give_initial_knowledge
+
+
+def make_agent(seed: int, entrain_k: float, dna: dict = None):
+    """アブレーションと同じ初期条件のエージェント（dnaでL5定数を上書き）"""
+    rng = random.Random(seed)
+    world = h.create_test_world(rng)
+    agent = h.HIDA(color_preference=dict(COLOR_PREF), store=h.InMemoryStore(),
+                   events=h.NullSink(), rng=rng)
+    agent.l1.position = [3, 6]
+    agent.l1.direction = 'N'
+    agent.l5.ENTRAIN_K = entrain_k
+    for k, v in (dna or {}).items():
+        setattr(agent.l5, k, v)
+    give_initial_knowledge(agent.l4.found_objects, agent.l4.internal_map, world)
+    return agent, world
+
+
+def simulate(seed: int, entrain_k: float, dna: dict) -> list:
+    """その定数でシミュレーションし直したときの check_sync 出力列"""
+    agent, world = make_agent(seed, entrain_k, dna)
+    out = []
+    for _ in range(MAX_STEPS):
+        r = agent.step(world, verbose=False)
+        l5 = agent.l5
+        out.append((l5.sync_type, l5.leader_strength, l5.sync_coherence,
+                    l5.sync_score, l5.is_conscious))
+        if r['goal_reached'] or agent.l1.energy <= 0:
+            break
+    return out
+
+
+def rescored(result: dict, p: int, r: int, length: int) -> list:
+    """再採点結果の (組p, ランr) を simulate() と同じ形にする"""
+    out = []
+    for t in range(length):
+        leader = int(result['leader'][p, r, t])
+        out.append((LAYERS[leader] if leader >= 0 else None,
+                    float(result['leader_strength'][p, r, t]),
+                    float(result['coherence'][p, r, t]),
+                    float(result['sync_score'][p, r, t]),
+                    bool(result['conscious'][p, r, t])))
+    return out
+
+
+def check(entrain_k: float, grid: dict, seeds: list) -> bool:
+    traces = [record_activities(*make_agent(s, entrain_k), max_steps=MAX_STEPS) for s in seeds]
+    result = rescore(traces, grid, recorded_entrain_k=entrain_k)
+    n_combos = len(grid['EMA_ALPHA'])
+    mismatched = []
+    steps = 0
+    for p in range(n_combos):
+        if not result['exact'][p]:
+            continue
+        dna = {k: float(grid[k][p]) for k in DNA_KEYS}
+        for r, seed in enumerate(seeds):
+            ref = simulate(seed, entrain_k, dna)
+            steps += len(ref)
+            if ref != rescored(result, p, r, len(traces[r])):
+                mismatched.append((p, seed))
+    n_exact = int(result['exact'].sum())
+    ok = not mismatched and n_exact > 0
+    print(f"  ENTRAIN_K={entrain_k}: {n_exact}/{n_combos}組 × {len(seeds)}ラン, "
+          f"{steps}ステップ比較 ... {'PASS' if ok else 'FAIL'}"
+          + (f"  不一致(組, シード): {mismatched[:5]}" if mismatched else ""))
+    return ok
+
+
+def main():
+    print("=" * 64)
+    print("L5オフライン再採点 ⇔ check_sync 一致検証")
+    print(f"  シード数: {N_SEEDS}, 最大ステップ: {MAX_STEPS}")
+    print("=" * 64)
+
+    seeds = list(range(N_SEEDS))
+    grid_all = dna_grid(LEADER_THRESHOLD=[0.2, 0.3, 0.4], EMA_ALPHA=[0.2, 0.35],
+                        ON_THRESHOLD=[0.06, 0.08], LAG_WEIGHT=[0.3, 0.5])
+    grid_k = dna_grid(LEADER_THRESHOLD=[0.3, 0.4], EMA_ALPHA=[0.2, 0.35],
+                      ON_THRESHOLD=[0.06, 0.08], OFF_THRESHOLD=[0.03, 0.05], LAG_WEIGHT=[0.3, 0.5])
+    ok = check(0.0, grid_all, seeds)
+    ok &= check(0.5, grid_k, seeds)
+
+    # 所要時間の目安: 大きなグリッドのON率
+    traces = [record_activities(*make_agent(s, 0.0), max_steps=MAX_STEPS) for s in seeds]
+    big = dna_grid(LEADER_THRESHOLD=np.linspace(0.1, 0.5, 8), EMA_ALPHA=np.linspace(0.1, 0.6, 8),
+                   ON_THRESHOLD=np.linspace(0.04, 0.12, 8), OFF_THRESHOLD=np.linspace(0.02, 0.06, 4),
+                   LAG_WEIGHT=np.linspace(0.0, 1.0, 4))
+    t0 = time.perf_counter()
+    rates = on_rate(traces, big)
+    elapsed = time.perf_counter() - t0
+    print(f"\n  ON率: {len(rates)}組 × {len(seeds)}ラン を {elapsed:.2f}秒"
+          f"（ON率の範囲 {rates.min():.2f}〜{rates.max():.2f}）")
+
+    print("\n判定:", "PASS" if ok else "FAIL")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
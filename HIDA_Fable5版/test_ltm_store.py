@@ -0,0 +1,225 @@
+"""
+test_ltm_store.py
+長期記憶の保存先（DirectoryStore / SQLiteStore）の復旧と再構築の検証
+
+目的:
+  1. チェックポイントの後に追記したまま終了しても（クラッシュ）、読み直すと
+     チェックポイント＋ジャーナルの再生で全件・同じ傾向集計になること
+  2. 書き込み途中で切れたジャーナルの末尾行は読み飛ばし、その後の追記は読めること
+  3. バックグラウンドの圧縮中も追記が続けられ、圧縮中に追記した行は残ること。
+     圧縮中で始まらなかったチェックポイントは、次の追記で再試行されること
+  4. スナップショットの大きさ（snapshot_size）や集計ルール（version）が
+     合わない集計は使わず、全件を再生して作り直すこと
+  5. 必要なメソッドが欠けた保存先は、使う前（作成時）にエラーになること
+
+実行: python3 test_ltm_store.py
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+
+import hida_unified_v2 as h
+
+
+class SmallL4(h.L4Memory):
+    """少ない件数でチェックポイントを作る L4Memory"""
+    LTM_COMPACT_EVERY = 10
+
+
+class NextVersionL4(SmallL4):
+    """集計ルールのバージョンだけが違う L4Memory"""
+    TENDENCIES_VERSION = h.L4Memory.TENDENCIES_VERSION + 1
+
+
+class BlockingStore(h.DirectoryStore):
+    """gate がセットされるまで圧縮を始めない DirectoryStore"""
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.gate = threading.Event()
+
+    def _compact(self, version, tendencies, count):
+        self.gate.wait(10)
+        super()._compact(version, tendencies, count)
+
+
+STORES = {
+    'DirectoryStore': lambda tmp: h.DirectoryStore(tmp),
+    'SQLiteStore': lambda tmp: h.SQLiteStore(os.path.join(tmp, "hida_memory.sqlite3")),
+}
+
+
+def check(name: str, ok: bool) -> bool:
+    print(f"  {name} ... {'PASS' if ok else 'FAIL'}")
+    return ok
+
+
+def memory(i: int) -> dict:
+    events = ['danger_pain', 'danger_fatigue', 'goal_reached_with_red', 'goal_reached_with_green']
+    return {'event': events[i % 4], 'position': [i, i % 3], 'energy': round(1 - i / 100, 2),
+            'qualia': {'fear': round(i % 7 / 10, 1)}, 'is_session_end': i % 5 == 0}
+
+
+def load(cls, store) -> h.L4Memory:
+    return cls(store=store, events=h.NullSink())
+
+
+def reload(store) -> h.L4Memory:
+    """確認用に読み直す（件数が少ないので読み込み時の圧縮は起きない）"""
+    return load(h.L4Memory, store)
+
+
+def same_as(l4: h.L4Memory, n: int) -> bool:
+    """l4 が memory(0..n-1) を読み込み、全件から作った集計と同じ集計を持つか"""
+    records = [memory(i) for i in range(n)]
+    return (l4._ltm_count == n and l4.ltm == records
+            and l4._tendencies == h.L4Memory._build_tendencies(records))
+
+
+def check_crash_replay(name: str, make_store) -> bool:
+    with tempfile.TemporaryDirectory() as tmp:
+        l4 = load(SmallL4, make_store(tmp))
+        for i in range(23):
+            l4._append_ltm(memory(i))
+        l4.store.flush()
+        # 最後のチェックポイントの後の記憶はジャーナル・表にだけある（DirectoryStore は
+        # 前の圧縮が実行中だと次の追記まで遅れるので、チェックポイントの件数は決まらない）
+        summary = make_store(tmp).load_summary(SmallL4.TENDENCIES_VERSION)
+        reloaded = reload(make_store(tmp))
+        replayed = 23 - summary[1]
+        return check(f"{name}: チェックポイント{summary[1]}件＋追記{replayed}件を再生して読み直せる",
+                     summary[1] >= 10 and same_as(reloaded, 23) and reloaded._journal_count == replayed)
+
+
+def check_torn_line() -> bool:
+    with tempfile.TemporaryDirectory() as tmp:
+        l4 = load(SmallL4, h.DirectoryStore(tmp))
+        for i in range(6):
+            l4._append_ltm(memory(i))
+        path = os.path.join(tmp, h.DirectoryStore.LTM_JOURNAL)
+        with open(path, 'rb') as f:
+            data = f.read()
+        with open(path, 'wb') as f:
+            f.write(data[:-15])        # 6件目の途中で切れた
+        torn = reload(h.DirectoryStore(tmp))
+        ok = check("切れた末尾行は読み飛ばす（5件）", same_as(torn, 5))
+        for i in range(5, 9):
+            torn._append_ltm(memory(i))
+        ok &= check("切れた行の後の追記は読み直せる（9件）", same_as(reload(h.DirectoryStore(tmp)), 9))
+    return ok
+
+
+def journal_seqs(path: str) -> list:
+    with open(os.path.join(path, h.DirectoryStore.LTM_JOURNAL), encoding='utf-8') as f:
+        return [json.loads(line)['seq'] for line in f if line.strip()]
+
+
+def check_compaction_during_appends() -> bool:
+    every = SmallL4.LTM_COMPACT_EVERY
+    with tempfile.TemporaryDirectory() as tmp:
+        store = BlockingStore(tmp)
+        l4 = load(SmallL4, store)
+        for i in range(every):
+            l4._append_ltm(memory(i))       # 10件目で圧縮が始まる（gateで止まる）
+        started = store._compactor is not None and store._compactor.is_alive()
+        for i in range(every, 2 * every + 2):
+            l4._append_ltm(memory(i))       # 20件目のチェックポイントは始まらない
+        skipped = l4._journal_count
+        store.gate.set()
+        store.flush()
+        ok = check("圧縮中も追記でき、圧縮中の追記はジャーナルに残る",
+                   started and journal_seqs(tmp) == list(range(every, 2 * every + 2))
+                   and same_as(reload(h.DirectoryStore(tmp)), 2 * every + 2))
+        l4._append_ltm(memory(2 * every + 2))
+        store.flush()
+        ok &= check(f"始まらなかったチェックポイントは次の追記で再試行（{skipped}件 → 0件）",
+                    skipped == every + 2 and l4._journal_count == 0 and journal_seqs(tmp) == []
+                    and same_as(reload(h.DirectoryStore(tmp)), 2 * every + 3))
+    return ok
+
+
+def check_snapshot_mismatch() -> bool:
+    with tempfile.TemporaryDirectory() as tmp:
+        l4 = load(SmallL4, h.DirectoryStore(tmp))
+        for i in range(25):
+            l4._append_ltm(memory(i))
+        l4.store.flush()
+        path = os.path.join(tmp, h.DirectoryStore.LTM_FILE)
+        with open(path, encoding='utf-8') as f:
+            records = json.load(f)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(records, f)      # 中身は同じで大きさだけ違う（差し替え）
+        store = h.DirectoryStore(tmp)
+        stale = store.load_summary(SmallL4.TENDENCIES_VERSION) is None
+        reloaded = load(SmallL4, store)
+        store.flush()
+        ok = check("snapshot_size が合わない集計は使わず、全件を再生する",
+                   stale and same_as(reloaded, 25))
+        ok &= check("再生が大きければ新しいチェックポイントを作る",
+                    h.DirectoryStore(tmp).load_summary(SmallL4.TENDENCIES_VERSION) is not None)
+    return ok
+
+
+def check_version_mismatch(name: str, make_store) -> bool:
+    with tempfile.TemporaryDirectory() as tmp:
+        l4 = load(SmallL4, make_store(tmp))
+        for i in range(25):
+            l4._append_ltm(memory(i))
+        l4.store.flush()
+        store = make_store(tmp)
+        reloaded = load(NextVersionL4, store)
+        store.flush()
+        summary = make_store(tmp).load_summary(NextVersionL4.TENDENCIES_VERSION)
+        return check(f"{name}: version が合わない集計は全件から作り直し、新しい版で保存する",
+                     same_as(reloaded, 25) and summary is not None and summary[1] == 25)
+
+
+def check_incomplete_store() -> bool:
+    class NoClear(h.MemoryStore):
+        """clear() 以外を InMemoryStore から借りた保存先"""
+        load_summary = h.InMemoryStore.load_summary
+        read_records = h.InMemoryStore.read_records
+        append = h.InMemoryStore.append
+        checkpoint = h.InMemoryStore.checkpoint
+        load_modulation = h.InMemoryStore.load_modulation
+        save_modulation = h.InMemoryStore.save_modulation
+
+    try:
+        NoClear()
+        refused = False
+    except TypeError:
+        refused = True
+    return check("clear() のない保存先は作成時に TypeError", refused)
+
+
+def main():
+    print("=" * 64)
+    print("長期記憶の保存先の復旧・再構築の検証")
+    print(f"  チェックポイントの間隔: {SmallL4.LTM_COMPACT_EVERY}件")
+    print("=" * 64)
+
+    print("\n[クラッシュ後の再生]")
+    ok = True
+    for name, make_store in STORES.items():
+        ok &= check_crash_replay(name, make_store)
+    print("\n[切れたジャーナル行]")
+    ok &= check_torn_line()
+    print("\n[追記が続く中での圧縮]")
+    ok &= check_compaction_during_appends()
+    print("\n[集計が使えないときの再構築]")
+    ok &= check_snapshot_mismatch()
+    for name, make_store in STORES.items():
+        ok &= check_version_mismatch(name, make_store)
+    print("\n[保存先のインターフェース]")
+    ok &= check_incomplete_store()
+
+    print("\n判定:", "PASS" if ok else "FAIL")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
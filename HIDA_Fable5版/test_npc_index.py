@@ -0,0 +1,99 @@
+"""
+test_npc_index.py
+NPCの占有インデックス（World.get_npc_at / move_npc）の検証
+
+目的:
+  1. NPCがランダムに動き回っても、get_npc_at() が npcs の線形走査
+     （従来の get_npc_at）と全マスで同じNPCを返すこと。
+     同じマスに複数のNPCがいるときは登録順で最初のNPC
+  2. add_npc() を通していないNPCを動かしてもエラーにならず、
+     npcs に直接入れたNPCは動かした後に見つかること（従来どおり）
+
+実行: python3 test_npc_index.py
+"""
+
+import random
+import sys
+
+import hida_unified_v2 as h
+
+
+TICKS = 300
+
+
+def check(name: str, ok: bool) -> bool:
+    print(f"  {name} ... {'PASS' if ok else 'FAIL'}")
+    return ok
+
+
+def npc_at_scan(world, x, y):
+    """従来の World.get_npc_at（比較用。npcsを登録順に走査する）"""
+    for npc in world.npcs:
+        if npc.position[0] == x and npc.position[1] == y:
+            return npc
+    return None
+
+
+def same_as_scan(world) -> bool:
+    return all(world.get_npc_at(x, y) is npc_at_scan(world, x, y)
+               for y in range(world.size) for x in range(world.size))
+
+
+def check_random_moves() -> bool:
+    ok = True
+    shared = 0
+    for seed in range(10):
+        rng = random.Random(seed)
+        world = h.create_test_world(rng)
+        for i in range(8):
+            # 半分は同じマスから出発する
+            pos = [2, 2] if i % 2 else [rng.randint(1, 8), rng.randint(1, 8)]
+            world.add_npc(h.NPC(f"npc{i}", pos))
+        for t in range(TICKS):
+            world.step_npcs(rng)
+            if t % 10 == 0:
+                a, b = rng.sample(world.npcs, 2)
+                world.move_npc(a, b.position)      # 2体を同じマスに重ねる
+            shared += len({tuple(n.position) for n in world.npcs}) < len(world.npcs)
+            ok = ok and same_as_scan(world)
+    ok = check(f"{TICKS}tick × 10シード: 全マスで線形走査と同じNPC", ok)
+    ok &= check(f"同じマスに複数いる状態を含む（{shared}tick）", shared > 0)
+    return ok
+
+
+def check_unregistered() -> bool:
+    world = h.create_test_world(random.Random(0))
+    loose = h.NPC("loose", [2, 2])
+    try:
+        world.move_npc(loose, [3, 2])
+        loose.step(world, random.Random(1))
+        raised = False
+    except (KeyError, ValueError):
+        raised = True
+    ok = check("登録していないNPCを動かしてもエラーにならない",
+               not raised and same_as_scan(world))
+    direct = h.NPC("direct", [5, 5])
+    world.npcs.append(direct)
+    world.move_npc(direct, [5, 4])
+    ok &= check("npcs に直接入れたNPCは動かした後に見つかる",
+                world.get_npc_at(5, 4) is direct and same_as_scan(world))
+    return ok
+
+
+def main():
+    print("=" * 64)
+    print("NPCの占有インデックスの検証")
+    print("=" * 64)
+
+    print("\n[ランダムな移動]")
+    ok = check_random_moves()
+    print("\n[add_npc() を通していないNPC]")
+    ok &= check_unregistered()
+
+    print("\n判定:", "PASS" if ok else "FAIL")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
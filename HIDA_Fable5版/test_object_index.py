@@ -0,0 +1,109 @@
+"""
+test_object_index.py
+L4の発見物索引（ObjectIndex）の検証
+
+目的:
+  1. 登録・上書き（名前や色の変更を含む）・削除をランダムに繰り返しても、
+     ball_candidates() / goal_position() が found_objects を全件走査した
+     場合（従来の think() の書き方）と同じ結果を返すこと
+  2. 発見物が多くても think() の所要時間がほとんど増えないこと
+
+実行: python3 test_object_index.py
+"""
+
+import random
+import sys
+import timeit
+
+import hida_unified_v2 as h
+
+
+def check(name: str, ok: bool) -> bool:
+    print(f"  {name} ... {'PASS' if ok else 'FAIL'}")
+    return ok
+
+
+def scan(found: dict):
+    """従来の think() と同じ全件走査"""
+    balls = {}
+    goal = None
+    for pos, obj in found.items():
+        if obj.get('name') == 'ball':
+            balls[obj.get('color', 'unknown')] = pos
+        if obj.get('name') == 'goal':
+            goal = pos
+    return list(balls.items()), goal
+
+
+def random_object(rng: random.Random) -> dict:
+    name = rng.choice(['ball', 'ball', 'ball', 'goal', 'rock'])
+    obj = {'name': name, 'color': rng.choice(['red', 'blue', 'green', None])}
+    if rng.random() < 0.2:
+        del obj['color']
+    return obj
+
+
+def check_matches_scan() -> bool:
+    rng = random.Random(0)
+    index = h.ObjectIndex()
+    plain = {}
+    mismatches = 0
+    for _ in range(20000):
+        pos = (rng.randrange(12), rng.randrange(12))
+        op = rng.random()
+        if op < 0.6:
+            obj = random_object(rng)
+            index[pos] = obj
+            plain[pos] = obj
+        elif op < 0.8:
+            index.pop(pos, None)
+            plain.pop(pos, None)
+        elif op < 0.9 and pos in plain:
+            del index[pos]
+            del plain[pos]
+        elif op < 0.95:
+            obj = random_object(rng)
+            index.setdefault(pos, obj)
+            plain.setdefault(pos, obj)
+        elif plain:
+            assert index.popitem() == plain.popitem()
+        mismatches += (index.ball_candidates(), index.goal_position()) != scan(plain) or index != plain
+    ok = check(f"20000回のランダム操作で全件走査と一致（不一致 {mismatches}回）", mismatches == 0)
+    copied = h.ObjectIndex(plain)
+    ok &= check("既存の辞書からの構築", (copied.ball_candidates(), copied.goal_position()) == scan(plain))
+    return ok
+
+
+def check_think_cost() -> bool:
+    times = {}
+    for n in (5, 2000):
+        world = h.create_test_world()
+        agent = h.HIDA(color_preference={'red': 1.0, 'blue': 0.3, 'green': 0.3},
+                       store=h.InMemoryStore(), events=h.NullSink())
+        agent.l1.position = [3, 6]
+        colors = ['red', 'blue', 'green', 'yellow']
+        for i in range(n):
+            agent.l4.found_objects[(100 + i, i % 50)] = {'name': 'ball', 'color': colors[i % 4]}
+        agent.l4.found_objects[(7, 7)] = {'name': 'goal', 'color': None}
+        times[n] = min(timeit.repeat(lambda: agent.think(world), number=2000, repeat=5)) / 2000 * 1e6
+    print(f"  think(): 発見物5個 {times[5]:.1f}µs, 2000個 {times[2000]:.1f}µs")
+    return check("発見物が400倍でもthink()は2倍未満", times[2000] < 2 * times[5])
+
+
+def main():
+    print("=" * 64)
+    print("L4発見物索引（ObjectIndex）検証")
+    print("=" * 64)
+
+    print("\n[全件走査との一致]")
+    ok = check_matches_scan()
+    print("\n[think()の所要時間]")
+    ok &= check_think_cost()
+
+    print("\n判定:", "PASS" if ok else "FAIL")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
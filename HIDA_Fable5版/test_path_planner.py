@@ -0,0 +1,190 @@
+"""
+test_path_planner.py
+距離場による経路計画（PathPlanner）の検証
+
+目的:
+  1. 距離場が内部マップ上の最短経路長（幅優先探索）と一致すること
+  2. 壁で仕切られたワールドで、貪欲な向き決め（従来）では着けないゴールに
+     着くこと。危険ゾーンのあるテストワールドでは、危険ゾーンを避けて
+     消費エネルギーが減ること（回り道のぶんステップ数は増えうる）
+  3. 距離場はマップが変わったときだけ作り直され、同じ知識・同じ目標の
+     エージェント間で共有されること
+  4. 集団エンジンに同じPathPlannerを渡すと、スカラー版と一致すること
+
+実行: python3 test_path_planner.py
+"""
+
+import random
+import sys
+from collections import deque
+
+import hida_unified_v2 as h
+from test_entrainment_ablation import N_SEEDS, MAX_STEPS
+from test_population_equivalence import make_scalar, population_traces, scalar_trace
+
+
+def check(name: str, ok: bool) -> bool:
+    print(f"  {name} ... {'PASS' if ok else 'FAIL'}")
+    return ok
+
+
+def bfs(internal_map, target) -> dict:
+    """壁以外の既知マスでの最短歩数（検証用の素朴な実装）"""
+    dist = {target: 0}
+    queue = deque([target])
+    while queue:
+        x, y = queue.popleft()
+        for n in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+            if n not in dist and internal_map.get(n, 'wall') != 'wall':
+                dist[n] = dist[(x, y)] + 1
+                queue.append(n)
+    return dist
+
+
+def check_field() -> bool:
+    rng = random.Random(0)
+    ok = True
+    for _ in range(20):
+        m = h.VersionedMap()
+        for x in range(15):
+            for y in range(15):
+                m[(x, y)] = rng.choices(['empty', 'wall', 'danger'], [6, 3, 1])[0]
+        target = (7, 7)
+        m[target] = 'empty'
+        field = h.PathPlanner().distance_field(m, target, fear_weight=0.0)
+        ok &= field == {k: float(v) for k, v in bfs(m, target).items()}
+    return check("危険コスト0の距離場 = 幅優先探索の最短歩数（ランダム地形20面）", ok)
+
+
+def walled_world():
+    """中央の壁を下端の隙間から回り込まないとゴールに行けないワールド"""
+    world = h.World(size=10)
+    for i in range(10):
+        for p in ((i, 0), (i, 9), (0, i), (9, i)):
+            world.add_wall(*p)
+    for y in range(1, 7):
+        world.add_wall(5, y)
+    world.add_danger(4, 8)
+    world.add_object('ball', 2, 5, color='red')
+    world.add_object('goal', 7, 2)
+    return world
+
+
+def run_walled(seed: int, planner) -> tuple:
+    rng = random.Random(seed)
+    world = walled_world()
+    agent = h.HIDA(color_preference={'red': 1.0}, store=h.InMemoryStore(), events=h.NullSink(),
+                   rng=rng, planner=planner)
+    agent.l1.position = [2, 2]
+    agent.l1.direction = 'S'
+    agent.l4.found_objects[(2, 5)] = {'name': 'ball', 'color': 'red'}
+    agent.l4.found_objects[(7, 2)] = {'name': 'goal', 'color': None}
+    for x in range(10):
+        for y in range(10):
+            agent.l4.internal_map[(x, y)] = world.get_cell(x, y)
+    for step in range(1, MAX_STEPS + 1):
+        r = agent.step(world, verbose=False)
+        if r['goal_reached'] or agent.l1.energy <= 0:
+            break
+    return r['goal_reached'], step, 1.0 - agent.l1.energy
+
+
+def check_walled() -> bool:
+    planner = h.PathPlanner()
+    greedy = [run_walled(s, None) for s in range(N_SEEDS)]
+    planned = [run_walled(s, planner) for s in range(N_SEEDS)]
+    ok = True
+    for label, res in (("貪欲（従来）", greedy), ("距離場", planned)):
+        print(f"    {label:<8}: ゴール {sum(r[0] for r in res)}/{N_SEEDS}, "
+              f"平均 {sum(r[1] for r in res) / N_SEEDS:.1f}ステップ, "
+              f"消費エネルギー {sum(r[2] for r in res) / N_SEEDS:.3f}")
+    ok &= check("貪欲は壁の前で止まり、距離場は回り込んで全員ゴールに着く",
+                not any(r[0] for r in greedy) and all(r[0] for r in planned))
+    ok &= check(f"{N_SEEDS}体で距離場を共有（作成 {planner.misses}回, 再利用 {planner.hits}回）",
+                planner.misses == 2)
+    return ok
+
+
+def run_open(seed: int, planner) -> tuple:
+    """test_entrainment_ablation.py と同じシナリオ（危険ゾーンに囲まれた赤ボール）"""
+    agent, world = make_scalar(random.Random(seed), h.L5Consciousness.ENTRAIN_K, planner)
+    agent.l1.energy = 1.0
+    danger = 0
+    for step in range(1, MAX_STEPS + 1):
+        r = agent.step(world, verbose=False)
+        danger += world.get_cell(*agent.l1.position) == 'danger'
+        if r['goal_reached'] or agent.l1.energy <= 0:
+            break
+    return r['goal_reached'], step, 1.0 - agent.l1.energy, danger
+
+
+def check_open() -> bool:
+    planner = h.PathPlanner()
+    greedy = [run_open(s, None) for s in range(N_SEEDS)]
+    planned = [run_open(s, planner) for s in range(N_SEEDS)]
+    for label, res in (("貪欲（従来）", greedy), ("距離場", planned)):
+        print(f"    {label:<8}: ゴール {sum(r[0] for r in res)}/{N_SEEDS}, "
+              f"平均 {sum(r[1] for r in res) / N_SEEDS:.1f}ステップ, "
+              f"消費エネルギー {sum(r[2] for r in res) / N_SEEDS:.3f}, "
+              f"危険ゾーン滞在 {sum(r[3] for r in res)}")
+    return check("危険ゾーンを避けて消費エネルギーが減る",
+                 all(r[0] for r in planned)
+                 and sum(r[2] for r in planned) < sum(r[2] for r in greedy)
+                 and sum(r[3] for r in planned) < sum(r[3] for r in greedy))
+
+
+def check_invalidation() -> bool:
+    planner = h.PathPlanner()
+    m = h.VersionedMap({(x, 0): 'empty' for x in range(5)})
+    other = h.VersionedMap({(x, 0): 'empty' for x in range(5)})
+    planner.distance_field(m, (0, 0))
+    planner.distance_field(other, (0, 0))
+    shared = planner.misses == 1
+    m[(2, 0)] = 'empty'                # 値が変わらない上書き
+    planner.distance_field(m, (0, 0))
+    unchanged = planner.misses == 1
+    m[(2, 0)] = 'wall'
+    field = planner.distance_field(m, (0, 0))
+    rebuilt = planner.misses == 2 and (4, 0) not in field
+    m[(2, 0)] = 'empty'                # 元に戻せば元の距離場を再利用
+    planner.distance_field(m, (0, 0))
+    ok = check("同じ内容の別のマップで共有", shared)
+    ok &= check("同じ値の上書きでは作り直さない", unchanged)
+    ok &= check("マップが変わると作り直す", rebuilt)
+    ok &= check("元の内容に戻ると再利用", planner.misses == 2)
+    return ok
+
+
+def check_population() -> bool:
+    seeds = list(range(N_SEEDS))
+    k = h.L5Consciousness.ENTRAIN_K
+    pop = population_traces(seeds, k, planner=h.PathPlanner())
+    planner = h.PathPlanner()
+    ok = all(scalar_trace(s, k, planner) == pop[s] for s in seeds)
+    return check("集団エンジン（PathPlanner共有） = スカラー版", ok)
+
+
+def main():
+    print("=" * 64)
+    print("距離場による経路計画（PathPlanner）検証")
+    print(f"  シード数: {N_SEEDS}, 最大ステップ: {MAX_STEPS}")
+    print("=" * 64)
+
+    print("\n[距離場]")
+    ok = check_field()
+    print("\n[壁のあるワールド]")
+    ok &= check_walled()
+    print("\n[テストワールド（壁なし、危険ゾーンあり）]")
+    ok &= check_open()
+    print("\n[キャッシュ]")
+    ok &= check_invalidation()
+    print("\n[集団エンジン]")
+    ok &= check_population()
+
+    print("\n判定:", "PASS" if ok else "FAIL")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+test_population_equivalence.py
+集団エンジン（hida_population.py）とスカラー版HIDAの一致検証
+
+目的:
+  HIDAPopulation の一括ステップが、HIDA.step(verbose=False) を1体ずつ
+  実行した場合と同じ結果を返すことを確認する。
+
+方法:
+  test_entrainment_ablation.py と同じシナリオ・同じシード群・同じ
+  ENTRAIN_K 条件で、スカラー版を1体ずつ、集団エンジンを全シード一括で走らせ、
+  各ステップの出力（行動・位置・エネルギー・意識状態・sync系の観測量・
+  各層の活動量・クオリア）を比較する。浮動小数点も含めて完全一致を要求する。
+  あわせて、エージェントごとの乱数源（HIDA(rng=...)）について
+  - 全シードのエージェントを1ステップずつ交互に進めても、1体ずつ走らせた
+    場合と同じになること（他のエージェントの乱数消費に影響されない）
+  - spawn_rng() でルートシードから作った乱数源を集団エンジンに渡しても
+    スカラー版と一致すること
+  を確認する。終了時の記憶（内部マップ・発見物・訪問記録・予測誤差）も
+  挿入順まで比較し、最後に1000体でのスループット（シード/秒）を測る。
+
+実行: python3 test_population_equivalence.py
+依存: NumPy
+"""
+
+import random
+import sys
+import time
+
+import hida_unified_v2 as h
+from hida_population import HIDAPopulation, LAYERS, QUALIA_KEYS
+from test_entrainment_ablation import N_SEEDS, MAX_STEPS
+
+
+COLOR_PREF = {'red': 1.0, 'blue': 0.3, 'green': 0.3}
+
+
+def give_initial_knowledge(found_objects, internal_map, world):
+    """run_test()と同じ初期知識を与える"""
+    found_objects[(6, 3)] = {'name': 'ball', 'color': 'red'}
+    found_objects[(2, 4)] = {'name': 'ball', 'color': 'blue'}
+    found_objects[(2, 7)] = {'name': 'ball', 'color': 'green'}
+    found_objects[(4, 6)] = {'name': 'ball', 'color': 'yellow', 'rotten': True}
+    found_objects[(7, 7)] = {'name': 'goal', 'color': None}
+    for x in range(1, 9):
+        for y in range(1, 9):
+            if world.get_cell(x, y) == 'danger':
+                internal_map[(x, y)] = 'danger'
+            else:
+                internal_map[(x, y)] = 'empty'
+
+
+def make_scalar(rng: random.Random, entrain_k: float, planner=None):
+    """スカラー版のエージェントとWorld（乱数源rngを両者で共有）"""
+    world = h.create_test_world(rng)
+    agent = h.HIDA(color_preference=dict(COLOR_PREF), store=h.InMemoryStore(),
+                   events=h.NullSink(), rng=rng, planner=planner)
+    agent.l1.position = [3, 6]
+    agent.l1.direction = 'N'
+    agent.l5.ENTRAIN_K = entrain_k
+    give_initial_knowledge(agent.l4.found_objects, agent.l4.internal_map, world)
+    return agent, world
+
+
+def scalar_step(agent, world):
+    """1ステップ進めて (比較用の出力, 終了したか) を返す"""
+    r = agent.step(world, verbose=False)
+    row = (
+        r['action'], tuple(r['position']), r['energy'], r['holding'],
+        r['conscious'], r['sync_score'], r['sync_type'],
+        r['leader_strength'], r['sync_coherence'], r['goal_reached'],
+        tuple(agent.l5.last_activities[k] for k in LAYERS),
+        tuple(agent.l2.qualia[k] for k in QUALIA_KEYS),
+    )
+    return row, r['goal_reached'] or agent.l1.energy <= 0
+
+
+def run_scalar(seed, entrain_k: float, planner=None):
+    """スカラー版: 1シード分を走らせて (エージェント, ステップ出力列) を返す"""
+    rng = seed if isinstance(seed, random.Random) else random.Random(seed)
+    agent, world = make_scalar(rng, entrain_k, planner)
+    trace = []
+    for _ in range(MAX_STEPS):
+        row, done = scalar_step(agent, world)
+        trace.append(row)
+        if done:
+            break
+    return agent, trace
+
+
+def scalar_trace(seed, entrain_k: float, planner=None) -> list:
+    """スカラー版: 1シード分のステップ出力列（seedは整数またはrandom.Random）"""
+    return run_scalar(seed, entrain_k, planner)[1]
+
+
+def interleaved_traces(seeds, entrain_k: float) -> list:
+    """スカラー版: 全シードのエージェントを1ステップずつ交互に進める"""
+    runs = [make_scalar(random.Random(s), entrain_k) for s in seeds]
+    traces = [[] for _ in seeds]
+    active = set(range(len(seeds)))
+    for _ in range(MAX_STEPS):
+        for i in sorted(active):
+            row, done = scalar_step(*runs[i])
+            traces[i].append(row)
+            if done:
+                active.discard(i)
+    return traces
+
+
+def make_population(seeds, entrain_k: float, rngs=None, planner=None) -> HIDAPopulation:
+    """集団エンジン（run_test()と同じ初期状態）"""
+    worlds = [h.create_test_world() for _ in seeds]
+    pop = HIDAPopulation(worlds, color_preferences=COLOR_PREF, seeds=seeds,
+                         entrain_k=entrain_k, rngs=rngs, planner=planner)
+    pop.position[:] = (3, 6)
+    for i, world in enumerate(worlds):
+        give_initial_knowledge(pop.found_objects[i], pop.internal_maps[i], world)
+    return pop
+
+
+def run_population(seeds, entrain_k: float, rngs=None, planner=None):
+    """集団エンジン: 全シード一括で走らせて (集団, ステップ出力列) を返す"""
+    pop = make_population(seeds, entrain_k, rngs, planner)
+    traces = [[] for _ in seeds]
+    for _ in range(MAX_STEPS):
+        if not pop.active.any():
+            break
+        r = pop.step()
+        for i in range(len(seeds)):
+            if not r['active'][i]:
+                continue
+            st = int(r['sync_type'][i])
+            traces[i].append((
+                r['action'][i], tuple(r['position'][i].tolist()), float(r['energy'][i]),
+                r['holding'][i], bool(r['conscious'][i]), float(r['sync_score'][i]),
+                LAYERS[st] if st >= 0 else None,
+                float(r['leader_strength'][i]), float(r['sync_coherence'][i]),
+                bool(r['goal_reached'][i]),
+                tuple(pop.last_activities[i].tolist()),
+                tuple(pop.qualia[i].tolist()),
+            ))
+    return pop, traces
+
+
+def population_traces(seeds, entrain_k: float, rngs=None, planner=None) -> list:
+    """集団エンジン: 全シード一括のステップ出力列"""
+    return run_population(seeds, entrain_k, rngs, planner)[1]
+
+
+def check_memories(seeds, entrain_k: float) -> bool:
+    """終了時の記憶がスカラー版と挿入順まで一致するか"""
+    pop, _ = run_population(seeds, entrain_k)
+    for i, seed in enumerate(seeds):
+        agent, _ = run_scalar(seed, entrain_k)
+        l4 = agent.l4
+        if list(pop.internal_maps[i].items()) != list(l4.internal_map.items()):
+            return False
+        if list(pop.found_objects[i].items()) != list(l4.found_objects.items()):
+            return False
+        if pop.visited[i] != l4.visited or pop.errors[i] != agent.l3.errors:
+            return False
+    return True
+
+
+def check_throughput(n: int = 1000, n_scalar: int = 200, entrain_k: float = 0.5):
+    """1000体一括とスカラー版1体ずつのスループット（シード/秒）
+
+    Returns: (集団のシード/秒, スカラー版のシード/秒)
+    """
+    pop = make_population(range(n), entrain_k)
+    start = time.perf_counter()
+    pop.run(MAX_STEPS)
+    pop_rate = n / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for seed in range(n_scalar):
+        scalar_trace(seed, entrain_k)
+    return pop_rate, n_scalar / (time.perf_counter() - start)
+
+
+def main():
+    print("=" * 64)
+    print("集団エンジン ⇔ スカラー版 一致検証")
+    print(f"  シード数: {N_SEEDS}, 最大ステップ: {MAX_STEPS}")
+    print("=" * 64)
+
+    seeds = list(range(N_SEEDS))
+    all_ok = True
+    for k in (0.0, 0.5):
+        pop = population_traces(seeds, k)
+        mismatched = []
+        steps = 0
+        for seed in seeds:
+            ref = scalar_trace(seed, k)
+            steps += len(ref)
+            if ref != pop[seed]:
+                mismatched.append(seed)
+        ok = not mismatched
+        all_ok = all_ok and ok
+        print(f"  ENTRAIN_K={k}: {steps}ステップ比較 ... {'PASS' if ok else 'FAIL'}"
+              + (f"  不一致シード: {mismatched}" if mismatched else ""))
+
+    print("\n[エージェントごとの乱数源]")
+    k = h.L5Consciousness.ENTRAIN_K
+    refs = [scalar_trace(seed, k) for seed in seeds]
+    ok = interleaved_traces(seeds, k) == refs
+    all_ok = all_ok and ok
+    print(f"  {N_SEEDS}体を交互に実行 = 1体ずつ実行 ... {'PASS' if ok else 'FAIL'}")
+
+    root = 2024
+    spawned = population_traces(seeds, k, rngs=[h.spawn_rng(root, 'agent', i) for i in seeds])
+    ok = all(scalar_trace(h.spawn_rng(root, 'agent', i), k) == spawned[i] for i in seeds)
+    ok = ok and spawned != refs
+    all_ok = all_ok and ok
+    print(f"  spawn_rng(ルートシード, 'agent', i) の集団 = スカラー版 ... {'PASS' if ok else 'FAIL'}")
+
+    print("\n[終了時の記憶]")
+    ok = check_memories(seeds, k)
+    all_ok = all_ok and ok
+    print(f"  内部マップ・発見物・訪問記録・予測誤差 = スカラー版 ... {'PASS' if ok else 'FAIL'}")
+
+    print("\n[スループット]")
+    pop_rate, scalar_rate = check_throughput()
+    ok = pop_rate > 3 * scalar_rate
+    all_ok = all_ok and ok
+    print(f"  集団1000体: {pop_rate:.0f}シード/秒, スカラー版: {scalar_rate:.0f}シード/秒"
+          f"（{pop_rate / scalar_rate:.1f}倍） ... {'PASS' if ok else 'FAIL'}")
+
+    print("\n判定:", "PASS" if all_ok else "FAIL")
+    if not all_ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+test_predict_view.py
+L3の予測（内部マップをコピーしない読み取り専用ビュー）の検証
+
+目的:
+  1. L3Prediction.predict() がビューを返すようになっても、従来の
+     内部マップのコピーで予測した場合と同じ軌道・同じ予測誤差になること
+  2. ビューの中身は予測時点の内部マップと同じで、ビューを通して
+     書き換えようとすると TypeError になること（内部マップは変わらない）
+
+実行: python3 test_predict_view.py
+"""
+
+import random
+import sys
+
+import hida_unified_v2 as h
+from test_entrainment_ablation import N_SEEDS
+from test_population_equivalence import make_scalar, scalar_step
+
+
+STEPS = 30
+
+
+class CopyingPrediction(h.L3Prediction):
+    """従来の L3Prediction.predict（比較用。内部マップを丸ごとコピーする）"""
+
+    def predict(self, l4_memory):
+        self.predictions = l4_memory.internal_map.copy()
+        return self.predictions
+
+
+def check(name: str, ok: bool) -> bool:
+    print(f"  {name} ... {'PASS' if ok else 'FAIL'}")
+    return ok
+
+
+def raises(fn, error) -> bool:
+    try:
+        fn()
+    except error:
+        return True
+    return False
+
+
+def write(view):
+    view[(1, 1)] = 'wall'
+
+
+def delete(view):
+    del view[(1, 1)]
+
+
+def trajectory(seed: int, copying: bool) -> list:
+    agent, world = make_scalar(random.Random(seed), entrain_k=1.0)
+    if copying:
+        agent.l3 = CopyingPrediction()
+    rows = []
+    for _ in range(STEPS):
+        row, done = scalar_step(agent, world)
+        rows.append((row, [dict(e) for e in agent.l3.errors]))
+        if done:
+            break
+    return rows
+
+
+def check_same_as_copy() -> bool:
+    same = all(trajectory(seed, copying=False) == trajectory(seed, copying=True)
+               for seed in range(N_SEEDS))
+    return check(f"コピーで予測した場合と同じ軌道・予測誤差（{N_SEEDS}シード）", same)
+
+
+def check_read_only() -> bool:
+    agent, world = make_scalar(random.Random(0), entrain_k=1.0)
+    l4 = agent.l4
+    view = agent.l3.predict(l4)
+    ok = check("ビューの中身は予測時点の内部マップ", dict(view) == dict(l4.internal_map)
+               and agent.l3.predicted_version == l4.internal_map.version)
+    before = (dict(l4.internal_map), l4.internal_map.version)
+    ok &= check("ビューへの書き込み・削除は TypeError（更新用のメソッドはない）",
+                raises(lambda: write(view), TypeError) and raises(lambda: delete(view), TypeError)
+                and not hasattr(view, 'update') and not hasattr(view, 'pop'))
+    ok &= check("内部マップは変わらない", before == (dict(l4.internal_map), l4.internal_map.version))
+    l4.internal_map[(1, 1)] = 'wall'
+    ok &= check("内部マップを書き換えるとバージョンが進む",
+                l4.internal_map.version > agent.l3.predicted_version)
+    return ok
+
+
+def main():
+    print("=" * 64)
+    print("L3の予測（読み取り専用ビュー）の検証")
+    print(f"  {STEPS}ステップ × {N_SEEDS}シード")
+    print("=" * 64)
+
+    print("\n[従来のコピーとの一致]")
+    ok = check_same_as_copy()
+    print("\n[読み取り専用]")
+    ok &= check_read_only()
+
+    print("\n判定:", "PASS" if ok else "FAIL")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+test_profiler.py
+フェーズ別計測（HIDA.enable_profiling / StepProfiler）の検証
+
+目的:
+  1. 計測中も step() の結果（行動・位置・クオリア・L5の活動）が計測なしと同じこと
+  2. 計測中は対象のクラスが差し替わり、disable_profiling() で元のクラスに戻ること。
+     戻した後は計測されないこと
+  3. 1つの profiler を複数のHIDAで共有すると、回数が合算されること
+
+実行: python3 test_profiler.py
+"""
+
+import random
+import sys
+
+import hida_unified_v2 as h
+from test_entrainment_ablation import N_SEEDS
+from test_population_equivalence import make_scalar, scalar_step
+
+
+STEPS = 30
+
+
+def check(name: str, ok: bool) -> bool:
+    print(f"  {name} ... {'PASS' if ok else 'FAIL'}")
+    return ok
+
+
+def run(seed: int, profiler=None) -> list:
+    agent, world = make_scalar(random.Random(seed), entrain_k=1.0)
+    if profiler is not None:
+        agent.enable_profiling(profiler)
+    rows = []
+    for _ in range(STEPS):
+        row, done = scalar_step(agent, world)
+        rows.append(row)
+        if done:
+            break
+    agent.disable_profiling()
+    return rows
+
+
+def check_same_results() -> bool:
+    profiler = h.StepProfiler()
+    same = all(run(seed) == run(seed, profiler) for seed in range(N_SEEDS))
+    steps = profiler.phases['step'].count
+    ok = check(f"計測中の step() の結果は計測なしと同じ（{N_SEEDS}シード）", same)
+    ok &= check(f"{N_SEEDS}シード分の step を1つの profiler に合算（{steps}回）",
+                steps == sum(len(run(seed)) for seed in range(N_SEEDS)))
+    return ok
+
+
+def check_restore_classes() -> bool:
+    agent, world = make_scalar(random.Random(0), entrain_k=1.0)
+    targets = {id(obj): (obj, type(obj)) for _, obj, _ in agent._profile_targets()}
+    profiler = agent.enable_profiling()
+    swapped = all(type(obj) is not cls and isinstance(obj, cls) for obj, cls in targets.values())
+    agent.step(world, verbose=False)
+    counted = all(stats.count > 0 for name, stats in profiler.phases.items() if name != 'reflect')
+    returned = agent.disable_profiling()
+    restored = all(type(obj) is cls for obj, cls in targets.values())
+    before = {name: stats.count for name, stats in profiler.phases.items()}
+    agent.step(world, verbose=False)
+    after = {name: stats.count for name, stats in profiler.phases.items()}
+    ok = check("計測中は対象のクラスが計測用のサブクラスになる", swapped)
+    ok &= check("1ステップで各フェーズが計測される（reflect以外）", counted)
+    ok &= check("disable_profiling() で元のクラスに戻り、profiler を返す",
+                restored and returned is profiler and agent.profiler is None)
+    ok &= check("戻した後のステップは計測されない", before == after)
+    return ok
+
+
+def main():
+    print("=" * 64)
+    print("フェーズ別計測の検証")
+    print(f"  {STEPS}ステップ × {N_SEEDS}シード")
+    print("=" * 64)
+
+    print("\n[結果が変わらないこと]")
+    ok = check_same_results()
+    print("\n[クラスの差し替えと復元]")
+    ok &= check_restore_classes()
+
+    print("\n判定:", "PASS" if ok else "FAIL")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+test_sessions.py
+長期セッション実行（run_sessions / DeferredStore）の検証
+
+目的:
+  1. run_sessions の結果（セッションごとの指標・最後に保存された長期記憶と
+     変調値）が、毎セッション DirectoryStore に直接読み書きする従来の
+     繰り返し（loop モード相当）と一致すること
+  2. 途中保存（persist_every）・分割実行（続きから再開）でも同じこと
+  3. 保存先の読み書きの回数が減ること（時間は表示するだけで合否に使わない）
+
+実行: python3 test_sessions.py
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import hida_unified_v2 as h
+
+
+COLOR_PREF = {'red': 1.0, 'blue': 0.3, 'green': 0.3}
+N_SESSIONS = 200
+ENERGY = 0.3
+
+
+def check(name: str, ok: bool) -> bool:
+    print(f"  {name} ... {'PASS' if ok else 'FAIL'}")
+    return ok
+
+
+class CountingStore(h.DirectoryStore):
+    """読み書きの回数を counts に数える DirectoryStore"""
+
+    def __init__(self, path: str, counts: Counter):
+        super().__init__(path)
+        self.counts = counts
+
+    def load_summary(self, version):
+        self.counts['read'] += 1
+        return super().load_summary(version)
+
+    def read_records(self, start=0):
+        self.counts['read'] += 1
+        return super().read_records(start)
+
+    def load_modulation(self):
+        self.counts['read'] += 1
+        return super().load_modulation()
+
+    def append(self, seq, memory):
+        self.counts['append'] += 1
+        super().append(seq, memory)
+
+    def checkpoint(self, version, tendencies, count, background=True):
+        self.counts['checkpoint'] += 1
+        return super().checkpoint(version, tendencies, count, background)
+
+    def save_modulation(self, modulation):
+        self.counts['modulation'] += 1
+        super().save_modulation(modulation)
+
+
+def direct_sessions(path: str, n: int, seed: int, counts: Counter) -> list:
+    """従来の繰り返し: 毎セッション保存先から読み込み、イベントごとに書く"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        world = h.create_test_world(rng)
+        hida = h.HIDA(color_preference=dict(COLOR_PREF), store=CountingStore(path, counts),
+                      events=h.NullSink(), rng=rng)
+        h.prepare_test_session(hida, world, ENERGY)
+        mod = hida.l4.get_modulation()
+        for _ in range(30):
+            result = hida.step(world, verbose=False)
+            if result['goal_reached'] or hida.l1.energy <= 0:
+                break
+        hida.l4.store.flush()
+        rows.append((hida.step_count, hida.l1.energy, getattr(hida, '_last_grabbed_color', None),
+                     hida.l4._ltm_count, mod['fear_weight'], mod['safe_preference'],
+                     mod['energy_caution']))
+    return rows
+
+
+def deferred_rows(rows: list) -> list:
+    return [(r['steps'], r['energy'], r['color'], r['ltm'], r['fear_weight'],
+             r['safe_preference'], r['energy_caution']) for r in rows]
+
+
+def saved_state(path: str):
+    """保存先の内容（時刻以外の長期記憶・傾向集計・変調値）"""
+    store = h.DirectoryStore(path)
+    summary = store.load_summary(h.L4Memory.TENDENCIES_VERSION)
+    records = [{k: v for k, v in m.items() if k != 'timestamp'} for m in store.read_records(0)]
+    tendencies = h.L4Memory._build_tendencies(records)
+    with open(os.path.join(path, "hida_modulation.json"), encoding='utf-8') as f:
+        modulation = json.load(f)
+    return records, tendencies, modulation, summary is not None
+
+
+def main():
+    print("=" * 64)
+    print("長期セッション実行の検証")
+    print(f"  セッション数: {N_SESSIONS}, 初期エネルギー: {ENERGY}")
+    print("=" * 64)
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {name: os.path.join(tmp, name) for name in ('direct', 'end', 'every', 'split')}
+        for path in paths.values():
+            os.makedirs(path)
+
+        counts = {name: Counter() for name in ('direct', 'end', 'every')}
+        t0 = time.perf_counter()
+        direct = direct_sessions(paths['direct'], N_SESSIONS, seed=0, counts=counts['direct'])
+        direct_time = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        end = h.run_sessions(N_SESSIONS, COLOR_PREF, ENERGY,
+                             store=CountingStore(paths['end'], counts['end']), rng=random.Random(0))
+        end_time = time.perf_counter() - t0
+
+        every = h.run_sessions(N_SESSIONS, COLOR_PREF, ENERGY,
+                               store=CountingStore(paths['every'], counts['every']),
+                               persist_every=30, rng=random.Random(0))
+        rng = random.Random(0)
+        split = h.run_sessions(N_SESSIONS // 2, COLOR_PREF, ENERGY,
+                               store=h.DirectoryStore(paths['split']), rng=rng)
+        split += h.run_sessions(N_SESSIONS - N_SESSIONS // 2, COLOR_PREF, ENERGY,
+                                store=h.DirectoryStore(paths['split']), rng=rng)
+
+        print("\n[従来の繰り返しとの一致]")
+        ok &= check("指標が一致（最後に1回保存）", deferred_rows(end) == direct)
+        ok &= check("指標が一致（30セッションごとに保存）", deferred_rows(every) == direct)
+        ok &= check("指標が一致（2回に分けて実行）", deferred_rows(split) == direct)
+        reference = saved_state(paths['direct'])
+        for name in ('end', 'every', 'split'):
+            state = saved_state(paths[name])
+            ok &= check(f"{name}: 保存された長期記憶・傾向・変調値が一致（{len(state[0])}件）",
+                        state[:3] == reference[:3] and state[3])
+
+        print("\n[保存先の読み書き]")
+        for name, c in counts.items():
+            print(f"  {name}: 読み込み {c['read']}回, 追記 {c['append']}件, "
+                  f"チェックポイント {c['checkpoint']}回, 変調値 {c['modulation']}回")
+        print(f"  時間（参考）: 従来の繰り返し {direct_time:.2f}s, run_sessions {end_time:.2f}s")
+        n_ltm = len(saved_state(paths['end'])[0])
+        n_persist = -(-N_SESSIONS // 30)
+        ok &= check("追記は記憶1件につき1回（どのモードも同じ）",
+                    counts['direct']['append'] == counts['end']['append'] == n_ltm
+                    and counts['every']['append'] == n_ltm)
+        # 読み込みは最初の3回（集計・記憶・変調値）＋圧縮ごとの記憶の読み直しだけ
+        ok &= check("最後に1回保存: 読み込みはセッション数によらず、変調値の保存は1回",
+                    counts['end']['read'] <= 3 + counts['end']['checkpoint']
+                    and counts['end']['modulation'] == 1)
+        ok &= check(f"30セッションごと: 変調値の保存は{n_persist}回以下",
+                    counts['every']['read'] <= 3 + counts['every']['checkpoint']
+                    and counts['every']['modulation'] <= n_persist)
+        ok &= check("従来の繰り返しより読み書きが少ない",
+                    counts['end']['read'] < counts['direct']['read']
+                    and counts['end']['modulation'] < counts['direct']['modulation'])
+
+        print()
+        print(h.session_table(end, every=N_SESSIONS // 10))
+
+    print("\n判定:", "PASS" if ok else "FAIL")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+test_sweep.py
+パラメータ掃引エンジン（hida_sweep.py）の検証
+
+目的:
+  1. 掃引の目的量（時間遅れ相関）が test_entrainment_ablation.py の値と一致すること
+  2. 並列実行と逐次実行の結果が一致すること
+  3. 同じ (パラメータ, シード, コード) のセルはキャッシュから返り、再実行しないこと
+     （別のSweepインスタンス＝別プロセスでの再開でも同様）
+  4. 逐次半減で候補が絞られ、最後まで残った候補が全シードで評価されること
+  5. ランダム探索の候補は OFF_THRESHOLD < ON_THRESHOLD を保ち、
+     OFF ≥ ON の候補は拒否されること
+
+実行: python3 test_sweep.py
+"""
+
+import os
+import sys
+import tempfile
+
+import hida_sweep as sw
+import test_entrainment_ablation as ablation
+
+
+SEEDS = list(range(ablation.N_SEEDS))
+
+
+def check(name: str, ok: bool) -> bool:
+    print(f"  {name} ... {'PASS' if ok else 'FAIL'}")
+    return ok
+
+
+def main():
+    print("=" * 64)
+    print("パラメータ掃引エンジン検証")
+    print(f"  シード数: {len(SEEDS)}, 最大ステップ: {sw.MAX_STEPS}")
+    print("=" * 64)
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "sweep.sqlite3")
+        candidates = [{'ENTRAIN_K': k} for _, k in ablation.CONDITIONS]
+
+        sweep = sw.Sweep(path, workers=2)
+        rows = sweep.evaluate(candidates, SEEDS)
+        first_run = sweep.cells_run
+        sweep.close()
+
+        all_series = ablation.collect_series()
+        for (label, _), row in zip(ablation.CONDITIONS, rows):
+            pairs = [p for s in all_series[label] for p in ablation.lagged_pairs(s)]
+            events = sum(1 for s in all_series[label] for step in s if step['leader'] is not None)
+            ok &= check(f"{label.strip()}: lag_r={row['lagged_corr']:.4f} がアブレーションと一致",
+                        row['lagged_corr'] == ablation.pearson(pairs)
+                        and row['leader_events'] == events)
+
+        serial = sw.Sweep(None, workers=1)
+        ok &= check("並列（2プロセス）と逐次の結果が一致",
+                    serial.evaluate(candidates, SEEDS) == rows)
+        serial.close()
+
+        resumed = sw.Sweep(path, workers=2)
+        again = resumed.evaluate(candidates, SEEDS)
+        ok &= check(f"再開時は全セルがキャッシュから（初回{first_run}セル → 再開時{resumed.cells_run}セル）",
+                    first_run == len(candidates) * len(SEEDS) and resumed.cells_run == 0
+                    and again == rows)
+
+        final, rounds = resumed.successive_halving(sw.random_candidates(8), SEEDS[:16], eta=2,
+                                                   min_seeds=4)
+        shape = [(len(r), r[0]['n_seeds']) for r in rounds]
+        ok &= check(f"逐次半減: (候補数, シード数) = {shape}",
+                    shape == [(8, 4), (4, 8), (2, 16)]
+                    and resumed.cells_run == 8 * 4 + 4 * 4 + 2 * 8)  # 前ラウンドのシードは再利用
+        resumed.close()
+
+        print()
+        print(sw.report(final))
+
+    print()
+    candidates = sw.random_candidates(200) + sw.random_candidates(
+        200, {'OFF_THRESHOLD': sw.PARAMS['OFF_THRESHOLD'][1]}, rng_seed=1)
+    ok &= check("ランダム探索の候補は OFF_THRESHOLD < ON_THRESHOLD",
+                all(sw.complete(p)['OFF_THRESHOLD'] < sw.complete(p)['ON_THRESHOLD']
+                    for p in candidates))
+    try:
+        sw.complete({'ON_THRESHOLD': 0.06, 'OFF_THRESHOLD': 0.06})
+        rejected = False
+    except ValueError:
+        rejected = True
+    ok &= check("OFF_THRESHOLD ≥ ON_THRESHOLD の候補は拒否", rejected)
+
+    print("\n判定:", "PASS" if ok else "FAIL")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
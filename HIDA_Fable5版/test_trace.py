@@ -0,0 +1,132 @@
+"""
+test_trace.py
+列指向トレース記録（hida_trace.py）の検証
+
+目的:
+  1. TraceWriter で記録して TraceReader で読んだ値が、step() の返り値・
+     last_activities と完全に一致すること（チャンクの境界をまたいでも）
+  2. 書き込み中のトレースを、直前の flush までの行数で読めること
+  3. 列はメモリマップで開かれ、全体を読み込まないこと
+  4. 辞書のリストにためる場合よりメモリが小さいこと
+
+実行: python3 test_trace.py
+"""
+
+import os
+import random
+import sys
+import tempfile
+import tracemalloc
+from types import SimpleNamespace
+
+import numpy as np
+
+import hida_trace as tr
+from test_entrainment_ablation import N_SEEDS
+from test_population_equivalence import make_scalar
+
+
+STEPS = 60
+CHUNK = 7          # チャンクの境界を何度もまたぐように小さくする
+
+
+def check(name: str, ok: bool) -> bool:
+    print(f"  {name} ... {'PASS' if ok else 'FAIL'}")
+    return ok
+
+
+def check_roundtrip(tmp: str) -> bool:
+    ok = True
+    rows = 0
+    for seed in range(N_SEEDS):
+        agent, world = make_scalar(random.Random(seed), 0.5)
+        expected = []
+        with tr.TraceWriter(os.path.join(tmp, f"seed{seed}"), chunk_rows=CHUNK) as trace:
+            for _ in range(STEPS):
+                r = agent.step(world, verbose=False)
+                trace.record(agent, r)
+                expected.append((r, dict(agent.l5.last_activities)))
+        reader = tr.TraceReader(os.path.join(tmp, f"seed{seed}"))
+        for i, (r, acts) in enumerate(expected):
+            got = reader.row(i)
+            ok &= got['activities'] == acts and all(got[k] == r[k] for k in got if k != 'activities')
+        ok &= len(reader) == STEPS and reader.actions() == [r['action'] for r, _ in expected]
+        rows += len(reader)
+    return check(f"記録した値 = step()の返り値（{N_SEEDS}シード, {rows}行, チャンク{CHUNK}行）", ok)
+
+
+def check_partial_and_lazy(tmp: str) -> bool:
+    path = os.path.join(tmp, "partial")
+    agent, world = make_scalar(random.Random(0), 0.5)
+    trace = tr.TraceWriter(path, chunk_rows=CHUNK)
+    for _ in range(2 * CHUNK + 3):
+        trace.record(agent, agent.step(world, verbose=False))
+    reader = tr.TraceReader(path)
+    energy = reader['energy']
+    ok = check(f"書き込み中は flush 済みの行だけ読める（{len(reader)}/{len(trace)}行）",
+               len(reader) == 2 * CHUNK and len(energy) == 2 * CHUNK)
+    ok &= check("列はメモリマップで開かれる",
+                isinstance(energy.base, np.memmap) or isinstance(energy, np.memmap))
+    trace.close()
+    reader = tr.TraceReader(path)
+    ok &= check("close 後は全行を読める",
+                len(reader) == 2 * CHUNK + 3
+                and reader['step'].tolist() == list(range(1, 2 * CHUNK + 4))
+                and np.load(os.path.join(path, "step.npy")).shape == (2 * CHUNK + 3,))
+    return ok
+
+
+def check_memory(tmp: str) -> bool:
+    """同じ結果を辞書のリストにためた場合と、TraceWriter の場合の確保量を比べる"""
+    agent, world = make_scalar(random.Random(1), 0.5)
+    results = []
+    for _ in range(500):
+        r = agent.step(world, verbose=False)
+        results.append((r, dict(agent.l5.last_activities)))
+    n = 50 * len(results)
+
+    tracemalloc.start()
+    series = []
+    for k in range(n):
+        r, acts = results[k % len(results)]
+        series.append(dict(r, position=list(r['position']), activities=dict(acts)))
+    list_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del series
+
+    # record() が参照するのは l5.last_activities だけ
+    stub = SimpleNamespace(l5=SimpleNamespace(last_activities=None))
+    tracemalloc.start()
+    with tr.TraceWriter(os.path.join(tmp, "memory"), chunk_rows=4096) as trace:
+        for k in range(n):
+            r, stub.l5.last_activities = results[k % len(results)]
+            trace.record(stub, r)
+        trace_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    disk = sum(os.path.getsize(os.path.join(tmp, "memory", f"{name}.npy")) for name in tr.FIELDS)
+    print(f"  {n}ステップ: 辞書のリスト {list_bytes / n:.0f}バイト/行, "
+          f"TraceWriter（ピーク） {trace_bytes / 1024:.0f}KiB, ファイル {disk / n:.0f}バイト/行")
+    return check("TraceWriter のメモリは辞書のリストの1/10未満", trace_bytes * 10 < list_bytes)
+
+
+def main():
+    print("=" * 64)
+    print("列指向トレース記録の検証")
+    print(f"  列: {', '.join(tr.FIELDS)}")
+    print("=" * 64)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print("\n[往復]")
+        ok = check_roundtrip(tmp)
+        print("\n[書き込み中の読み出し・遅延読み出し]")
+        ok &= check_partial_and_lazy(tmp)
+        print("\n[メモリ]")
+        ok &= check_memory(tmp)
+
+    print("\n判定:", "PASS" if ok else "FAIL")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
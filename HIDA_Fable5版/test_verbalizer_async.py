@@ -0,0 +1,147 @@
+"""
+test_verbalizer_async.py
+言語化パイプライン（非同期キュー＋キャッシュ）の検証
+
+目的:
+  1. LLMVerbalizer.submit() が応答を待たずにFutureを返すこと
+     （スタブの応答を止めたまま、未完了のFutureと pending() で確かめる）
+  2. 同じプロンプトになる内部状態（プロンプトに書く値を量子化したもの）では
+     キャッシュが使われ、LLMを再度呼ばないこと。プロンプトに出ない値（位置など）は
+     キーに影響せず、プロンプトに出る値（行動の内部計算・変調値）は影響すること
+  3. 応答しないLLMがつながっていても、HIDA.step(verbose=True) が止まらないこと
+
+時間は表示するだけで、合否はFutureの状態・キャッシュの当たり・LLMの要求数で決める。
+
+方法:
+  llm_stub_server.py のスタブサーバー（応答を遅延させる）をLLMの代わりに使う。
+  ネットワークもAPIキーも不要。
+
+実行: python3 test_verbalizer_async.py
+"""
+
+import sys
+import time
+import random
+
+import hida_unified_v2 as h
+from llm_stub_server import StubLLMServer
+
+
+STUB_DELAY = 0.5
+MAX_STEPS = 30
+SEED = 3   # このシナリオで意識ONの言語化ステップが2回ある
+
+
+def check(name: str, ok: bool) -> bool:
+    print(f"  {name} ... {'PASS' if ok else 'FAIL'}")
+    return ok
+
+
+def check_submit_and_cache(stub) -> bool:
+    llm = h.LLMVerbalizer(endpoint=stub.url, use_ollama=False)
+    pkg = {'body': {'energy': 0.72, 'position': [3, 6]}, 'qualia': {'fear': 0.31}}
+    key = h.LLMVerbalizer.cache_key(pkg, "go_to_red")
+
+    stub.hold()
+    t0 = time.perf_counter()
+    future = llm.submit("【今の行動】\ngo_to_red", key)
+    submit_time = time.perf_counter() - t0
+    waiting = not future.done() and llm.pending() == 1
+    stub.release()
+    text, llm_type = future.result(timeout=10)
+
+    t0 = time.perf_counter()
+    again = llm.submit("【今の行動】\ngo_to_red", key)
+    cached_done = again.done()
+    cached = again.result()
+    cache_time = time.perf_counter() - t0
+
+    # 量子化: 刻みより十分小さい差は同じ状態、大きい差は別の状態
+    near = {'body': {'energy': 0.7201, 'position': [3, 6]}, 'qualia': {'fear': 0.3099}}
+    far = {'body': {'energy': 0.45, 'position': [3, 6]}, 'qualia': {'fear': 0.31}}
+    # プロンプトに出ない値（位置）・刻みの中の探索した場所の数だけが違う
+    moved = {'body': {'energy': 0.72, 'position': [5, 2]}, 'qualia': {'fear': 0.31},
+             'memory': {'objects_found': [], 'visited_count': 3}}
+    scores = {'red': 7.5, 'blue': 1.2}
+    key_of = h.LLMVerbalizer.cache_key
+
+    ok = True
+    ok &= check(f"submit()は待たずに返る（{submit_time * 1000:.1f}ms, 未完了・pending()=1）", waiting)
+    ok &= check("スタブの応答が返る", llm_type == "claude" and "go_to_red" in text
+                and llm.pending() == 0)
+    ok &= check(f"同じ状態はキャッシュから即時に返る（{cache_time * 1000:.1f}ms）",
+                cached_done and cached == (text, llm_type) and stub.request_count == 1)
+    ok &= check("微小な差は同じキー", h.LLMVerbalizer.cache_key(near, "go_to_red") == key)
+    ok &= check("大きな差・別の行動は別のキー",
+                key_of(far, "go_to_red") != key and key_of(pkg, "go_to_blue") != key)
+    ok &= check("プロンプトに出ない値（位置）は同じキー", key_of(moved, "go_to_red") == key)
+    ok &= check("行動の内部計算（scores）はキーに入る",
+                key_of(pkg, "go_to_red", scores) != key
+                and key_of(pkg, "go_to_red", scores) == key_of(pkg, "go_to_red", {'red': 7.51, 'blue': 1.2})
+                and key_of(pkg, "go_to_red", scores) != key_of(pkg, "go_to_red", {'red': 5.0, 'blue': 1.2}))
+    ok &= check("変調値はキーに入る",
+                key_of(pkg, "go_to_red", None, {'fear_weight': 1.0}) == key
+                and key_of(pkg, "go_to_red", None, {'fear_weight': 1.6}) != key
+                and key_of(pkg, "go_to_red", None, {'experience_count': 4}) != key)
+    return ok
+
+
+def check_step_does_not_block(stub) -> bool:
+    rng = random.Random(SEED)
+    world = h.create_test_world(rng)
+    agent = h.HIDA(color_preference={'red': 1.0, 'blue': 0.3, 'green': 0.3},
+                   store=h.InMemoryStore(), events=h.NullSink(), rng=rng)
+    agent.llm = h.LLMVerbalizer(endpoint=stub.url, use_ollama=False)
+    agent.l1.position = [3, 6]
+    agent.l1.direction = 'N'
+    # run_test()と同じ初期知識
+    agent.l4.found_objects[(6, 3)] = {'name': 'ball', 'color': 'red'}
+    agent.l4.found_objects[(2, 4)] = {'name': 'ball', 'color': 'blue'}
+    agent.l4.found_objects[(2, 7)] = {'name': 'ball', 'color': 'green'}
+    agent.l4.found_objects[(7, 7)] = {'name': 'goal', 'color': None}
+    for x in range(1, 9):
+        for y in range(1, 9):
+            agent.l4.internal_map[(x, y)] = 'danger' if world.get_cell(x, y) == 'danger' else 'empty'
+
+    before = stub.request_count
+    slowest = 0.0
+    stub.hold()
+    for _ in range(MAX_STEPS):
+        t0 = time.perf_counter()
+        r = agent.step(world, verbose=True)
+        slowest = max(slowest, time.perf_counter() - t0)
+        if r['goal_reached'] or agent.l1.energy <= 0:
+            break
+    waiting = [future for _, future in agent._pending_reflections if not future.done()]
+    stub.release()
+    remaining = agent.flush_reflections(timeout=10)
+    requested = stub.request_count - before
+
+    ok = True
+    print(f"  {agent.step_count}ステップ, LLM要求 {requested}件, 最後に回収 {len(remaining)}件")
+    ok &= check("言語化が発生している", requested > 0)
+    ok &= check(f"step()は応答を待たない（応答を止めたまま終わる。最長{slowest * 1000:.1f}ms）",
+                len(waiting) > 0)
+    ok &= check("言語化待ちがすべて回収される", not agent._pending_reflections)
+    return ok
+
+
+def main():
+    print("=" * 64)
+    print("言語化パイプライン（非同期キュー＋キャッシュ）検証")
+    print(f"  スタブLLMの応答遅延: {STUB_DELAY}s")
+    print("=" * 64)
+
+    with StubLLMServer(delay=STUB_DELAY) as stub:
+        print("\n[LLMVerbalizer.submit / キャッシュ]")
+        ok = check_submit_and_cache(stub)
+        print("\n[HIDA.step(verbose=True)]")
+        ok &= check_step_does_not_block(stub)
+
+    print("\n判定:", "PASS" if ok else "FAIL")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
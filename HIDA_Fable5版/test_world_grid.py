@@ -0,0 +1,144 @@
+"""
+test_world_grid.py
+Worldの地形表現（1マス1バイトのセル符号）の検証
+
+目的:
+  1. look_window() が盤面の内側・端・外側のどこでも get_cell() と同じ値を返すこと
+  2. path を渡したWorldの地形がファイルにメモリマップされ、開き直しても残ること。
+     大きさの違うファイルは拒否され（中身は変わらない）、close() で閉じられること
+  3. 大きな盤面（4096×4096）でも地形のメモリが1マス1バイトで済むこと。
+     盤の中央での視野が小さな盤と同じであること（look() の時間は表示するだけ）
+
+実行: python3 test_world_grid.py
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import hida_unified_v2 as h
+
+
+BIG = 4096
+
+
+def check(name: str, ok: bool) -> bool:
+    print(f"  {name} ... {'PASS' if ok else 'FAIL'}")
+    return ok
+
+
+def window_matches(world: h.World, x: int, y: int, r: int) -> bool:
+    win = world.look_window(x, y, r)
+    w = 2 * r + 1
+    return len(win) == w * w and all(
+        h.CELL_TYPES[win[(dy + r) * w + dx + r]] == world.get_cell(x + dx, y + dy)
+        for dx in range(-r, r + 1) for dy in range(-r, r + 1))
+
+
+def check_look_window() -> bool:
+    world = h.create_test_world()
+    rng = random.Random(0)
+    points = [(x, y) for x in range(-2, 12) for y in range(-2, 12)]
+    ok = all(window_matches(world, x, y, r) for x, y in points for r in (0, 1, 2, 4))
+    ok &= check(f"look_window = get_cell（{len(points)}地点 × r=0,1,2,4、盤外を含む）", ok)
+
+    world = h.World(size=37)
+    for _ in range(300):
+        (world.add_wall if rng.random() < 0.5 else world.add_danger)(rng.randrange(37), rng.randrange(37))
+    ok &= check("ランダム地形でも一致",
+                all(window_matches(world, rng.randrange(-3, 40), rng.randrange(-3, 40), rng.randrange(5))
+                    for _ in range(500)))
+    return ok
+
+
+def check_memmap() -> bool:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "terrain.bin")
+        world = h.World(size=64, path=path)
+        world.add_wall(3, 5)
+        world.add_danger(63, 63)
+        world.flush()
+        size_on_disk = os.path.getsize(path)
+        world.close()
+        world.close()
+
+        reopened = h.World(size=64, path=path)
+        ok = check(f"ファイルの大きさ = 1マス1バイト（{size_on_disk}バイト）", size_on_disk == 64 * 64)
+        ok &= check("開き直しても地形が残る",
+                    reopened.get_cell(3, 5) == 'wall' and reopened.get_cell(63, 63) == 'danger'
+                    and reopened.get_cell(4, 5) == 'empty')
+        reopened.close()
+
+        refused = []
+        for size in (32, 128):
+            try:
+                h.World(size=size, path=path).close()
+            except ValueError:
+                refused.append(size)
+        with open(path, 'rb') as f:
+            data = f.read()
+        ok &= check("大きさの違うファイルは拒否し、切り詰めも継ぎ足しもしない",
+                    refused == [32, 128] and len(data) == 64 * 64 and data[5 * 64 + 3] == h.CELL_WALL)
+        ok &= check("close() 後は地形を読めない（閉じている）", reopened.cells.closed)
+    return ok
+
+
+def check_big_world() -> bool:
+    tracemalloc.start()
+    world = h.World(size=BIG)
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    for i in range(BIG):
+        world.add_wall(i, 0)
+        world.add_wall(0, i)
+
+    body = h.L1Body()
+    body.direction = 'E'
+    times = []
+    for pos in ([1, 1], [BIG // 2, BIG // 2], [BIG - 6, BIG - 2]):
+        body.position = pos
+        t0 = time.perf_counter()
+        for _ in range(1000):
+            body.look(world)
+        times.append((time.perf_counter() - t0) / 1000 * 1e6)
+
+    ok = check(f"{BIG}×{BIG}の地形メモリ {used / 2 ** 20:.1f}MiB（1マス1バイト）",
+               used < BIG * BIG * 1.01)
+    body.position = [BIG - 1, BIG - 1]
+    visible = body.look(world)
+    ok &= check("盤の隅での視野: 盤外は壁、前方は盤外で止まる",
+                visible[(BIG, BIG - 1)]['cell'] == 'wall' and visible[(BIG - 2, BIG - 2)]['cell'] == 'empty'
+                and (BIG + 1, BIG - 1) not in visible)
+    small = h.World(size=32)
+    body.position = [16, 16]
+    near = {(x - 16, y - 16): v for (x, y), v in body.look(small).items()}
+    body.position = [BIG // 2, BIG // 2]
+    far = {(x - BIG // 2, y - BIG // 2): v for (x, y), v in body.look(world).items()}
+    ok &= check("盤の中央での視野は32×32の盤と同じ", near == far)
+    print(f"  look() 1回あたり: " + ", ".join(f"{t:.1f}µs" for t in times)
+          + "（盤端・中央・盤端。参考値）")
+    return ok
+
+
+def main():
+    print("=" * 64)
+    print("Worldの地形表現（セル符号・メモリマップ）検証")
+    print("=" * 64)
+
+    print("\n[look_window]")
+    ok = check_look_window()
+    print("\n[メモリマップ]")
+    ok &= check_memmap()
+    print(f"\n[{BIG}×{BIG}]")
+    ok &= check_big_world()
+
+    print("\n判定:", "PASS" if ok else "FAIL")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+cellmap.py
+内部マップ - 変更履歴つきの辞書（位置 → マスの種類）
+
+HIDAの internal_map は毎ステップ4方向ぶん書き込まれるが、実際に値が
+変わるマスは少ない。CellMap は値が変わったマスだけを履歴に残すので、
+経路探索（pathfinder.py）などは「前回から変わったマス」だけを見て
+結果を直せる。
+
+また、探索の境界（frontier: 未知のマスに隣接する既知の空きマス）を
+書き込みのたびに更新して持つ。変わったマスとその4近傍だけを見直すので、
+「まだ行ける未知があるか」は集合が空かどうかで分かる。
+
+SnapshotDict（roommemory.py）なので、LTMへの保存はコピーせずにできる。
+"""
+
+from roommemory import SnapshotDict
+
+NEIGHBORS = [(0, -1), (0, 1), (-1, 0), (1, 0)]
+
+
+class CellMap(SnapshotDict):
+    """値が変わったマスを記録する dict
+
+    version は変更の通し番号。changed_since(v) で v 以降に変わったマスを得る。
+    履歴は MAX_LOG 件を超えると古い半分を捨てる（捨てた範囲を聞かれたらNone）。
+    frontier は未知のマスに隣接する 'empty' のマスの集合。
+    """
+
+    MAX_LOG = 4096
+    _MISSING = object()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._log = []      # 変わったマス（古い順）
+        self._base = 0      # _log[0] の通し番号
+        self.frontier = {pos for pos in self if self._on_frontier(pos)}
+
+    @property
+    def version(self):
+        return self._base + len(self._log)
+
+    def changed_since(self, version):
+        """version 以降に値が変わったマスのリスト（履歴が足りなければNone）"""
+        if version < self._base:
+            return None
+        return self._log[version - self._base:]
+
+    def _on_frontier(self, pos):
+        if dict.get(self, pos) != 'empty':
+            return False
+        x, y = pos
+        for dx, dy in NEIGHBORS:
+            if (x + dx, y + dy) not in self:
+                return True
+        return False
+
+    def _changed(self, pos):
+        """pos が書き換わった後に呼ぶ（履歴と境界の更新）"""
+        self._log.append(pos)
+        if len(self._log) > self.MAX_LOG:
+            half = len(self._log) // 2
+            del self._log[:half]
+            self._base += half
+        x, y = pos
+        for p in [pos] + [(x + dx, y + dy) for dx, dy in NEIGHBORS]:
+            if self._on_frontier(p):
+                self.frontier.add(p)
+            else:
+                self.frontier.discard(p)
+
+    def __setitem__(self, pos, cell):
+        if dict.get(self, pos, self._MISSING) != cell:
+            super().__setitem__(pos, cell)
+            self._changed(pos)
+
+    def __delitem__(self, pos):
+        super().__delitem__(pos)
+        self._changed(pos)
+
+    def pop(self, pos, *default):
+        known = pos in self
+        cell = super().pop(pos, *default)
+        if known:
+            self._changed(pos)
+        return cell
+
+    def popitem(self):
+        pos, cell = super().popitem()
+        self._changed(pos)
+        return pos, cell
+
+    def clear(self):
+        cells = list(self)
+        super().clear()
+        for pos in cells:
+            self._changed(pos)
@@ -4,8 +4,12 @@ HIDA - 内部世界モデルを持つエージェント（LTM/STM付き + L2ク
 """
 
 import random
+from cellmap import CellMap
 from narrator import narrate
+from objectmap import ObjectMap
+from pathfinder import PathFinder
 from qualia import QualiaLayer
+from roommemory import RoomMemory
 
 class Hida:
     def __init__(self, start_pos=None):
@@ -14,7 +18,8 @@ class Hida:
         
         # LTM: 長期記憶（全部屋の記憶）
         # {'A': {'map': {...}, 'objects': {...}}, 'B': {...}, ...}
-        self.ltm = {}
+        # 保存・読み込みはコピーせず、STMと中身を共有する（roommemory.py）
+        self.ltm = RoomMemory()
         
         # STM: 短期記憶（今の部屋の記憶）= internal_map
         self.internal_map = {}
@@ -37,6 +42,29 @@ class Hida:
         
         # 直前の予測誤差（L2更新用）
         self.last_errors = []
+        
+        # 経路探索（探索木を次の問い合わせまで再利用する）
+        self.pathfinder = PathFinder()
+    
+    @property
+    def internal_map(self):
+        """STM: 今の部屋の内部マップ（位置 → マスの種類）"""
+        return self._internal_map
+    
+    @internal_map.setter
+    def internal_map(self, cells):
+        # 変更を追えるように CellMap にする（ふつうの dict を代入してもよい）
+        self._internal_map = cells if isinstance(cells, CellMap) else CellMap(cells)
+    
+    @property
+    def found_objects(self):
+        """STM: 見つけたオブジェクト（位置 → オブジェクト情報）"""
+        return self._found_objects
+    
+    @found_objects.setter
+    def found_objects(self, objects):
+        # 発見・消失のたびに数える ObjectMap にする（LTMにもコピーせず保存できる）
+        self._found_objects = objects if isinstance(objects, ObjectMap) else ObjectMap(objects)
     
     # === LTM/STM管理 ===
     
@@ -54,9 +82,8 @@ class Hida:
         
         # LTMから読み込み
         if room_id in self.ltm:
-            memory = self.ltm[room_id]
-            self.internal_map = memory['map'].copy()
-            self.found_objects = memory['objects'].copy()
+            # 保存したときの中身のまま戻す（コピーしない）
+            self.internal_map, self.found_objects = self.ltm.load(room_id)
             print(f"  💭 「部屋{room_id}...覚えてる」")
             print(f"     記憶: {len(self.internal_map)}マス")
         else:
@@ -72,10 +99,7 @@ class Hida:
     def _save_to_ltm(self):
         """STMをLTMに保存"""
         if self.current_room:
-            self.ltm[self.current_room] = {
-                'map': self.internal_map.copy(),
-                'objects': self.found_objects.copy()
-            }
+            self.ltm.save(self.current_room, self.internal_map, self.found_objects)
             print(f"  💾 部屋{self.current_room}の記憶を保存（{len(self.internal_map)}マス）")
     
     def leave_room(self):
@@ -85,11 +109,7 @@ class Hida:
     
     def total_memory(self):
         """全記憶マス数（LTM + STM）"""
-        total = len(self.internal_map)
-        for room_id, memory in self.ltm.items():
-            if room_id != self.current_room:
-                total += len(memory['map'])
-        return total
+        return len(self.internal_map) + self.ltm.total_cells(exclude=self.current_room)
     
     # === 既存の機能 ===
     
@@ -313,77 +333,24 @@ class Hida:
         return len(self.internal_map)
     
     def has_unknown_reachable(self):
-        """行ける未知の場所があるか（マップ外は除外）"""
-        dirs = ['N', 'E', 'S', 'W']
-        deltas = {'N': (0, -1), 'E': (1, 0), 'S': (0, 1), 'W': (-1, 0)}
+        """行ける未知の場所があるか（マップ外は除外）
         
-        # 既知の空きマスから、隣接する未知があるか
-        for known_pos, cell in self.internal_map.items():
-            if cell not in ['empty']:  # 壁、out、objectは除外
-                continue
-            
-            for d in dirs:
-                dx, dy = deltas[d]
-                neighbor = (known_pos[0] + dx, known_pos[1] + dy)
-                
-                # マップ外と判明してる場所は除外
-                if neighbor in self.internal_map and self.internal_map[neighbor] == 'out':
-                    continue
-                
-                # 隣が未知なら、まだ行ける場所がある
-                if neighbor not in self.internal_map:
-                    return True
-        
-        return False
+        既知の空きマスのうち、隣が未知のもの（探索の境界）があるか。
+        境界は internal_map（CellMap）が書き込みのたびに更新している。
+        """
+        return bool(self.internal_map.frontier)
+    
+    def nearest_frontier(self):
+        """いちばん近い探索の境界（隣が未知の空きマス）への経路。なければNone"""
+        return self.pathfinder.find_nearest(self.internal_map, self.pos, self.internal_map.frontier)
     
     def find_path(self, goal):
-        """内部マップだけで経路を探す（BFS）"""
-        from collections import deque
-        
-        start = tuple(self.pos)
-        goal = tuple(goal)
-        
-        if start == goal:
-            return [start]
-        
-        # ゴールがobjectの場合、ゴールの隣に到達したら成功
-        goal_is_object = self.internal_map.get(goal) == 'object'
+        """内部マップだけで経路を探す（BFS）
         
-        # BFS
-        queue = deque([(start, [start])])
-        visited = {start}
-        
-        while queue:
-            pos, path = queue.popleft()
-            
-            # 4方向
-            for dx, dy in [(0, -1), (0, 1), (1, 0), (-1, 0)]:
-                next_pos = (pos[0] + dx, pos[1] + dy)
-                
-                if next_pos in visited:
-                    continue
-                
-                # ゴール到達チェック（objectでも隣なら成功）
-                if next_pos == goal:
-                    if goal_is_object:
-                        # ゴールの隣（今のpos）まで行く
-                        return path
-                    else:
-                        return path + [next_pos]
-                
-                # 内部マップで確認
-                if next_pos not in self.internal_map:
-                    continue  # 知らない場所は行けない
-                
-                cell = self.internal_map[next_pos]
-                if cell in ['wall', 'out', 'object']:
-                    continue  # 壁、外、オブジェクトは通れない
-                # 'empty' と 'danger' は通れる
-                
-                visited.add(next_pos)
-                queue.append((next_pos, path + [next_pos]))
-        
-        return None  # 経路なし
+        ゴールがobjectの場合はゴールの隣までの経路。経路がなければNone。
+        探索木は PathFinder が持ち、マップが変わった分だけ探索し直す。
+        """
+        return self.pathfinder.find_path(self.internal_map, self.pos, goal)
     
     def show_map(self, size=None):
         """内部マップを表示（サイズは自動検出）"""
@@ -0,0 +1,64 @@
+"""
+objectmap.py
+見つけたオブジェクト - 種類ごとの数を持つ辞書（位置 → オブジェクト情報）
+
+L2（qualia.py）は「赤いボールを知っているか」「ゴールを知っているか」で
+desire を決める。従来は毎ステップ found_objects を全部見ていたが、
+ObjectMap は発見・消失（書き込み・削除）のたびに数を増減するので、
+毎ステップは数を見るだけでよい。
+
+オブジェクト情報の dict をその場で書き換えると数はずれる
+（HIDAは発見のたびに新しい dict を入れるので問題ない）。
+"""
+
+from roommemory import SnapshotDict
+
+
+class ObjectMap(SnapshotDict):
+    """赤いボールとゴールの数を数えながら持つ dict
+
+    reds: color が 'red' のオブジェクトの数
+    goals: name が 'goal' のオブジェクトの数
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reds = 0
+        self.goals = 0
+        for obj in self.values():
+            self._count(obj, 1)
+
+    def _count(self, obj, sign):
+        if obj.get('color') == 'red':
+            self.reds += sign
+        if obj.get('name') == 'goal':
+            self.goals += sign
+
+    def __setitem__(self, pos, obj):
+        old = dict.get(self, pos)
+        if old is not None:
+            self._count(old, -1)
+        super().__setitem__(pos, obj)
+        self._count(obj, 1)
+
+    def __delitem__(self, pos):
+        obj = dict.__getitem__(self, pos)
+        super().__delitem__(pos)
+        self._count(obj, -1)
+
+    def pop(self, pos, *default):
+        known = pos in self
+        obj = super().pop(pos, *default)
+        if known:
+            self._count(obj, -1)
+        return obj
+
+    def popitem(self):
+        pos, obj = super().popitem()
+        self._count(obj, -1)
+        return pos, obj
+
+    def clear(self):
+        super().clear()
+        self.reds = 0
+        self.goals = 0
@@ -0,0 +1,170 @@
+"""
+pathfinder.py
+内部マップ上の経路探索 - 親ポインタの幅優先探索 + 探索木の再利用
+
+従来の find_path は経路ごとキューに積んでいた（展開のたびに経路をコピー）。
+PathFinder は各マスの親だけを持ち、経路はゴールからたどって作る。
+
+さらに、現在地からの探索木を次の問い合わせまで残しておく:
+- 同じ現在地から別のゴールを聞かれたら、木をたどるだけ（必要なら続きを展開）
+- 内部マップが変わったら、変わったマスを最初に調べた時点まで探索を巻き戻し、
+  そこから探索し直す（それより前の探索はそのまま使える）
+- 現在地が変わったら、木を作り直す
+
+展開の順序・判定は従来の find_path と同じなので、返す経路も同じになる。
+内部マップが CellMap でなければ（変更を追えないので）毎回作り直す。
+"""
+
+from cellmap import CellMap
+
+DELTAS = [(0, -1), (0, 1), (1, 0), (-1, 0)]   # 展開の順序（従来のBFSと同じ）
+BLOCKED = ('wall', 'out', 'object')              # 通れないマス
+
+
+class PathFinder:
+    """現在地からの幅優先探索の木を保持し、ゴールへの経路を返す"""
+
+    def __init__(self):
+        self.cells = None       # 探索した内部マップ（CellMap）
+        self.version = 0        # 探索したときの cells.version
+        self.start = None
+        self.rebuilds = 0       # 木を作り直した回数
+        self.rewinds = 0        # 巻き戻した回数
+
+    def _reset(self, cells, start):
+        self.cells = cells
+        self.version = getattr(cells, 'version', 0)
+        self.start = start
+        self.order = [start]        # 発見順（= 展開順）のマス
+        self.rank = {start: 0}      # マス → order内の位置
+        self.parent = {start: None}
+        self.expanded = 0           # 展開済みの数（order[expanded:] がキュー）
+        self.discovered = []        # i番目を展開する直前の len(order)
+        self.rebuilds += 1
+
+    def _sync(self, cells, start):
+        """内部マップ・現在地の変化を木に反映する"""
+        if cells is not self.cells or start != self.start or not isinstance(cells, CellMap):
+            self._reset(cells, start)
+            return
+        if cells.version == self.version:
+            return
+        changed = cells.changed_since(self.version)
+        if changed is None:
+            self._reset(cells, start)
+            return
+        self.version = cells.version
+        # 変わったマスを最初に調べたのは、展開済みの隣のうち最も早いもの
+        first = self.expanded
+        rank = self.rank
+        for x, y in set(changed):
+            for dx, dy in DELTAS:
+                r = rank.get((x + dx, y + dy))
+                if r is not None and r < first:
+                    first = r
+        if first < self.expanded:
+            self._rewind(first)
+
+    def _rewind(self, k):
+        """k番目の展開の直前の状態に戻す"""
+        n = self.discovered[k]
+        for pos in self.order[n:]:
+            del self.rank[pos]
+            del self.parent[pos]
+        del self.order[n:]
+        del self.discovered[k:]
+        self.expanded = k
+        self.rewinds += 1
+
+    def _expand(self):
+        """キューの先頭を1つ展開する。展開したマスを返す"""
+        cells = self.cells
+        order = self.order
+        rank = self.rank
+        parent = self.parent
+        pos = order[self.expanded]
+        self.discovered.append(len(order))
+        self.expanded += 1
+        x, y = pos
+        for dx, dy in DELTAS:
+            nxt = (x + dx, y + dy)
+            if nxt in rank:
+                continue
+            if nxt not in cells or cells[nxt] in BLOCKED:
+                continue    # 知らないマス・通れないマス
+            rank[nxt] = len(order)
+            parent[nxt] = pos
+            order.append(nxt)
+        return pos
+
+    def _trace(self, pos):
+        """開始位置から pos までの経路"""
+        path = []
+        parent = self.parent
+        while pos is not None:
+            path.append(pos)
+            pos = parent[pos]
+        path.reverse()
+        return path
+
+    def find_path(self, cells, start, goal):
+        """cells 上で start から goal への経路（マスのリスト）。なければNone
+
+        goal が object なら goal の隣までの経路を返す。
+        ゴールそのものは通れなくても（未知・壁でも）隣まで行ければ到達とする
+        （従来の find_path と同じ判定）。
+        """
+        start = tuple(start)
+        goal = tuple(goal)
+        if start == goal:
+            return [start]
+        self._sync(cells, start)
+
+        # ゴールに隣接するマスのうち最初に展開されたもの（=従来のBFSが到達を判定するマス）
+        gx, gy = goal
+        rank = self.rank
+        best = None
+        for dx, dy in DELTAS:
+            r = rank.get((gx + dx, gy + dy))
+            if r is not None and r < self.expanded and (best is None or r < best):
+                best = r
+        if best is not None:
+            via = self.order[best]
+        else:
+            via = None
+            while self.expanded < len(self.order):
+                pos = self._expand()
+                if abs(pos[0] - gx) + abs(pos[1] - gy) == 1:
+                    via = pos
+                    break
+            if via is None:
+                return None
+
+        path = self._trace(via)
+        if cells.get(goal) != 'object':
+            path.append(goal)
+        return path
+
+    def find_nearest(self, cells, start, targets):
+        """targets（マスの集合）のうち、start から最も近いマスへの経路。なければNone
+
+        近さは幅優先探索の展開順（find_path と同じ順序）で決める。
+        探索の境界（CellMap.frontier）を渡せば、最寄りの未探索へ向かう経路になる。
+        """
+        if not targets:
+            return None
+        start = tuple(start)
+        self._sync(cells, start)
+        rank = self.rank
+        best = None
+        for pos in targets:
+            r = rank.get(pos)
+            if r is not None and r < self.expanded and (best is None or r < best):
+                best = r
+        if best is not None:
+            return self._trace(self.order[best])
+        while self.expanded < len(self.order):
+            pos = self._expand()
+            if pos in targets:
+                return self._trace(pos)
+        return None
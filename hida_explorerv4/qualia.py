@@ -3,6 +3,11 @@ qualia.py
 L2: クオリア層 - 予測誤差に感情的強度をつける
 """
 
+from cellmap import CellMap
+from objectmap import ObjectMap
+
+NEIGHBORS = [(0, -1), (0, 1), (-1, 0), (1, 0)]
+
 class QualiaLayer:
     def __init__(self, color_preference=None):
         # 基本クオリア（DNA初期値）
@@ -34,6 +39,9 @@ class QualiaLayer:
                 'yellow': 0.5,
                 'green': 0.5,
             }
+        
+        # 周囲のマス数のキャッシュ（内部マップと現在地が前回と同じなら使い回す）
+        self._neighbor_cache = None  # (internal_map, version, pos, 未知の数, 壁の数)
     
     def get_color_desire(self, color):
         """色に対する欲求度を返す"""
@@ -74,20 +82,19 @@ class QualiaLayer:
             print(f"  ⚠️ 危険ゾーン通過！ fear={self.qualia['fear']:.2f}")
         
         # 4. ボール/ゴール発見 → desire
-        for obj in found_objects.values():
-            if obj.get('color') == 'red':  # ボール
-                self.qualia['desire'] = max(self.qualia['desire'], 0.8)
-            if obj.get('name') == 'goal':
-                self.qualia['desire'] = max(self.qualia['desire'], 0.6)
+        has_red, has_goal = self._known_targets(found_objects)
+        if has_red:  # ボール
+            self.qualia['desire'] = max(self.qualia['desire'], 0.8)
+        if has_goal:
+            self.qualia['desire'] = max(self.qualia['desire'], 0.6)
         
         # 5. 未知マスが多い → curiosity維持
-        unknown_neighbors = self._count_unknown_neighbors(internal_map, pos)
+        unknown_neighbors, wall_neighbors = self._neighbor_counts(internal_map, pos)
         if unknown_neighbors > 0:
             self.qualia['curiosity'] += unknown_neighbors * 0.05
             self.qualia['curiosity'] = min(self.qualia['curiosity'], 1.0)
         
         # 6. 壁に囲まれてる → fear
-        wall_neighbors = self._count_wall_neighbors(internal_map, pos)
         if wall_neighbors >= 3:
             self.qualia['fear'] += 0.2
             self.qualia['fear'] = min(self.qualia['fear'], 1.0)
@@ -97,23 +104,40 @@ class QualiaLayer:
         if holding:
             self.qualia['desire'] = max(self.qualia['desire'], 0.7)
     
-    def _count_unknown_neighbors(self, internal_map, pos):
-        """周囲の未知マス数"""
-        count = 0
-        for dx, dy in [(0, -1), (0, 1), (-1, 0), (1, 0)]:
-            neighbor = (pos[0] + dx, pos[1] + dy)
-            if neighbor not in internal_map:
-                count += 1
-        return count
+    def _known_targets(self, found_objects):
+        """赤いボール・ゴールを知っているか
+        
+        ObjectMap なら発見・消失のたびに数えてあるので、数を見るだけ。
+        """
+        if isinstance(found_objects, ObjectMap):
+            return found_objects.reds > 0, found_objects.goals > 0
+        has_red = has_goal = False
+        for obj in found_objects.values():
+            has_red = has_red or obj.get('color') == 'red'
+            has_goal = has_goal or obj.get('name') == 'goal'
+        return has_red, has_goal
     
-    def _count_wall_neighbors(self, internal_map, pos):
-        """周囲の壁の数"""
-        count = 0
-        for dx, dy in [(0, -1), (0, 1), (-1, 0), (1, 0)]:
+    def _neighbor_counts(self, internal_map, pos):
+        """周囲の (未知マス数, 壁の数)
+        
+        内部マップが CellMap で、前回から書き換わっておらず現在地も同じなら
+        前回の数を返す（向きを変えるだけのステップなど）。
+        """
+        pos = tuple(pos)
+        cache = self._neighbor_cache
+        if isinstance(internal_map, CellMap):
+            if cache and cache[0] is internal_map and cache[1] == internal_map.version and cache[2] == pos:
+                return cache[3], cache[4]
+        unknown = walls = 0
+        for dx, dy in NEIGHBORS:
             neighbor = (pos[0] + dx, pos[1] + dy)
-            if internal_map.get(neighbor) in ['wall', 'out']:
-                count += 1
-        return count
+            if neighbor not in internal_map:
+                unknown += 1
+            elif internal_map[neighbor] in ('wall', 'out'):
+                walls += 1
+        if isinstance(internal_map, CellMap):
+            self._neighbor_cache = (internal_map, internal_map.version, pos, unknown, walls)
+        return unknown, walls
     
     def get_dominant(self):
         """最も強いクオリアを返す"""
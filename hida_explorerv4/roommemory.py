@@ -0,0 +1,194 @@
+"""
+roommemory.py
+LTM - 部屋ごとの記憶（コピーせずに保存・読み込みする）
+
+従来は部屋を出入りするたびに internal_map / found_objects を丸ごとコピーし、
+総記憶マス数は全部屋の長さを毎回足していた。
+
+ここでは:
+- STMの dict（SnapshotDict）から読み取り専用のスナップショットを O(1) で取る。
+  スナップショットの後でSTMに書き込むと、そのマスの古い値だけを退避する
+  （マス単位のコピーオンライト）。スナップショットは本体と中身を共有する
+- 部屋に戻ったら、保存したときの本体をそのままSTMに戻す（コピーしない）。
+  保存後に本体が書き換えられていたら、変わったマスだけ元に戻す
+- 保存した全部屋のマス数は、保存のたびに差分で更新する
+"""
+
+from collections.abc import Mapping
+
+_MISSING = object()   # 「そのマスはなかった」
+
+
+class RoomSnapshot(Mapping):
+    """ある時点の SnapshotDict の読み取り専用ビュー
+
+    _saved: スナップショット後に書き換わったキー → その時点の値（なければ _MISSING）
+    _next: 次に取られたスナップショット（なければ本体をそのまま見る）
+    古い値は新しいスナップショットから順にたどって探す。
+    """
+
+    def __init__(self, live):
+        self._live = live
+        self._saved = {}
+        self._next = None
+        self._len = len(live)
+
+    def __getitem__(self, key):
+        snap = self
+        while snap is not None:
+            if key in snap._saved:
+                value = snap._saved[key]
+                if value is _MISSING:
+                    raise KeyError(key)
+                return value
+            snap = snap._next
+        return dict.__getitem__(self._live, key)
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        keys = dict.fromkeys(self._live)
+        snap = self
+        while snap is not None:
+            keys.update(dict.fromkeys(snap._saved))
+            snap = snap._next
+        return (key for key in keys if key in self)
+
+    def __len__(self):
+        return self._len
+
+    def copy(self):
+        """ふつうの dict にする"""
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"RoomSnapshot({self.copy()!r})"
+
+
+class SnapshotDict(dict):
+    """スナップショットを取れる dict（書き換える直前に古い値を退避する）"""
+
+    _snapshot = None    # いちばん新しいスナップショット
+
+    def snapshot(self):
+        """今の中身の読み取り専用ビュー（O(1)）"""
+        snap = self._snapshot
+        if snap is not None and not snap._saved:
+            return snap     # 前のスナップショットから変わっていない
+        new = RoomSnapshot(self)
+        if snap is not None:
+            snap._next = new
+        self._snapshot = new
+        return new
+
+    def revert(self):
+        """最新のスナップショットの中身に戻す（変わったキーの数だけかかる）"""
+        snap = self._snapshot
+        if snap is None:
+            return
+        saved = snap._saved
+        for key, value in saved.items():
+            if value is _MISSING:
+                self.pop(key, None)
+            else:
+                self[key] = value
+        snap._saved = {}    # 戻した後は本体 = スナップショット
+
+    def _remember(self, key):
+        snap = self._snapshot
+        if snap is not None and key not in snap._saved:
+            snap._saved[key] = dict.get(self, key, _MISSING)
+
+    def __setitem__(self, key, value):
+        self._remember(key)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        self._remember(key)
+        dict.__delitem__(self, key)
+
+    def pop(self, key, *default):
+        if key in self:
+            self._remember(key)
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+        if not self:
+            raise KeyError('popitem(): dictionary is empty')
+        key = next(reversed(self))
+        self._remember(key)
+        return key, dict.pop(self, key)
+
+    def setdefault(self, key, value=None):
+        if key not in self:
+            self[key] = value
+        return dict.__getitem__(self, key)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        for key in self:
+            self._remember(key)
+        dict.clear(self)
+
+
+class RoomMemory(Mapping):
+    """LTM: 部屋ID → {'map': スナップショット, 'objects': スナップショット}
+
+    cells / objects は保存した全部屋のマス数・オブジェクト数（保存のたびに更新）。
+    """
+
+    def __init__(self):
+        self._rooms = {}
+        self._live = {}     # 部屋ID → (internal_map, found_objects) の本体
+        self.cells = 0
+        self.objects = 0
+
+    def __getitem__(self, room_id):
+        return self._rooms[room_id]
+
+    def __iter__(self):
+        return iter(self._rooms)
+
+    def __len__(self):
+        return len(self._rooms)
+
+    def save(self, room_id, cells, objects):
+        """部屋の記憶を保存する（cells, objects は SnapshotDict。コピーしない）"""
+        old = self._rooms.get(room_id)
+        if old is not None:
+            self.cells -= len(old['map'])
+            self.objects -= len(old['objects'])
+        memory = {'map': cells.snapshot(), 'objects': objects.snapshot()}
+        self._rooms[room_id] = memory
+        self._live[room_id] = (cells, objects)
+        self.cells += len(memory['map'])
+        self.objects += len(memory['objects'])
+        return memory
+
+    def load(self, room_id):
+        """保存した部屋の本体 (cells, objects) を、保存したときの中身に戻して返す"""
+        cells, objects = self._live[room_id]
+        memory = self._rooms[room_id]
+        if cells._snapshot is not memory['map'] or objects._snapshot is not memory['objects']:
+            # 保存後に本体から別のスナップショットが取られた: 作り直す
+            cells, objects = type(cells)(memory['map']), type(objects)(memory['objects'])
+            self.save(room_id, cells, objects)
+            return cells, objects
+        cells.revert()
+        objects.revert()
+        return cells, objects
+
+    def total_cells(self, exclude=None):
+        """保存した全部屋のマス数（exclude の部屋は除く）"""
+        total = self.cells
+        if exclude in self._rooms:
+            total -= len(self._rooms[exclude]['map'])
+        return total
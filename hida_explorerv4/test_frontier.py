@@ -0,0 +1,163 @@
+"""
+探索の境界（CellMap.frontier）のテスト
+書き込みのたびに更新する境界が全マス走査と一致するか、
+has_unknown_reachable が従来と同じ答えを返すか、
+nearest_frontier が最寄りの境界を返すかを確かめる。
+広いマップでの時間は参考として出すが、実行環境で変わるので合否には入れない
+"""
+
+import random
+import sys
+import time
+from collections import deque
+
+from cellmap import CellMap, NEIGHBORS
+from hida import Hida
+from pathfinder import DELTAS, BLOCKED
+
+
+def has_unknown_reachable_scan(internal_map):
+    """従来の Hida.has_unknown_reachable（比較用。内部マップを全部走査する）"""
+    deltas = {'N': (0, -1), 'E': (1, 0), 'S': (0, 1), 'W': (-1, 0)}
+    for known_pos, cell in internal_map.items():
+        if cell not in ['empty']:
+            continue
+        for d in ['N', 'E', 'S', 'W']:
+            dx, dy = deltas[d]
+            neighbor = (known_pos[0] + dx, known_pos[1] + dy)
+            if neighbor in internal_map and internal_map[neighbor] == 'out':
+                continue
+            if neighbor not in internal_map:
+                return True
+    return False
+
+
+def frontier_scan(cells):
+    return {pos for pos, cell in cells.items()
+            if cell == 'empty'
+            and any((pos[0] + dx, pos[1] + dy) not in cells for dx, dy in NEIGHBORS)}
+
+
+def nearest_bfs(cells, start, targets):
+    """最寄りの境界（比較用。毎回ふつうに幅優先探索する）"""
+    start = tuple(start)
+    queue = deque([(start, [start])])
+    visited = {start}
+    while queue:
+        pos, path = queue.popleft()
+        if pos in targets:
+            return path
+        for dx, dy in DELTAS:
+            nxt = (pos[0] + dx, pos[1] + dy)
+            if nxt in visited or nxt not in cells or cells[nxt] in BLOCKED:
+                continue
+            visited.add(nxt)
+            queue.append((nxt, path + [nxt]))
+    return None
+
+
+CELL_TYPES = ['empty', 'empty', 'empty', 'danger', 'wall', 'object', 'out']
+
+
+def check_same_as_scan(trials=200, size=10):
+    """ランダムな書き込み・削除で、境界と has_unknown_reachable が全マス走査と一致するか"""
+    rng = random.Random(0)
+    ok = True
+    for _ in range(trials):
+        cells = CellMap({(rng.randrange(size), rng.randrange(size)): rng.choice(CELL_TYPES)
+                         for _ in range(rng.randint(0, size * size))})
+        ok = ok and cells.frontier == frontier_scan(cells)
+        for _ in range(40):
+            pos = (rng.randrange(size), rng.randrange(size))
+            op = rng.random()
+            if op < 0.1:
+                cells.pop(pos, None)
+            elif op < 0.12:
+                cells.clear()
+            elif op < 0.15:
+                cells.update({pos: 'empty', (pos[0] + 1, pos[1]): rng.choice(CELL_TYPES)})
+            else:
+                cells[pos] = rng.choice(CELL_TYPES)
+            ok = ok and cells.frontier == frontier_scan(cells)
+            ok = ok and bool(cells.frontier) == has_unknown_reachable_scan(cells)
+    return ok
+
+
+def check_nearest(trials=300, size=10):
+    """nearest_frontier が毎回の幅優先探索と同じ経路を返すか"""
+    rng = random.Random(1)
+    hida = Hida()
+    queries = 0
+    mismatches = 0
+    for _ in range(trials):
+        hida.internal_map = {(x, y): rng.choice(CELL_TYPES)
+                             for y in range(size) for x in range(size) if rng.random() < 0.85}
+        hida.pos = [rng.randrange(size), rng.randrange(size)]
+        for _ in range(10):
+            if rng.random() < 0.5:
+                pos = (rng.randrange(size), rng.randrange(size))
+                hida.internal_map[pos] = rng.choice(CELL_TYPES)
+            if rng.random() < 0.2:
+                hida.pos = [rng.randrange(size), rng.randrange(size)]
+            queries += 1
+            if hida.nearest_frontier() != nearest_bfs(hida.internal_map, hida.pos,
+                                                      frontier_scan(hida.internal_map)):
+                mismatches += 1
+    print(f"  問い合わせ {queries}回: 不一致 {mismatches}回")
+    return mismatches == 0
+
+
+def check_cost(size=100, steps=200):
+    """探索がほぼ終わった広いマップで、毎ステップ4マス書き込んで未知の有無を聞く"""
+    rng = random.Random(2)
+    hida = Hida()
+    hida.internal_map = {(x, y): 'empty' for y in range(size) for x in range(size)}
+    for i in range(size):
+        for pos in [(i, -1), (i, size), (-1, i), (size, i)]:
+            hida.internal_map[pos] = 'out'
+    cells = hida.internal_map
+
+    old_time = new_time = 0.0
+    same = True
+    for _ in range(steps):
+        x, y = rng.randrange(1, size - 1), rng.randrange(1, size - 1)
+        for dx, dy in NEIGHBORS:
+            cells[(x + dx, y + dy)] = rng.choice(['empty', 'wall'])
+        t0 = time.perf_counter()
+        old = has_unknown_reachable_scan(cells)
+        t1 = time.perf_counter()
+        new = hida.has_unknown_reachable()
+        t2 = time.perf_counter()
+        old_time += t1 - t0
+        new_time += t2 - t1
+        same = same and old == new
+    print(f"  {size}x{size}の既知マップ・{steps}ステップ: "
+          f"全部走査 {old_time / steps * 1e3:.2f}ms/回, 境界の集合 {new_time / steps * 1e6:.2f}µs/回")
+    return same
+
+
+def main():
+    print("=" * 60)
+    print("探索の境界テスト（CellMap.frontier）")
+    print("=" * 60)
+
+    print("\n【全マス走査・従来の has_unknown_reachable と比較】")
+    ok1 = check_same_as_scan()
+    print(f"  → {'PASS' if ok1 else 'FAIL'}")
+
+    print("\n【最寄りの境界への経路】")
+    ok2 = check_nearest()
+    print(f"  → {'PASS' if ok2 else 'FAIL'}")
+
+    print("\n【広いマップでのコスト】")
+    ok3 = check_cost()
+    print(f"  → {'PASS' if ok3 else 'FAIL'}")
+
+    ok = ok1 and ok2 and ok3
+    print(f"\n判定: {'PASS' if ok else 'FAIL'}")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
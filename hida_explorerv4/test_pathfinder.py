@@ -0,0 +1,169 @@
+"""
+経路探索（PathFinder）のテスト
+親ポインタBFS + 探索木の再利用が、従来のBFS（経路ごとキューに積む）と
+同じ経路を返すかを確かめる。動く壁の部屋での速さは表示するだけ（判定には使わない）
+"""
+
+import random
+import sys
+import time
+from collections import deque
+
+from cellmap import CellMap
+from pathfinder import PathFinder
+from world import World
+
+
+def find_path_bfs(internal_map, pos, goal):
+    """従来の Hida.find_path（比較用）"""
+    start = tuple(pos)
+    goal = tuple(goal)
+    if start == goal:
+        return [start]
+    goal_is_object = internal_map.get(goal) == 'object'
+    queue = deque([(start, [start])])
+    visited = {start}
+    while queue:
+        pos, path = queue.popleft()
+        for dx, dy in [(0, -1), (0, 1), (1, 0), (-1, 0)]:
+            next_pos = (pos[0] + dx, pos[1] + dy)
+            if next_pos in visited:
+                continue
+            if next_pos == goal:
+                return path if goal_is_object else path + [next_pos]
+            if next_pos not in internal_map:
+                continue
+            if internal_map[next_pos] in ['wall', 'out', 'object']:
+                continue
+            visited.add(next_pos)
+            queue.append((next_pos, path + [next_pos]))
+    return None
+
+
+CELL_TYPES = ['empty', 'empty', 'empty', 'danger', 'wall', 'object', 'out']
+
+
+def random_map(rng, size):
+    cells = CellMap()
+    for y in range(size):
+        for x in range(size):
+            if rng.random() < 0.85:
+                cells[(x, y)] = rng.choice(CELL_TYPES)
+    return cells
+
+
+def check_same_paths(trials=300, size=10):
+    """ランダムなマップ・変更・現在地・ゴールで従来のBFSと比べる"""
+    rng = random.Random(0)
+    finder = PathFinder()
+    queries = 0
+    mismatches = 0
+    for _ in range(trials):
+        cells = random_map(rng, size)
+        start = (rng.randrange(size), rng.randrange(size))
+        for _ in range(20):
+            op = rng.random()
+            if op < 0.4:
+                # 数マスだけ変わる（壁が動く・新しく見えた）
+                for _ in range(rng.randint(1, 3)):
+                    pos = (rng.randrange(size), rng.randrange(size))
+                    if rng.random() < 0.1:
+                        cells.pop(pos, None)
+                    else:
+                        cells[pos] = rng.choice(CELL_TYPES)
+            elif op < 0.5:
+                start = (rng.randrange(size), rng.randrange(size))
+            for _ in range(5):
+                goal = (rng.randrange(-1, size + 1), rng.randrange(-1, size + 1))
+                queries += 1
+                if finder.find_path(cells, start, goal) != find_path_bfs(cells, start, goal):
+                    mismatches += 1
+    print(f"  問い合わせ {queries}回: 不一致 {mismatches}回 "
+          f"（作り直し {finder.rebuilds}回, 巻き戻し {finder.rewinds}回）")
+    return mismatches == 0
+
+
+def moving_wall_room(rng):
+    """test_5rooms_ltm と同じ10x10の部屋（内壁あり）"""
+    world = World(size=10)
+    for i in range(10):
+        world.add_wall(i, 0)
+        world.add_wall(i, 9)
+        world.add_wall(0, i)
+        world.add_wall(9, i)
+    for _ in range(12):
+        world.add_wall(rng.randint(1, 8), rng.randint(1, 8))
+    world.add_object("ball", 4, 3, color="red")
+    world.add_object("goal", 6, 3, color=None)
+    return world
+
+
+def known_map(world):
+    """部屋を全部見た内部マップ"""
+    cells = {}
+    for y in range(world.height):
+        for x in range(world.width):
+            cell = world.see_cell([x, y])
+            cells[(x, y)] = cell['type']
+    return cells
+
+
+def check_moving_walls(steps=300):
+    """動く壁の部屋で、毎ステップ探索候補（未探索マスの隣）へ経路を聞く"""
+    rng = random.Random(1)
+    random.seed(1)
+    world = moving_wall_room(rng)
+    cells = CellMap(known_map(world))
+    finder = PathFinder()
+    start = (2, 2)
+    goals = [(x, y) for y in range(1, 9) for x in range(1, 9)]
+
+    old_time = new_time = 0.0
+    queries = 0
+    same = True
+    for step in range(steps):
+        world.hida_pos = list(start)
+        world.tick(move_probability=0.05)
+        for pos, cell in known_map(world).items():
+            cells[pos] = cell
+        if step % 4 == 0:
+            # ときどき移動する（向きを変えるだけのステップが多い）
+            path = finder.find_path(cells, start, (6, 3))
+            if path and len(path) >= 2:
+                start = path[1]
+        t0 = time.perf_counter()
+        old = [find_path_bfs(cells, start, g) for g in goals]
+        t1 = time.perf_counter()
+        new = [finder.find_path(cells, start, g) for g in goals]
+        t2 = time.perf_counter()
+        old_time += t1 - t0
+        new_time += t2 - t1
+        queries += len(goals)
+        same = same and old == new
+    print(f"  {steps}ステップ × {len(goals)}ゴール: "
+          f"従来 {old_time / queries * 1e6:.1f}µs/回, PathFinder {new_time / queries * 1e6:.1f}µs/回 "
+          f"（{old_time / new_time:.1f}倍）")
+    return same
+
+
+def main():
+    print("=" * 60)
+    print("経路探索テスト（親ポインタBFS + 探索木の再利用）")
+    print("=" * 60)
+
+    print("\n【ランダムなマップで従来のBFSと比較】")
+    ok1 = check_same_paths()
+    print(f"  → {'PASS' if ok1 else 'FAIL'}")
+
+    print("\n【動く壁の部屋】")
+    ok2 = check_moving_walls()
+    print(f"  → {'PASS' if ok2 else 'FAIL'}")
+
+    ok = ok1 and ok2
+    print(f"\n判定: {'PASS' if ok else 'FAIL'}")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
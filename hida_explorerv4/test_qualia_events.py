@@ -0,0 +1,184 @@
+"""
+L2クオリア更新（発見・消失で数える desire、周囲のマス数のキャッシュ）のテスト
+従来の QualiaLayer.update と同じクオリアの値をたどるか、
+オブジェクトの多いマップでも同じ値になるかを確かめる（1ステップの時間は出力するだけ）
+"""
+
+import contextlib
+import io
+import random
+import sys
+import time
+
+from cellmap import CellMap
+from objectmap import ObjectMap
+from qualia import QualiaLayer
+
+
+class ScanningQualia(QualiaLayer):
+    """従来の QualiaLayer.update（比較用。毎ステップ found_objects を全部見る）"""
+
+    def update(self, prediction_errors, found_objects, internal_map, pos):
+        for key in self.qualia:
+            self.qualia[key] *= self.decay[key]
+        if prediction_errors:
+            self.qualia['surprise'] += len(prediction_errors) * 0.3
+            self.qualia['surprise'] = min(self.qualia['surprise'], 1.0)
+        for error in prediction_errors:
+            if error['actual'] == 'wall':
+                self.qualia['fear'] += 0.3
+            elif error['actual'] == 'object':
+                self.qualia['curiosity'] += 0.2
+            elif error['actual'] == 'danger':
+                self.qualia['fear'] += 0.2
+        self.qualia['fear'] = min(self.qualia['fear'], 1.0)
+        self.qualia['curiosity'] = min(self.qualia['curiosity'], 1.0)
+        current_cell = internal_map.get(tuple(pos))
+        if current_cell == 'danger':
+            self.qualia['fear'] += 0.15
+            self.qualia['fear'] = min(self.qualia['fear'], 1.0)
+            print(f"  ⚠️ 危険ゾーン通過！ fear={self.qualia['fear']:.2f}")
+        for obj in found_objects.values():
+            if obj.get('color') == 'red':
+                self.qualia['desire'] = max(self.qualia['desire'], 0.8)
+            if obj.get('name') == 'goal':
+                self.qualia['desire'] = max(self.qualia['desire'], 0.6)
+        unknown_neighbors = 0
+        wall_neighbors = 0
+        for dx, dy in [(0, -1), (0, 1), (-1, 0), (1, 0)]:
+            neighbor = (pos[0] + dx, pos[1] + dy)
+            if neighbor not in internal_map:
+                unknown_neighbors += 1
+            if internal_map.get(neighbor) in ['wall', 'out']:
+                wall_neighbors += 1
+        if unknown_neighbors > 0:
+            self.qualia['curiosity'] += unknown_neighbors * 0.05
+            self.qualia['curiosity'] = min(self.qualia['curiosity'], 1.0)
+        if wall_neighbors >= 3:
+            self.qualia['fear'] += 0.2
+            self.qualia['fear'] = min(self.qualia['fear'], 1.0)
+
+
+CELL_TYPES = ['empty', 'empty', 'danger', 'wall', 'object', 'out']
+OBJECTS = [{'name': 'ball', 'color': 'red'}, {'name': 'ball', 'color': 'blue'},
+           {'name': 'goal', 'color': None}, {'name': 'goal_red', 'color': None}]
+
+
+def random_errors(rng):
+    return [{'pos': (0, 0), 'expected': 'empty', 'actual': rng.choice(CELL_TYPES)}
+            for _ in range(rng.choice([0, 0, 0, 1, 2]))]
+
+
+def check_same_trajectory(trials=200, steps=100, size=8):
+    """ランダムな発見・消失・書き込み・移動で、従来と同じクオリアの値になるか"""
+    rng = random.Random(0)
+    ok = True
+    with contextlib.redirect_stdout(io.StringIO()):
+        for trial in range(trials):
+            old, new = ScanningQualia(), QualiaLayer()
+            plain = trial % 4 == 0      # ふつうの dict でも同じ
+            cells = {} if plain else CellMap()
+            objects = {} if plain else ObjectMap()
+            pos = (rng.randrange(size), rng.randrange(size))
+            for _ in range(steps):
+                op = rng.random()
+                if op < 0.3:
+                    cells[(rng.randrange(size), rng.randrange(size))] = rng.choice(CELL_TYPES)
+                elif op < 0.4:
+                    objects[(rng.randrange(size), rng.randrange(size))] = dict(rng.choice(OBJECTS))
+                elif op < 0.5 and objects:
+                    del objects[rng.choice(list(objects))]
+                elif op < 0.52:
+                    objects.clear()
+                elif op < 0.7:
+                    pos = (rng.randrange(size), rng.randrange(size))
+                errors = random_errors(rng)
+                old.update(errors, objects, cells, list(pos))
+                new.update(errors, objects, cells, list(pos))
+                holding = rng.random() < 0.1
+                old.holding_update(holding)
+                new.holding_update(holding)
+                ok = ok and old.qualia == new.qualia
+    return ok
+
+
+def check_object_counts(trials=200, size=6):
+    """ObjectMap の数が中身と一致するか（スナップショットから戻したときも）"""
+    rng = random.Random(1)
+    ok = True
+    for _ in range(trials):
+        objects = ObjectMap({(1, 1): dict(OBJECTS[0])})
+        snap = None
+        for _ in range(30):
+            pos = (rng.randrange(size), rng.randrange(size))
+            op = rng.random()
+            if op < 0.5:
+                objects[pos] = dict(rng.choice(OBJECTS))
+            elif op < 0.7:
+                objects.pop(pos, None)
+            elif op < 0.75 and objects:
+                objects.popitem()
+            elif op < 0.85:
+                snap = objects.snapshot()
+            elif snap is not None and objects._snapshot is snap:
+                objects.revert()
+                ok = ok and dict(objects) == snap.copy()
+            reds = sum(1 for obj in objects.values() if obj.get('color') == 'red')
+            goals = sum(1 for obj in objects.values() if obj.get('name') == 'goal')
+            ok = ok and (objects.reds, objects.goals) == (reds, goals)
+    return ok
+
+
+def check_cost(n_objects=2000, steps=2000):
+    """オブジェクトの多いマップで、1ステップの更新コストを比べる"""
+    rng = random.Random(2)
+    cells = CellMap({(x, y): rng.choice(CELL_TYPES) for y in range(60) for x in range(60)})
+    plain = {}
+    while len(plain) < n_objects:
+        plain[(rng.randrange(60), rng.randrange(60))] = dict(rng.choice(OBJECTS[1:]))
+    objects = ObjectMap(plain)
+    old, new = ScanningQualia(), QualiaLayer()
+    positions = [(rng.randrange(1, 59), rng.randrange(1, 59)) for _ in range(steps // 4)]
+    same = True
+    old_time = new_time = 0.0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(steps):
+            pos = list(positions[i // 4])     # 向きを変えるだけのステップが多い
+            t0 = time.perf_counter()
+            old.update([], plain, cells, pos)
+            t1 = time.perf_counter()
+            new.update([], objects, cells, pos)
+            t2 = time.perf_counter()
+            old_time += t1 - t0
+            new_time += t2 - t1
+            same = same and old.qualia == new.qualia
+    print(f"  オブジェクト{n_objects}個・{steps}ステップ: "
+          f"全部見る {old_time / steps * 1e6:.1f}µs/回, 数を見る {new_time / steps * 1e6:.1f}µs/回")
+    return same
+
+
+def main():
+    print("=" * 60)
+    print("L2クオリア更新テスト（発見・消失で数える desire）")
+    print("=" * 60)
+
+    print("\n【従来の update と同じクオリアの値】")
+    ok1 = check_same_trajectory()
+    print(f"  → {'PASS' if ok1 else 'FAIL'}")
+
+    print("\n【ObjectMap の数】")
+    ok2 = check_object_counts()
+    print(f"  → {'PASS' if ok2 else 'FAIL'}")
+
+    print("\n【オブジェクトの多いマップでのコスト】")
+    ok3 = check_cost()
+    print(f"  → {'PASS' if ok3 else 'FAIL'}")
+
+    ok = ok1 and ok2 and ok3
+    print(f"\n判定: {'PASS' if ok else 'FAIL'}")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+部屋の記憶（RoomMemory）のテスト
+コピーしない保存・読み込みが、従来の丸ごとコピーと同じ記憶になるか、
+部屋が多いときも同じ総記憶マス数になるかを確かめる（出入りの時間は表示のみ）
+"""
+
+import contextlib
+import io
+import random
+import sys
+import time
+
+from cellmap import CellMap
+from hida import Hida
+
+
+class CopyingMemory:
+    """従来の Hida の LTM/STM管理（比較用。出入りのたびに丸ごとコピーする）
+
+    internal_map は従来の Hida と同じく、読み込むたびに CellMap に作り直す。
+    """
+
+    def __init__(self):
+        self.ltm = {}
+        self.internal_map = CellMap()
+        self.found_objects = {}
+        self.current_room = None
+
+    def enter_room(self, room_id):
+        if self.current_room:
+            self._save_to_ltm()
+        self.current_room = room_id
+        if room_id in self.ltm:
+            memory = self.ltm[room_id]
+            self.internal_map = CellMap(memory['map'].copy())
+            self.found_objects = memory['objects'].copy()
+        else:
+            self.internal_map = CellMap()
+            self.found_objects = {}
+
+    def _save_to_ltm(self):
+        if self.current_room:
+            self.ltm[self.current_room] = {
+                'map': self.internal_map.copy(),
+                'objects': self.found_objects.copy()
+            }
+
+    def leave_room(self):
+        self._save_to_ltm()
+        self.current_room = None
+
+    def total_memory(self):
+        total = len(self.internal_map)
+        for room_id, memory in self.ltm.items():
+            if room_id != self.current_room:
+                total += len(memory['map'])
+        return total
+
+
+CELL_TYPES = ['empty', 'empty', 'danger', 'wall', 'object', 'out']
+
+
+def same_memory(hida, ref):
+    if hida.total_memory() != ref.total_memory():
+        return False
+    if dict(hida.internal_map) != dict(ref.internal_map) or dict(hida.found_objects) != ref.found_objects:
+        return False
+    if sorted(hida.ltm.keys()) != sorted(ref.ltm.keys()):
+        return False
+    if hida.internal_map.frontier != ref.internal_map.frontier:
+        return False
+    for room_id, memory in ref.ltm.items():
+        saved = hida.ltm[room_id]
+        if len(saved['map']) != len(memory['map']) or saved['map'].copy() != memory['map']:
+            return False
+        if saved['objects'].copy() != memory['objects']:
+            return False
+    return True
+
+
+def check_same_as_copy(trials=100, steps=60, size=8):
+    """ランダムな出入り・書き込みで、従来の丸ごとコピーと同じ記憶になるか"""
+    rng = random.Random(0)
+    ok = True
+    for _ in range(trials):
+        hida = Hida()
+        ref = CopyingMemory()
+        rooms = [chr(ord('A') + i) for i in range(rng.randint(1, 5))]
+        held = []       # 途中で取り出したLTMの記憶（後の書き込みで変わってはいけない）
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(steps):
+                op = rng.random()
+                if op < 0.15:
+                    room_id = rng.choice(rooms)
+                    hida.enter_room(room_id)
+                    ref.enter_room(room_id)
+                elif op < 0.2:
+                    hida.leave_room()
+                    ref.leave_room()
+                elif op < 0.25 and hida.ltm:
+                    room_id = rng.choice(list(ref.ltm))
+                    held.append((hida.ltm[room_id], {k: dict(v) for k, v in ref.ltm[room_id].items()}))
+                else:
+                    for _ in range(rng.randint(1, 6)):
+                        pos = (rng.randrange(size), rng.randrange(size))
+                        if rng.random() < 0.1:
+                            hida.internal_map.pop(pos, None)
+                            ref.internal_map.pop(pos, None)
+                        else:
+                            cell = rng.choice(CELL_TYPES)
+                            hida.internal_map[pos] = cell
+                            ref.internal_map[pos] = cell
+                        if rng.random() < 0.2:
+                            obj = {'name': 'ball', 'color': rng.choice(['red', 'blue'])}
+                            hida.found_objects[pos] = obj
+                            ref.found_objects[pos] = obj
+                        elif rng.random() < 0.1 and pos in ref.found_objects:
+                            del hida.found_objects[pos]
+                            del ref.found_objects[pos]
+                ok = ok and same_memory(hida, ref)
+        for memory, expected in held:
+            ok = ok and memory['map'].copy() == expected['map']
+            ok = ok and memory['objects'].copy() == expected['objects']
+        ok = ok and isinstance(hida.internal_map, CellMap)
+    return ok
+
+
+def check_outside_write():
+    """保存した後で本体に直接書き込んでも、記憶と戻ったときの中身は保存したとき"""
+    hida = Hida()
+    with contextlib.redirect_stdout(io.StringIO()):
+        hida.enter_room('A')
+        hida.internal_map[(1, 1)] = 'empty'
+        hida.internal_map[(1, 2)] = 'wall'
+        cells = hida.internal_map
+        hida.enter_room('B')
+        cells[(1, 2)] = 'empty'
+        cells[(5, 5)] = 'danger'
+        del cells[(1, 1)]
+        saved = hida.ltm['A']['map'].copy()
+        hida.enter_room('A')
+    expected = {(1, 1): 'empty', (1, 2): 'wall'}
+    frontier = {(1, 1)}
+    return saved == expected and dict(hida.internal_map) == expected and hida.internal_map.frontier == frontier
+
+
+def visit_rooms(hida, rng, n_rooms, visits, size):
+    """部屋を順に回り、毎回数マスだけ書き込む"""
+    start = time.perf_counter()
+    totals = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(visits):
+            hida.enter_room(i % n_rooms)
+            for _ in range(4):
+                hida.internal_map[(rng.randrange(size), rng.randrange(size))] = rng.choice(CELL_TYPES)
+            totals.append(hida.total_memory())
+        hida.leave_room()
+    return time.perf_counter() - start, totals
+
+
+def check_cost(n_rooms=200, visits=1000, size=40):
+    """よく知っている部屋が多いとき、出入り・総記憶マス数のコストを比べる"""
+    rng = random.Random(1)
+    maps = [{(x, y): rng.choice(CELL_TYPES) for y in range(size) for x in range(size)}
+            for _ in range(n_rooms)]
+
+    ref = CopyingMemory()
+    hida = Hida()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for room_id, cells in enumerate(maps):
+            for memory in (ref, hida):
+                memory.enter_room(room_id)
+                memory.internal_map.update(cells)
+
+    # 従来の出入り（同じ乱数で同じ書き込み）
+    start = time.perf_counter()
+    old_totals = []
+    rng_old = random.Random(2)
+    for i in range(visits):
+        ref.enter_room(i % n_rooms)
+        for _ in range(4):
+            ref.internal_map[(rng_old.randrange(size), rng_old.randrange(size))] = rng_old.choice(CELL_TYPES)
+        old_totals.append(ref.total_memory())
+    ref.leave_room()
+    old_time = time.perf_counter() - start
+
+    new_time, new_totals = visit_rooms(hida, random.Random(2), n_rooms, visits, size)
+    same = old_totals == new_totals and same_memory(hida, ref)
+    print(f"  {n_rooms}部屋（{size}x{size}）・{visits}回の出入り: "
+          f"丸ごとコピー {old_time / visits * 1e6:.0f}µs/回, RoomMemory {new_time / visits * 1e6:.0f}µs/回 "
+          f"（{old_time / new_time:.1f}倍）")
+    return same
+
+
+def main():
+    print("=" * 60)
+    print("部屋の記憶テスト（コピーしない LTM/STM）")
+    print("=" * 60)
+
+    print("\n【従来の丸ごとコピーと比較】")
+    ok1 = check_same_as_copy()
+    print(f"  → {'PASS' if ok1 else 'FAIL'}")
+
+    print("\n【保存後に本体へ書き込んだとき】")
+    ok2 = check_outside_write()
+    print(f"  → {'PASS' if ok2 else 'FAIL'}")
+
+    print("\n【部屋が多いときのコスト】")
+    ok3 = check_cost()
+    print(f"  → {'PASS' if ok3 else 'FAIL'}")
+
+    ok = ok1 and ok2 and ok3
+    print(f"\n判定: {'PASS' if ok else 'FAIL'}")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
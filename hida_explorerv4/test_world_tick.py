@@ -0,0 +1,181 @@
+"""
+動く壁（World.tick）のテスト
+内壁の集合を持つ tick が従来の全マス走査と同じ動きをするか
+（grid に直接書き込んだ壁も含めて）、
+まとめて動かすモード（batch=True）が壁の規則を守るか、
+広い部屋でも同じ動きをするかを確かめる（コストは表示のみ）
+"""
+
+import copy
+import random
+import sys
+import time
+
+from world import World
+
+
+def tick_scan(world, move_probability=0.3):
+    """従来の World.tick（比較用。内部を全マス走査する）"""
+    moved = []
+    moving_walls = []
+    for y in range(1, world.height - 1):
+        for x in range(1, world.width - 1):
+            if world.grid[y][x] == 'wall':
+                moving_walls.append((x, y))
+    for pos in moving_walls:
+        if random.random() < move_probability:
+            x, y = pos
+            directions = [(0, -1), (0, 1), (-1, 0), (1, 0)]
+            random.shuffle(directions)
+            for dx, dy in directions:
+                nx, ny = x + dx, y + dy
+                if 1 <= nx < world.width - 1 and 1 <= ny < world.height - 1:
+                    if world.grid[ny][nx] != 'wall':
+                        if (nx, ny) not in world.objects:
+                            if [nx, ny] != world.hida_pos:
+                                world.grid[y][x] = None
+                                world.grid[ny][nx] = 'wall'
+                                moved.append({'type': 'wall', 'from': pos, 'to': (nx, ny)})
+                                break
+    return moved
+
+
+def random_room(rng, size, n_walls, n_objects=3):
+    world = World(size=size)
+    for i in range(size):
+        world.add_wall(i, 0)
+        world.add_wall(i, size - 1)
+        world.add_wall(0, i)
+        world.add_wall(size - 1, i)
+    for _ in range(n_walls):
+        world.add_wall(rng.randint(1, size - 2), rng.randint(1, size - 2))
+    for _ in range(n_objects):
+        world.add_object("ball", rng.randint(1, size - 2), rng.randint(1, size - 2), color="red")
+    for _ in range(2):
+        world.add_danger(rng.randint(1, size - 2), rng.randint(1, size - 2))
+    world.hida_pos = [rng.randint(1, size - 2), rng.randint(1, size - 2)]
+    return world
+
+
+def scanned_walls(world):
+    return {(x, y) for y in range(1, world.height - 1) for x in range(1, world.width - 1)
+            if world.grid[y][x] == 'wall'}
+
+
+def check_same_as_scan(rooms=50, ticks=40):
+    """同じ乱数列で、従来の tick と同じ壁が同じように動くか"""
+    rng = random.Random(0)
+    ok = True
+    for i in range(rooms):
+        world = random_room(rng, size=rng.randint(5, 14), n_walls=rng.randint(0, 30))
+        ref = copy.deepcopy(world)
+        for t in range(ticks):
+            random.seed(i * 1000 + t)
+            moved = world.tick(move_probability=0.3)
+            random.seed(i * 1000 + t)
+            ok = ok and moved == tick_scan(ref, move_probability=0.3)
+            ok = ok and world.grid == ref.grid and world.walls == scanned_walls(world)
+    return ok
+
+
+def check_direct_writes(rooms=50, ticks=20):
+    """grid に直接書き込んだ壁も、従来の tick と同じように動くか"""
+    rng = random.Random(3)
+    ok = True
+    for i in range(rooms):
+        size = rng.randint(5, 14)
+        world = random_room(rng, size=size, n_walls=rng.randint(0, 10))
+        ref = copy.deepcopy(world)
+        for t in range(ticks):
+            x, y = rng.randint(1, size - 2), rng.randint(1, size - 2)
+            cell = rng.choice(['wall', 'wall', None, 'danger'])
+            world.grid[y][x] = cell
+            ref.grid[y][x] = cell
+            if t % 7 == 0:
+                world.grid[y] = list(world.grid[y])
+            random.seed(i * 1000 + t)
+            moved = world.tick(move_probability=0.5)
+            random.seed(i * 1000 + t)
+            ok = ok and moved == tick_scan(ref, move_probability=0.5)
+            ok = ok and world.grid == ref.grid and world.walls == scanned_walls(world)
+    return ok
+
+
+def check_batch_rules(rooms=50, ticks=40):
+    """batch=True: 壁の数は変わらず、オブジェクト・HIDA・他の壁の上には動かない"""
+    rng = random.Random(1)
+    random.seed(1)
+    ok = True
+    moves = 0
+    for _ in range(rooms):
+        world = random_room(rng, size=rng.randint(5, 14), n_walls=rng.randint(0, 30))
+        for _ in range(ticks):
+            before = set(world.walls)
+            moved = world.tick(move_probability=0.5, batch=True)
+            moves += len(moved)
+            targets = [m['to'] for m in moved]
+            ok = ok and len(set(targets)) == len(targets)
+            for m in moved:
+                (x, y), (nx, ny) = m['from'], m['to']
+                ok = ok and abs(nx - x) + abs(ny - y) == 1
+                ok = ok and m['from'] in before and m['to'] not in before
+                ok = ok and m['to'] not in world.objects and [nx, ny] != world.hida_pos
+            ok = ok and len(world.walls) == len(before) and world.walls == scanned_walls(world)
+    print(f"  移動 {moves}回")
+    return ok
+
+
+def check_cost(size=400, n_walls=40, ticks=200):
+    """広い部屋で、従来の全マス走査と同じ動きか（コストは比べて表示するだけ）"""
+    rng = random.Random(2)
+    world = random_room(rng, size=size, n_walls=n_walls)
+    ref = copy.deepcopy(world)
+    random.seed(2)
+    t0 = time.perf_counter()
+    for _ in range(ticks):
+        tick_scan(ref, move_probability=0.3)
+    scan_time = (time.perf_counter() - t0) / ticks
+    random.seed(2)
+    t0 = time.perf_counter()
+    for _ in range(ticks):
+        world.tick(move_probability=0.3)
+    set_time = (time.perf_counter() - t0) / ticks
+    same = world.grid == ref.grid
+    t0 = time.perf_counter()
+    for _ in range(ticks):
+        world.tick(move_probability=0.3, batch=True)
+    batch_time = (time.perf_counter() - t0) / ticks
+    print(f"  {size}x{size}・内壁{n_walls}枚: 全マス走査 {scan_time * 1e3:.2f}ms/tick, "
+          f"内壁の集合 {set_time * 1e6:.0f}µs/tick, batch {batch_time * 1e6:.0f}µs/tick")
+    return same
+
+
+def main():
+    print("=" * 60)
+    print("動く壁テスト（World.tick）")
+    print("=" * 60)
+
+    print("\n【従来の全マス走査と同じ動き】")
+    ok1 = check_same_as_scan()
+    print(f"  → {'PASS' if ok1 else 'FAIL'}")
+
+    print("\n【gridへの直接の書き込み】")
+    ok_direct = check_direct_writes()
+    print(f"  → {'PASS' if ok_direct else 'FAIL'}")
+
+    print("\n【まとめて動かすモードの規則】")
+    ok2 = check_batch_rules()
+    print(f"  → {'PASS' if ok2 else 'FAIL'}")
+
+    print("\n【広い部屋でのコスト】")
+    ok3 = check_cost()
+    print(f"  → {'PASS' if ok3 else 'FAIL'}")
+
+    ok = ok1 and ok_direct and ok2 and ok3
+    print(f"\n判定: {'PASS' if ok else 'FAIL'}")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
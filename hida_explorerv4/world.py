@@ -3,24 +3,99 @@ world.py
 グリッドワールド - 神は全部見える、HIDAは前方1マスだけ
 """
 
+
+class _GridRow(list):
+    """grid の1行（マスへの書き込みを World に知らせ、内壁の集合を合わせる）
+
+    grid[y][x] = 'wall' のような直接の書き込みも tick で動く壁になる。
+    読み出しはふつうの list のまま。
+    """
+    
+    __slots__ = ('_world', '_y')
+    
+    def __init__(self, cells, world, y):
+        super().__init__(cells)
+        self._world = world
+        self._y = y
+    
+    def __setitem__(self, x, cell):
+        list.__setitem__(self, x, cell)
+        if isinstance(x, slice):
+            self._world.rebuild_walls()
+        else:
+            self._world._sync_wall(x % len(self), self._y, cell)
+
+
+class _Grid(list):
+    """grid（行の差し替えも _GridRow に包んで内壁の集合を作り直す）"""
+    
+    __slots__ = ('_world',)
+    
+    def __init__(self, rows, world):
+        self._world = world
+        super().__init__(_GridRow(row, world, y) for y, row in enumerate(rows))
+    
+    def __setitem__(self, y, row):
+        if isinstance(y, slice):
+            list.__setitem__(self, y, row)
+            list.__setitem__(self, slice(None), [_GridRow(r, self._world, i) for i, r in enumerate(self)])
+        else:
+            y %= len(self)
+            list.__setitem__(self, y, _GridRow(row, self._world, y))
+        self._world.rebuild_walls()
+
+
 class World:
     def __init__(self, size=5, height=None):
         self.width = size
         self.height = height if height else size
         self.size = size  # 互換性
+        self.walls = set()  # 内壁の座標（tickで動く壁。外周の壁は含まない）
         self.grid = [[None for _ in range(self.width)] for _ in range(self.height)]
         self.hida_pos = [2, 2]
         self.hida_dir = 'N'
         self.objects = {}  # 位置 → オブジェクト
         self.hida_holding = None  # 持ってるもの
     
+    @property
+    def grid(self):
+        """マス（grid[y][x]）。書き込むと内壁の集合も変わる"""
+        return self._grid
+    
+    @grid.setter
+    def grid(self, rows):
+        self._grid = _Grid(rows, self)
+        self.rebuild_walls()
+    
+    def _is_interior(self, x, y):
+        return 1 <= x < self.width - 1 and 1 <= y < self.height - 1
+    
+    def _sync_wall(self, x, y, cell):
+        """(x, y) が cell になったときに内壁の集合を合わせる"""
+        if self._is_interior(x, y):
+            if cell == 'wall':
+                self.walls.add((x, y))
+            else:
+                self.walls.discard((x, y))
+    
+    def _set_cell(self, x, y, cell):
+        """マスを書き換える（内壁の集合は行が合わせる）"""
+        self._grid[y][x] = cell
+    
+    def rebuild_walls(self):
+        """内壁の集合を grid から作り直す"""
+        self.walls = {(x, y)
+                      for y in range(1, self.height - 1)
+                      for x in range(1, self.width - 1)
+                      if self._grid[y][x] == 'wall'}
+    
     def add_wall(self, x, y):
         """壁を配置"""
-        self.grid[y][x] = 'wall'
+        self._set_cell(x, y, 'wall')
     
     def add_danger(self, x, y):
         """危険ゾーンを配置"""
-        self.grid[y][x] = 'danger'
+        self._set_cell(x, y, 'danger')
     
     def add_object(self, name, x, y, color=None):
         """オブジェクトを配置"""
@@ -140,19 +215,27 @@ class World:
         self.hida_holding = None
         return True, f"{obj['name']}をゴールに置いた"
     
-    def tick(self, move_probability=0.3):
-        """世界が1ステップ進む（壁が動く）"""
-        import random
+    def tick(self, move_probability=0.3, batch=False):
+        """世界が1ステップ進む（壁が動く）
         
-        moved = []
+        動く壁は内壁のみ（外壁は動かない）。移動先は内側の、壁・オブジェクト・
+        HIDAのいないマス。内壁は self.walls で持つので、コストは壁の数に比例する
+        （部屋の広さによらない）。grid への直接の書き込みも self.walls に入る。
         
-        # 動く壁のリストを取得（内壁のみ、外壁は動かない）
-        moving_walls = []
-        for y in range(1, self.height - 1):
-            for x in range(1, self.width - 1):
-                if self.grid[y][x] == 'wall':
-                    moving_walls.append((x, y))
+        batch=False: 上から順に1枚ずつ動かす（前の壁が空けたマスに入れる）
+        batch=True: 全部の壁の移動先をtick開始時の状態で一度に決め、
+                    同じマスを狙った壁は上から順で先の1枚だけが動く
+                    （同じtickで空いたマスには入らない）。壁ごとのPythonの
+                    ループで、配列による一括計算ではない
+        """
+        import random
+        
+        # 上から順（従来の全マス走査と同じ順）
+        moving_walls = sorted(self.walls, key=lambda p: (p[1], p[0]))
+        if batch:
+            return self._tick_proposals(moving_walls, move_probability)
         
+        moved = []
         for pos in moving_walls:
             if random.random() < move_probability:
                 x, y = pos
@@ -161,23 +244,53 @@ class World:
                 
                 for dx, dy in directions:
                     nx, ny = x + dx, y + dy
-                    # 移動先が有効か確認
-                    if 1 <= nx < self.width - 1 and 1 <= ny < self.height - 1:
-                        if self.grid[ny][nx] != 'wall':  # 壁じゃない
-                            if (nx, ny) not in self.objects:  # オブジェクトがない
-                                if [nx, ny] != self.hida_pos:  # HIDAがいない
-                                    # 壁を移動
-                                    self.grid[y][x] = None
-                                    self.grid[ny][nx] = 'wall'
-                                    moved.append({
-                                        'type': 'wall',
-                                        'from': pos,
-                                        'to': (nx, ny)
-                                    })
-                                    break
+                    if self._can_move_wall_to(nx, ny):
+                        # 壁を移動
+                        self._set_cell(x, y, None)
+                        self._set_cell(nx, ny, 'wall')
+                        moved.append({
+                            'type': 'wall',
+                            'from': pos,
+                            'to': (nx, ny)
+                        })
+                        break
         
         return moved
     
+    def _can_move_wall_to(self, x, y):
+        """壁の移動先として有効か（内側で、壁・オブジェクト・HIDAがない）"""
+        return (self._is_interior(x, y)
+                and self.grid[y][x] != 'wall'
+                and (x, y) not in self.objects
+                and [x, y] != self.hida_pos)
+    
+    def _tick_proposals(self, moving_walls, move_probability):
+        """全部の壁の移動を提案し、衝突を解消してから一度に動かす
+        
+        提案・解消・適用はどれも壁ごとのPythonのループ（配列化はしていない）。
+        """
+        import random
+        
+        # 1. 提案: 動く壁ごとに、有効な方向から1つ選ぶ（tick開始時の状態で判定）
+        proposals = {}  # 移動先 → 移動元
+        for x, y in moving_walls:
+            if random.random() >= move_probability:
+                continue
+            targets = [(x + dx, y + dy) for dx, dy in [(0, -1), (0, 1), (-1, 0), (1, 0)]
+                       if self._can_move_wall_to(x + dx, y + dy)]
+            if not targets:
+                continue
+            # 2. 衝突の解消: 同じマスを狙った壁は、先に提案した（上の）1枚だけ
+            proposals.setdefault(random.choice(targets), (x, y))
+        
+        # 3. 適用（移動先はすべて壁でないマスなので、順序によらない）
+        moved = []
+        for target, pos in proposals.items():
+            self._set_cell(pos[0], pos[1], None)
+            self._set_cell(target[0], target[1], 'wall')
+            moved.append({'type': 'wall', 'from': pos, 'to': target})
+        return moved
+    
     def display(self, internal_map=None):
         """表示（神視点）"""
         arrows = {'N': '^', 'S': 'v', 'E': '>', 'W': '<'}